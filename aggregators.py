@@ -0,0 +1,64 @@
+# aggregators.py
+"""
+Constant-memory aggregators for the streaming aggregation mode (config.STREAMING_AGGREGATION).
+
+In that mode directory_analyzer.aggregate_directory runs the scan as a generator pipeline and
+hands every record to each aggregator, instead of collecting all_files_data. An aggregator
+implements add_file(record) for file-like records (the all_files_data dicts) and
+add_dir_symlink(record) for directory symlink records; both default to doing nothing.
+
+Type counts and sizes, the hidden-item statistics and the file size distribution sketches are
+aggregated by ScanCounters, exactly as in a regular scan, and end up in summary_data. The
+aggregators here cover what the report reads from the records themselves:
+
+    SymlinkCollector   the symlink records for the detailed symlink list (O(number of symlinks))
+"""
+import config
+
+
+def size_for_plotting(item):
+    """
+    Returns the size used for an all_files_data record in the size plots (PMF, histogram, CDF),
+    following config.SYMLINK_SIZE_HANDLING_FOR_PLOTS, or None if the record is not plotted.
+    """
+    size_bytes = item.get('size_bytes', 0)  # This is symlink's own size if it's a symlink
+
+    if item.get('is_symlink', False):
+        if config.SYMLINK_SIZE_HANDLING_FOR_PLOTS == 'target':
+            # Potentially double counts if target is also in all_files_data
+            return item.get('symlink_target_size_bytes')
+        elif config.SYMLINK_SIZE_HANDLING_FOR_PLOTS == 'own_size':
+            if size_bytes >= 0:  # Include 0-byte symlinks (Windows)
+                return size_bytes
+        # 'exclude' (and unknown settings) do not plot symlinks
+        return None
+    # Not a symlink (regular file). We may want to control it for non-empty files but we are
+    # including them for distributions.
+    if size_bytes >= 0:
+        return size_bytes
+    return None
+
+
+class Aggregator:
+    """Base class for streaming aggregators. Subclasses override the add_* methods they need."""
+
+    def add_file(self, record):
+        pass
+
+    def add_dir_symlink(self, record):
+        pass
+
+
+class SymlinkCollector(Aggregator):
+    """Keeps the file symlink and directory symlink records, for the report's detailed symlink list."""
+
+    def __init__(self):
+        self.file_symlinks = []
+        self.dir_symlinks = []
+
+    def add_file(self, record):
+        if record['is_symlink']:
+            self.file_symlinks.append(dict(record))
+
+    def add_dir_symlink(self, record):
+        self.dir_symlinks.append(dict(record))
@@ -0,0 +1,134 @@
+# batch_analyzer.py
+"""
+Batch mode: analyzes many directories (e.g. every mount point of a host) in one run.
+
+    python file_analyzer.py batch ROOT [ROOT ...] [--manifest FILE] [--plot]
+
+All roots are scanned by directory_analyzer.analyze_directories on one shared pool of worker
+threads, largest first (see estimate_entries), and a root inside another root is scanned only
+once. Each root then gets its own scan file (config.SAVE_NEW_SCAN) and report, and the run ends
+with a roll-up report over all roots (report_generator.write_batch_rollup_report).
+"""
+import os
+import pathlib
+
+import config
+import instrumentation
+from directory_analyzer import analyze_directories, find_enclosing_roots
+from duplicate_finder import find_duplicates, print_duplicate_summary
+from fs_utils import check_target_directory
+from report_generator import generate_report_filename, write_batch_rollup_report, write_reports
+from serializer import load_scan_summary, save_scan, scan_exists
+
+
+def read_manifest(manifest_path):
+    """
+    Reads the directories listed in a manifest file: one path per line, blank lines and lines
+    starting with '#' are ignored. Returns a list of pathlib.Path objects.
+    """
+    directories = []
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                directories.append(pathlib.Path(line))
+    return directories
+
+
+def estimate_entries(directory):
+    """
+    Rough number of entries under a directory, used to start the largest roots first: the totals of
+    its saved scan if there is one, otherwise the used inodes of its filesystem if it is a mount
+    point, otherwise 0 (unknown, started last).
+    """
+    if scan_exists(directory):
+        summary_data = load_scan_summary(directory)
+        if summary_data is not None:
+            return (summary_data.get('total_directories_scanned', 0) + summary_data.get('total_file_entries_processed', 0)
+                    + summary_data.get('total_directory_symlinks_found', 0))
+    if hasattr(os, 'statvfs') and os.path.ismount(directory):
+        try:
+            fs_stats = os.statvfs(directory)
+            return max(0, fs_stats.f_files - fs_stats.f_ffree)
+        except OSError:
+            pass
+    return 0
+
+
+def run_batch(directories, os_name, plot=False):
+    """
+    Scans the given directories in one batch and writes a scan file (if config.SAVE_NEW_SCAN) and a
+    report per directory, the plots if requested, and the roll-up report.
+    Returns True if every directory was analyzed.
+    """
+    if config.STREAMING_AGGREGATION or config.INCREMENTAL_SCAN or config.STREAM_SCAN_TO_DISK:
+        print("Note: batch mode always performs full in-memory scans; streaming and incremental settings are ignored.")
+
+    valid_directories = [directory for directory in directories if check_target_directory(directory)]
+    all_valid = len(valid_directories) == len(directories)
+    if not valid_directories:
+        print("No valid directories to analyze.")
+        return False
+
+    estimates = {directory: estimate_entries(directory) for directory in valid_directories}
+    # Largest first; sorted() is stable, so directories of unknown size keep their given order
+    scan_order = sorted(valid_directories, key=lambda directory: estimates[directory], reverse=True)
+    print(f"Batch of {len(scan_order)} directories, in scan order:")
+    for directory in scan_order:
+        print(f"  {directory} (estimated entries: {estimates[directory] or 'unknown'})")
+
+    with instrumentation.phase("scan"):
+        results, rollup_summary_data = analyze_directories(scan_order, os_name)
+    instrumentation.count_scan(rollup_summary_data)
+
+    abs_paths = [directory.resolve() for directory in scan_order]
+    enclosing = find_enclosing_roots(abs_paths)
+    directory_rows = []
+    done = {}
+    for directory, abs_path, (all_files_data, directory_symlinks_data, summary_data) in zip(scan_order, abs_paths, results):
+        row = {'directory': str(directory), 'summary_data': summary_data, 'report': None, 'note': None}
+        directory_rows.append(row)
+        if abs_path in done:
+            row['note'] = f"same directory as {done[abs_path]['directory']}"
+            row['report'] = done[abs_path]['report']
+            continue
+        done[abs_path] = row
+        if abs_path in enclosing:
+            row['note'] = f"scanned as part of {enclosing[abs_path]}"
+
+        print(f"\n=== {abs_path} ===")
+        if config.SAVE_NEW_SCAN:
+            with instrumentation.phase("save_scan"):
+                save_scan(all_files_data, directory_symlinks_data, summary_data, directory)
+        duplicates = None
+        if config.FIND_DUPLICATE_FILES:
+            with instrumentation.phase("duplicates"):
+                duplicates = find_duplicates(all_files_data)
+            print_duplicate_summary(duplicates)
+        with instrumentation.phase("report"):
+            report_filepaths = write_reports(
+                summary_data=summary_data,
+                all_files_data=all_files_data,
+                dir_symlinks_data=directory_symlinks_data,
+                os_name=os_name,
+                include_details=config.INCLUDE_DETAILED_SYMLINK_LIST,
+                duplicates=duplicates,
+                target_directory=abs_path
+            )
+        row['report'] = ', '.join(report_filepaths) or None
+        if plot:
+            from plot_generator import generate_plots  # Loads NumPy and matplotlib
+
+            with instrumentation.phase("plots"):
+                generate_plots(all_files_data, directory_symlinks_data, summary_data, os_name)
+
+    for directory in directories:
+        if directory not in valid_directories:
+            directory_rows.append({'directory': str(directory), 'summary_data': None, 'report': None,
+                                   'note': "not an accessible directory"})
+
+    print()
+    rollup_report_path = generate_report_filename(report_name="batch_rollup_report")
+    write_batch_rollup_report(rollup_report_path, rollup_summary_data, directory_rows, os_name)
+    instrumentation.set_report_path(rollup_report_path)
+    return all_valid
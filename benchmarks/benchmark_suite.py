@@ -0,0 +1,290 @@
+# benchmarks/benchmark_suite.py
+"""
+Times the phases of an analysis on a synthetic tree and compares them against a stored baseline.
+
+Generates a deterministic tree with tree_generator.py (by default in /dev/shm, a tmpfs, so disk
+speed does not enter the numbers), then runs every phase in a fresh interpreter:
+
+    scan    analyze_directory with config.TRAVERSAL_ENGINE (or --engine)
+    save    save_scan of that scan (same process as the scan)
+    load    load_scan of the saved scan
+    report  write_reports of the loaded scan (config.REPORT_FORMATS)
+    plot    generate_plots of the loaded scan
+
+report and plot load the scan first, untimed. For each phase the suite records the best wall
+time over --repeat runs and the peak RSS of its process (ru_maxrss) once the phase is done, so a
+phase's peak includes whatever it was given to work on. The duplicate finder and run metrics
+are off. Library output goes to os.devnull.
+
+With --baseline (default benchmarks/baseline.json, if it exists) every phase is compared with the
+stored one; a phase slower or larger than the baseline by more than --tolerance is flagged as a
+regression and the exit status is 1. --save-baseline writes the results as the new baseline.
+Baselines are only comparable for the same tree parameters and machine; a differing tree is
+reported before the comparison.
+
+Usage: python benchmarks/benchmark_suite.py [--entries N] [--width N] [--depth N] [--engine E]
+           [--repeat N] [--base-dir DIR] [--tree DIR] [--baseline FILE] [--save-baseline] ...
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource  # Not available on Windows: peak RSS is then not recorded
+except ImportError:
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from tree_generator import DEFAULT_BASE_DIRECTORY, TreeSpec, add_spec_arguments, generate_tree, remove_tree  # noqa: E402
+
+PHASES = ('scan', 'save', 'load', 'report', 'plot')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_TOLERANCE = 0.15
+MIN_SECONDS_DELTA = 0.05  # Smaller slowdowns are timer noise, whatever their ratio
+MIN_RSS_DELTA_MB = 5.0
+
+# Phases run by one child process each
+_CHILD_GROUPS = (('scan', 'save'), ('load',), ('report',), ('plot',))
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB (None where resource is unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024  # Bytes on macOS, KiB elsewhere
+
+
+# --- Child process: runs some phases and writes their timings as JSON ---
+
+def run_child(phases, tree, engine, result_path):
+    import config
+
+    config.TRAVERSAL_ENGINE = engine
+    config.FIND_DUPLICATE_FILES = False
+    config.COLLECT_RUN_METRICS = False
+    config.SAVE_SCAN_DATABASE = False
+    config.STREAM_SCAN_TO_DISK = False
+
+    import directory_analyzer
+    import serializer
+    from os_utils import detect_os
+
+    os_name = detect_os()
+    results = {}
+    data = None
+
+    @contextlib.contextmanager
+    def timed(phase):
+        start = time.perf_counter()
+        yield
+        results[phase] = {'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        if 'scan' in phases:
+            with timed('scan'):
+                data = directory_analyzer.analyze_directory(tree, os_name)
+            all_files, dir_symlinks, summary = data
+            results['scan']['entries'] = len(all_files) + len(dir_symlinks) + summary['total_directories_scanned']
+            if 'save' in phases:
+                with timed('save'):
+                    serializer.save_scan(all_files, dir_symlinks, summary, tree)
+        else:
+            with timed('load'):
+                data = serializer.load_scan(tree)
+            if data[0] is None:
+                raise SystemExit(f"no saved scan of {tree}")
+            all_files, dir_symlinks, summary = data
+            if 'report' in phases:
+                from report_generator import write_reports
+                with timed('report'):
+                    write_reports(summary, all_files, dir_symlinks, os_name, config.INCLUDE_DETAILED_SYMLINK_LIST,
+                                  target_directory=tree)
+            if 'plot' in phases:
+                from plot_generator import generate_plots
+                with timed('plot'):
+                    generate_plots(all_files, dir_symlinks, summary, os_name)
+    results = {phase: result for phase, result in results.items() if phase in phases}
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f)
+
+
+# --- Parent process ---
+
+def run_phases(phases, tree, engine, work_dir):
+    """Runs a child for phases (cwd work_dir, where the scan, reports and plots are written); returns its results."""
+    result_path = os.path.join(work_dir, "phase_result.json")
+    command = [sys.executable, os.path.abspath(__file__), "--child", ",".join(phases), "--tree", tree,
+               "--engine", engine, "--result", result_path]
+    completed = subprocess.run(command, cwd=work_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"phases {', '.join(phases)} failed:\n{completed.stderr.strip()}")
+    with open(result_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_suite(tree, engine, phases, repeat, work_dir):
+    """Best result of every phase over repeat runs."""
+    best = {}
+    for _ in range(repeat):
+        for group in _CHILD_GROUPS:
+            # The scan and save always run: the other phases work on the saved scan
+            if group[0] != 'scan' and not any(phase in phases for phase in group):
+                continue
+            for phase, result in run_phases(group, tree, engine, work_dir).items():
+                if phase not in best or result['seconds'] < best[phase]['seconds']:
+                    best[phase] = result
+    return {phase: best[phase] for phase in PHASES if phase in best and phase in phases}
+
+
+def compare(results, baseline, tolerance):
+    """Lines of the comparison table and the list of regressions (phase, metric, old, new)."""
+    lines, regressions = [], []
+    lines.append(f"{'Phase':<8} {'Time (s)':>10} {'Baseline':>10} {'Change':>8}   "
+                 f"{'Peak RSS (MiB)':>15} {'Baseline':>10} {'Change':>8}")
+    lines.append("-" * 82)
+    for phase, result in results.items():
+        old = baseline.get('phases', {}).get(phase, {})
+        cells = []
+        for metric, min_delta, fmt in (('seconds', MIN_SECONDS_DELTA, '.3f'), ('peak_rss_mb', MIN_RSS_DELTA_MB, '.1f')):
+            new_value, old_value = result.get(metric), old.get(metric)
+            if new_value is None or not old_value:
+                cells.append((format(new_value, fmt) if new_value is not None else '-', '-', '', ''))
+                continue
+            change = new_value / old_value - 1
+            flag = ''
+            if change > tolerance and new_value - old_value > min_delta:
+                flag = ' !'
+                regressions.append((phase, metric, old_value, new_value))
+            cells.append((format(new_value, fmt), format(old_value, fmt), f"{change:+.0%}", flag))
+        (t_new, t_old, t_change, t_flag), (r_new, r_old, r_change, r_flag) = cells
+        lines.append(f"{phase:<8} {t_new:>10} {t_old:>10} {t_change:>8}{t_flag:<2} "
+                     f"{r_new:>15} {r_old:>10} {r_change:>8}{r_flag}")
+    return lines, regressions
+
+
+def print_results(results):
+    print(f"{'Phase':<8} {'Time (s)':>10} {'Peak RSS (MiB)':>15}")
+    print("-" * 35)
+    for phase, result in results.items():
+        rss = result.get('peak_rss_mb')
+        print(f"{phase:<8} {result['seconds']:>10.3f} {rss if rss is None else format(rss, '.1f'):>15}")
+
+
+def environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine(),
+            'cpus': os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_spec_arguments(parser)
+    parser.add_argument("--engine", default=None,
+                        help="Traversal engine (default: config.TRAVERSAL_ENGINE)")
+    parser.add_argument("--phases", default=",".join(PHASES),
+                        help="Comma-separated phases to run (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per phase; the best is kept (default: 3)")
+    parser.add_argument("--base-dir", default=DEFAULT_BASE_DIRECTORY,
+                        help="Where the tree and the outputs are created (default: %(default)s)")
+    parser.add_argument("--tree", default=None,
+                        help="Use (or generate once and keep) the tree at this path instead of a temporary one")
+    parser.add_argument("--baseline", default=None,
+                        help=f"Baseline JSON to compare against (default: {os.path.relpath(DEFAULT_BASELINE)} if present)")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown / RSS growth over the baseline (default: %(default)s)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child.split(","), args.tree, args.engine, args.result)
+        return
+
+    import config  # Only for the default engine: the suite itself does not import the analyzer
+    engine = args.engine or config.TRAVERSAL_ENGINE
+    phases = [phase.strip() for phase in args.phases.split(",") if phase.strip()]
+    unknown = [phase for phase in phases if phase not in PHASES]
+    if unknown:
+        parser.error(f"unknown phase(s): {', '.join(unknown)} (choose from {', '.join(PHASES)})")
+
+    spec = TreeSpec.from_args(args)
+    baseline_path = args.baseline or (DEFAULT_BASELINE if os.path.exists(DEFAULT_BASELINE) else None)
+    session_dir = tempfile.mkdtemp(prefix="fa_bench_", dir=args.base_dir)
+    tree = os.path.abspath(args.tree) if args.tree else os.path.join(session_dir, "tree")
+    work_dir = os.path.join(session_dir, "work")
+    os.makedirs(work_dir)
+    try:
+        if not os.path.exists(tree):
+            print(f"Generating {spec.entries:,} entries in {tree} ...")
+            start = time.perf_counter()
+            try:
+                counts = generate_tree(tree, spec)
+            except OSError as e:
+                sys.exit(f"Error: cannot generate the tree: {e}")
+            print(f"  {counts['directories']:,} directories, {counts['files']:,} files "
+                  f"({counts['hidden_files']:,} hidden), {counts['file_symlinks'] + counts['dir_symlinks']:,} symlinks, "
+                  f"{counts['broken_symlinks']:,} broken, {counts['loop_symlinks']:,} in loops, "
+                  f"{counts['denied_dirs']} denied dirs ({time.perf_counter() - start:.1f}s)")
+            if counts['denied_dirs'] and hasattr(os, 'geteuid') and os.geteuid() == 0:
+                print("  Note: running as root, the mode 000 directories are still readable.")
+        else:
+            print(f"Using the existing tree {tree}")
+
+        print(f"Engine: {engine}, best of {args.repeat}\n")
+        results = run_suite(tree, engine, phases, max(1, args.repeat), work_dir)
+    finally:
+        if not args.tree:
+            remove_tree(tree)
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+    if 'scan' in results:
+        scan = results['scan']
+        print(f"Scanned {scan['entries']:,} entries, {scan['entries'] / max(scan['seconds'], 1e-9):,.0f} entries/s\n")
+
+    regressions = []
+    if baseline_path and not args.save_baseline:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Baseline: {baseline_path} ({baseline.get('created', 'unknown date')}, engine {baseline.get('engine')})")
+        if baseline.get('tree') != spec.as_dict():
+            print("  WARNING: the baseline was measured on a different tree; the comparison is not meaningful")
+        if baseline.get('engine') != engine:
+            print("  WARNING: the baseline was measured with a different engine")
+        if baseline.get('environment') != environment():
+            print("  WARNING: the baseline was measured on a different Python or machine")
+        print()
+        lines, regressions = compare(results, baseline, args.tolerance)
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}:")
+            for phase, metric, old_value, new_value in regressions:
+                print(f"  {phase} {metric}: {old_value:.3f} -> {new_value:.3f}")
+        else:
+            print(f"\nNo regressions over {args.tolerance:.0%}.")
+    else:
+        print_results(results)
+
+    if args.save_baseline:
+        baseline_path = args.baseline or DEFAULT_BASELINE
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump({'created': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'engine': engine,
+                       'repeat': args.repeat, 'tree': spec.as_dict(), 'environment': environment(),
+                       'phases': results}, f, indent=2)
+        print(f"\nBaseline saved to {baseline_path}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
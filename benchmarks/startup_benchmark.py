@@ -0,0 +1,105 @@
+# benchmarks/startup_benchmark.py
+"""
+Measures the startup cost of the command line interface with python -X importtime.
+
+Builds a small directory tree and a saved scan of it in a temporary directory, then runs
+file_analyzer.py subcommands (and plain imports for reference) in fresh interpreters under
+-X importtime. For every scenario it reports the best wall time over --repeat runs, the total
+import time, whether NumPy / matplotlib were loaded, and the slowest top-level imports.
+
+Usage: python benchmarks/startup_benchmark.py [--repeat N] [--top N]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILE_ANALYZER = os.path.join(REPO_ROOT, "file_analyzer.py")
+
+# "import time: self [us] | cumulative | imported package", nesting shown by the name's indentation
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(stderr_text):
+    """Returns [(module, cumulative microseconds, nesting level)] from -X importtime output."""
+    imports = []
+    for line in stderr_text.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            _, cumulative, indent, module = match.groups()
+            imports.append((module, int(cumulative), (len(indent) - 1) // 2))
+    return imports
+
+
+def run_scenario(args, repeat, cwd):
+    """Runs 'python -X importtime <args>' repeat times. Returns (best wall seconds, imports of the best run)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=cwd,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        elapsed = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise RuntimeError(f"{' '.join(args)} exited with {completed.returncode}:\n{completed.stderr[-2000:]}")
+        if best is None or elapsed < best[0]:
+            best = (elapsed, parse_importtime(completed.stderr))
+    return best
+
+
+def build_tree(root, num_files=200):
+    """Creates a few directories of small files to scan."""
+    for i in range(num_files):
+        dir_path = os.path.join(root, f"dir_{i % 10}")
+        os.makedirs(dir_path, exist_ok=True)
+        with open(os.path.join(dir_path, f"file_{i}.{('txt', 'py', 'log')[i % 3]}"), 'wb') as f:
+            f.write(b"x" * (i * 53 % 8192))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per scenario (the fastest is reported)")
+    parser.add_argument("--top", type=int, default=5, help="Slowest top-level imports shown per scenario")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="fa_startup_bench_") as tmp:
+        target = os.path.join(tmp, "tree")
+        build_tree(target)
+        outputs = ["--scan-dir", os.path.join(tmp, "scans"), "--report-dir", os.path.join(tmp, "reports"),
+                   "--plot-dir", os.path.join(tmp, "plots")]
+        # Save a scan first, so the report / plot scenarios measure the load path
+        subprocess.run([sys.executable, FILE_ANALYZER, "scan", target] + outputs, cwd=tmp,
+                       stdout=subprocess.DEVNULL, check=True)
+
+        scenarios = [
+            ("import file_analyzer", ["-c", "import file_analyzer"]),
+            ("import plot_generator", ["-c", "import plot_generator"]),
+            ("--help", [FILE_ANALYZER, "--help"]),
+            ("scan --no-save", [FILE_ANALYZER, "scan", target, "--no-save"] + outputs),
+            ("report (saved scan)", [FILE_ANALYZER, "report", target] + outputs),
+            ("plot (saved scan)", [FILE_ANALYZER, "plot", target] + outputs),
+        ]
+        env_path = os.environ.get("PYTHONPATH")
+        os.environ["PYTHONPATH"] = REPO_ROOT + (os.pathsep + env_path if env_path else "")
+        results = [(name, run_scenario(scenario_args, args.repeat, tmp)) for name, scenario_args in scenarios]
+
+    print(f"{'Scenario':<24} {'Wall (s)':>9} {'Imports (s)':>12} {'NumPy':>6} {'mpl':>5}")
+    print("-" * 60)
+    for name, (elapsed, imports) in results:
+        modules = {module for module, _, _ in imports}
+        import_total = sum(cumulative for _, cumulative, level in imports if level == 0) / 1e6
+        print(f"{name:<24} {elapsed:>9.3f} {import_total:>12.3f} {'yes' if 'numpy' in modules else 'no':>6} "
+              f"{'yes' if 'matplotlib' in modules else 'no':>5}")
+
+    for name, (_, imports) in results:
+        top_level = sorted((item for item in imports if item[2] == 0), key=lambda item: item[1], reverse=True)
+        print(f"\nSlowest top-level imports, {name}:")
+        for module, cumulative, _ in top_level[:args.top]:
+            print(f"  {module:<40} {cumulative / 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
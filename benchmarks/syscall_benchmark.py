@@ -0,0 +1,91 @@
+# benchmarks/syscall_benchmark.py
+"""
+Counts the filesystem system calls each traversal engine makes per entry.
+
+Builds a small synthetic tree in a temporary directory (regular and hidden files,
+file and directory symlinks, broken links), then runs analyze_directory once per
+engine with os.stat / os.lstat / os.readlink / os.scandir wrapped by the counters
+of instrumentation.py (also used for the COUNT_SYSCALLS run metrics).
+
+Usage: python benchmarks/syscall_benchmark.py [--dirs N] [--files-per-dir N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+import directory_analyzer  # noqa: E402
+from instrumentation import SyscallCounter, count_syscalls  # noqa: E402
+from os_utils import detect_os  # noqa: E402
+
+def build_tree(root, num_dirs, files_per_dir):
+    """Creates num_dirs directories with files_per_dir entries each, including symlinks and hidden files."""
+    for d in range(num_dirs):
+        dir_path = os.path.join(root, f"dir_{d:04d}", f"sub_{d % 7}")
+        os.makedirs(dir_path, exist_ok=True)
+        for i in range(files_per_dir):
+            name = f".hidden_{i}.cfg" if i % 10 == 0 else f"file_{i}.{('txt', 'py', 'log', 'bin')[i % 4]}"
+            with open(os.path.join(dir_path, name), 'wb') as f:
+                f.write(b"x" * (i * 37 % 4096))
+        try:
+            os.symlink("file_1.py", os.path.join(dir_path, "link_to_file.py"))
+            os.symlink("missing_target", os.path.join(dir_path, "broken_link"))
+            os.symlink("..", os.path.join(dir_path, "link_to_parent"), target_is_directory=True)
+        except (OSError, NotImplementedError):
+            pass  # No symlink privilege (e.g. Windows without developer mode)
+
+
+def run_engine(engine, target, os_name):
+    config.TRAVERSAL_ENGINE = engine
+    counter = SyscallCounter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        with count_syscalls(counter):
+            start = time.perf_counter()
+            all_files, dir_symlinks, summary = directory_analyzer.analyze_directory(target, os_name)
+            elapsed = time.perf_counter() - start
+    return counter, elapsed, all_files, dir_symlinks, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=200, help="Number of leaf directories to create")
+    parser.add_argument("--files-per-dir", type=int, default=50, help="Regular files per leaf directory")
+    args = parser.parse_args()
+
+    os_name = detect_os()
+    original_engine = config.TRAVERSAL_ENGINE
+    with tempfile.TemporaryDirectory(prefix="fa_syscall_bench_") as tmp:
+        build_tree(tmp, args.dirs, args.files_per_dir)
+
+        results = {}
+        for engine in directory_analyzer.TRAVERSAL_ENGINES:
+            results[engine] = run_engine(engine, tmp, os_name)
+        config.TRAVERSAL_ENGINE = original_engine
+
+    baseline_summary = results['walk'][4]
+    print(f"{'Engine':<10} {'Entries':>8} {'scandir':>8} {'stat':>8} {'lstat':>8} {'readlink':>9} "
+          f"{'Total':>8} {'Per entry':>10} {'Time (s)':>9}")
+    print("-" * 86)
+    for engine, (counter, elapsed, all_files, dir_symlinks, summary) in results.items():
+        entries = len(all_files) + len(dir_symlinks) + summary['total_directories_scanned']
+        c = counter.counts
+        print(f"{engine:<10} {entries:>8} {c['scandir']:>8} {c['stat']:>8} {c['lstat']:>8} {c['readlink']:>9} "
+              f"{counter.total:>8} {counter.total / max(entries, 1):>10.2f} {elapsed:>9.3f}")
+        if summary != baseline_summary:
+            print(f"  WARNING: summary_data of '{engine}' differs from 'walk'")
+
+    walk_total = results['walk'][0].total
+    scandir_total = results['scandir'][0].total
+    entries = len(results['walk'][2]) + len(results['walk'][3]) + baseline_summary['total_directories_scanned']
+    print(f"\nscandir engine saves {(walk_total - scandir_total) / max(entries, 1):.2f} system calls per entry "
+          f"({walk_total} -> {scandir_total}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+# benchmarks/tree_generator.py
+"""
+Builds deterministic synthetic directory trees for the benchmark suite.
+
+The same TreeSpec and seed always produce the same tree: the same names, sizes, symlink targets
+and layout. A tree has:
+
+    directories     a breadth-first tree of `width` subdirectories per directory, at most `depth`
+                    levels deep, cut off so that every directory gets some entries
+    files           spread evenly over the directories; sizes drawn from `size_distribution`
+                    (lognormal around 4 KiB, uniform up to 64 KiB, or empty), files are sparse
+                    unless `write_data` is set, so 10M entries fit in a tmpfs
+    hidden files    the `hidden_ratio` share of the file names start with a dot
+    symlinks        file symlinks and directory symlinks to random entries of the tree (relative
+                    targets), broken symlinks to missing names, and pairs of symlinks pointing at
+                    each other (loops)
+    denied dirs     directories with a few files and mode 000 (still readable when run as root)
+
+Sparse files keep the data out of the tmpfs, but every entry still takes an inode: the default
+/dev/shm may hold fewer than 10M (generate_tree checks the free inodes first). Remount it with a
+larger nr_inodes, or use another base directory.
+
+`entries` counts everything created: directories, files, symlinks and the denied directories
+with their files, but not the root. Counts accept k/M suffixes, e.g. 10k or 1M entries.
+
+Usage: python benchmarks/tree_generator.py ROOT [--entries N] [--width N] [--depth N] [--seed N] ...
+       python benchmarks/tree_generator.py ROOT --remove
+"""
+import argparse
+import bisect
+import math
+import os
+import random
+import shutil
+import sys
+import time
+
+DEFAULT_BASE_DIRECTORY = "/dev/shm" if os.path.isdir("/dev/shm") else None  # tmpfs on Linux
+
+SIZE_DISTRIBUTIONS = ('lognormal', 'uniform', 'empty')
+_MAX_FILE_BYTES = 1 << 30       # Cap of the lognormal sizes
+_UNIFORM_MAX_BYTES = 64 * 1024
+_DENIED_DIR_FILES = 3           # Files created in every denied directory before it is locked
+_WRITE_CHUNK = b"\0" * (1 << 20)
+
+# File extensions and their weights; '' gives names without an extension
+_EXTENSIONS = (('.txt', 20), ('.log', 10), ('.py', 12), ('.json', 8), ('.c', 6), ('.h', 6), ('.jpg', 10),
+               ('.png', 8), ('.bin', 6), ('.gz', 4), ('.md', 5), ('', 5))
+_EXTENSION_TABLE = [ext for ext, weight in _EXTENSIONS for _ in range(weight)]
+
+_COUNT_SUFFIXES = {'': 1, 'K': 1000, 'M': 1000 ** 2, 'G': 1000 ** 3}
+
+
+def parse_count(text):
+    """Parses an entry count with an optional k/M/G suffix (powers of 1000), e.g. 10k or 2.5M."""
+    number, suffix = str(text).strip().upper(), ''
+    if number and number[-1] in _COUNT_SUFFIXES:
+        number, suffix = number[:-1], number[-1]
+    try:
+        return int(float(number) * _COUNT_SUFFIXES[suffix])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a count like 10000, 10k or 1M, got '{text}'")
+
+
+class TreeSpec:
+    """Parameters of a synthetic tree. as_dict() is what the benchmark baseline stores."""
+
+    FIELDS = ('entries', 'width', 'depth', 'size_distribution', 'hidden_ratio', 'file_symlink_ratio',
+              'dir_symlink_ratio', 'broken_symlink_ratio', 'symlink_loops', 'denied_dirs', 'write_data', 'seed')
+
+    def __init__(self, entries=10_000, width=10, depth=4, size_distribution='lognormal', hidden_ratio=0.05,
+                 file_symlink_ratio=0.02, dir_symlink_ratio=0.002, broken_symlink_ratio=0.002, symlink_loops=5,
+                 denied_dirs=3, write_data=False, seed=0):
+        if size_distribution not in SIZE_DISTRIBUTIONS:
+            raise ValueError(f"size_distribution must be one of {SIZE_DISTRIBUTIONS}, got '{size_distribution}'")
+        self.entries = entries
+        self.width = max(1, width)
+        self.depth = max(0, depth)
+        self.size_distribution = size_distribution
+        self.hidden_ratio = hidden_ratio
+        self.file_symlink_ratio = file_symlink_ratio
+        self.dir_symlink_ratio = dir_symlink_ratio
+        self.broken_symlink_ratio = broken_symlink_ratio
+        self.symlink_loops = symlink_loops
+        self.denied_dirs = denied_dirs
+        self.write_data = write_data
+        self.seed = seed
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(**{field: getattr(args, field) for field in cls.FIELDS})
+
+
+def add_spec_arguments(parser):
+    """Adds the TreeSpec options to an argparse parser (shared with benchmark_suite.py)."""
+    defaults = TreeSpec()
+    parser.add_argument("--entries", type=parse_count, default=defaults.entries,
+                        help="Total entries to create, e.g. 10k, 1M, 10M (default: %(default)s)")
+    parser.add_argument("--width", type=int, default=defaults.width, help="Subdirectories per directory")
+    parser.add_argument("--depth", type=int, default=defaults.depth, help="Maximum directory depth")
+    parser.add_argument("--size-distribution", choices=SIZE_DISTRIBUTIONS, default=defaults.size_distribution,
+                        help="File size distribution (default: %(default)s)")
+    parser.add_argument("--hidden-ratio", type=float, default=defaults.hidden_ratio,
+                        help="Share of files with a dot name")
+    parser.add_argument("--file-symlink-ratio", type=float, default=defaults.file_symlink_ratio,
+                        help="File symlinks as a share of the entries")
+    parser.add_argument("--dir-symlink-ratio", type=float, default=defaults.dir_symlink_ratio,
+                        help="Directory symlinks as a share of the entries")
+    parser.add_argument("--broken-symlink-ratio", type=float, default=defaults.broken_symlink_ratio,
+                        help="Broken symlinks as a share of the entries")
+    parser.add_argument("--symlink-loops", type=int, default=defaults.symlink_loops,
+                        help="Pairs of symlinks pointing at each other")
+    parser.add_argument("--denied-dirs", type=int, default=defaults.denied_dirs,
+                        help="Directories with mode 000")
+    parser.add_argument("--write-data", action="store_true",
+                        help="Write the file contents instead of creating sparse files")
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="Random seed (default: %(default)s)")
+
+
+def _fraction(index, salt):
+    """Deterministic value in [0, 1) for an index, so a file name can be rebuilt from its number alone."""
+    return (((index + salt * 0x632BE5AB) * 0x9E3779B1) & 0xFFFFFFFF) / 4294967296.0
+
+
+def file_name(index, hidden_ratio):
+    """Name of file number index: a dot name for the hidden share, an extension picked by weight."""
+    ext = _EXTENSION_TABLE[int(_fraction(index, 1) * len(_EXTENSION_TABLE))]
+    prefix = "." if _fraction(index, 2) < hidden_ratio else ""
+    return f"{prefix}file_{index:08d}{ext}"
+
+
+def _directory_layout(spec, max_dirs):
+    """Relative paths of the directories, breadth first, at most max_dirs (the root is '')."""
+    paths, depths = [''], [0]
+    node = 0
+    while node < len(paths) and len(paths) < max_dirs:
+        if depths[node] < spec.depth:
+            for child in range(spec.width):
+                if len(paths) >= max_dirs:
+                    break
+                paths.append(os.path.join(paths[node], f"dir_{child:03d}"))
+                depths.append(depths[node] + 1)
+        node += 1
+    return paths
+
+
+def _size_sampler(spec, rng):
+    if spec.size_distribution == 'empty':
+        return lambda: 0
+    if spec.size_distribution == 'uniform':
+        return lambda: rng.randrange(_UNIFORM_MAX_BYTES + 1)
+    mu = math.log(4096)
+    return lambda: min(int(rng.lognormvariate(mu, 2.0)), _MAX_FILE_BYTES)
+
+
+def _create_file(dir_fd, name, size):
+    fd = os.open(name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dir_fd)
+    try:
+        if size:
+            os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+def _write_file(dir_fd, name, size):
+    fd = os.open(name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dir_fd)
+    try:
+        while size > 0:
+            size -= os.write(fd, _WRITE_CHUNK[:min(size, len(_WRITE_CHUNK))])
+    finally:
+        os.close(fd)
+
+
+def generate_tree(root, spec, progress=None):
+    """
+    Creates the tree of spec under root (which must not exist yet). progress(done, total) is
+    called every 100k entries. Returns the counts of what was created, including 'total_bytes'
+    (apparent size of the files).
+    """
+    if os.path.lexists(root):
+        raise FileExistsError(f"'{root}' already exists")
+    rng = random.Random(spec.seed)
+    entries = max(spec.entries, 1)
+
+    file_symlinks = int(entries * spec.file_symlink_ratio)
+    dir_symlinks = int(entries * spec.dir_symlink_ratio)
+    broken_symlinks = int(entries * spec.broken_symlink_ratio)
+    loop_symlinks = 2 * spec.symlink_loops
+    denied_entries = spec.denied_dirs * (1 + _DENIED_DIR_FILES)
+    remaining = entries - file_symlinks - dir_symlinks - broken_symlinks - loop_symlinks - denied_entries
+    # At least about 4 entries per directory, and at least one file to link to
+    directories = _directory_layout(spec, max(1, remaining // 5))
+    files = max(1, remaining - (len(directories) - 1))  # The root is not an entry of the scan
+
+    counts = {'directories': len(directories) - 1, 'files': files, 'hidden_files': 0, 'file_symlinks': file_symlinks,
+              'dir_symlinks': dir_symlinks, 'broken_symlinks': broken_symlinks, 'loop_symlinks': loop_symlinks,
+              'denied_dirs': spec.denied_dirs, 'total_bytes': 0}
+    total = files + len(directories) - 1 + file_symlinks + dir_symlinks + broken_symlinks + loop_symlinks + denied_entries
+    if hasattr(os, 'statvfs'):
+        free_inodes = os.statvfs(os.path.dirname(os.path.abspath(root))).f_favail
+        if 0 < free_inodes < total:
+            raise OSError(f"{total:,} entries do not fit in the {free_inodes:,} free inodes of the filesystem "
+                          f"holding '{root}' (a tmpfs can be remounted with a larger nr_inodes)")
+    done = 0
+
+    def advance(step=1):
+        nonlocal done
+        previous, done = done, done + step
+        if progress and previous // 100_000 != done // 100_000:
+            progress(done, total)
+
+    for relative in directories:
+        os.makedirs(os.path.join(root, relative), exist_ok=True)
+    advance(len(directories) - 1)
+
+    # Files: directory d holds file numbers first_file[d] .. first_file[d + 1] - 1
+    per_dir, extra = divmod(files, len(directories))
+    first_file = [0]
+    for d in range(len(directories)):
+        first_file.append(first_file[-1] + per_dir + (1 if d < extra else 0))
+    next_size = _size_sampler(spec, rng)
+    create = _write_file if spec.write_data else _create_file
+    for d, relative in enumerate(directories):
+        dir_fd = os.open(os.path.join(root, relative) if relative else root, os.O_RDONLY)
+        try:
+            for index in range(first_file[d], first_file[d + 1]):
+                name = file_name(index, spec.hidden_ratio)
+                size = next_size()
+                create(dir_fd, name, size)
+                counts['total_bytes'] += size
+                if name.startswith('.'):
+                    counts['hidden_files'] += 1
+                advance()
+        finally:
+            os.close(dir_fd)
+
+    def random_dir():
+        return rng.randrange(len(directories))
+
+    def link(d, name, target, target_is_directory=False):
+        os.symlink(target, os.path.join(root, directories[d], name), target_is_directory=target_is_directory)
+        advance()
+
+    for k in range(file_symlinks):
+        index = rng.randrange(files)
+        target_dir = bisect.bisect_right(first_file, index) - 1
+        d = random_dir()
+        target = os.path.relpath(os.path.join(directories[target_dir], file_name(index, spec.hidden_ratio)),
+                                 directories[d] or os.curdir)
+        link(d, f"link_{k:07d}{os.path.splitext(target)[1]}", target)
+    for k in range(dir_symlinks):
+        d = random_dir()
+        target = os.path.relpath(directories[random_dir()] or os.curdir, directories[d] or os.curdir)
+        link(d, f"dirlink_{k:07d}", target, target_is_directory=True)
+    for k in range(broken_symlinks):
+        link(random_dir(), f"broken_{k:07d}", f"missing_{k:07d}")
+    for k in range(spec.symlink_loops):
+        d = random_dir()
+        link(d, f"loop_{k:04d}_a", f"loop_{k:04d}_b")
+        link(d, f"loop_{k:04d}_b", f"loop_{k:04d}_a")
+
+    for k in range(spec.denied_dirs):
+        denied = os.path.join(root, directories[random_dir()], f"denied_{k:03d}")
+        os.mkdir(denied)
+        for i in range(_DENIED_DIR_FILES):
+            with open(os.path.join(denied, f"secret_{i}.txt"), 'wb') as f:
+                f.write(b"x" * 100)
+            counts['total_bytes'] += 100
+        os.chmod(denied, 0)
+        advance(1 + _DENIED_DIR_FILES)
+
+    counts['entries'] = done
+    return counts
+
+
+def remove_tree(root):
+    """Deletes a generated tree, restoring the permissions of the denied directories first."""
+    if not os.path.lexists(root):
+        return
+
+    for dirpath, dirnames, _ in os.walk(root):
+        for dirname in dirnames:
+            path = os.path.join(dirpath, dirname)
+            if not os.path.islink(path) and dirname.startswith("denied_"):
+                os.chmod(path, 0o755)
+    shutil.rmtree(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("root", help="Directory to create (must not exist), or to delete with --remove")
+    parser.add_argument("--remove", action="store_true", help="Delete a generated tree instead")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+
+    if args.remove:
+        remove_tree(args.root)
+        print(f"Removed {args.root}")
+        return
+    spec = TreeSpec.from_args(args)
+    start = time.perf_counter()
+    try:
+        counts = generate_tree(args.root, spec,
+                               progress=lambda done, total: print(f"  {done:,} / {total:,} entries", file=sys.stderr))
+    except OSError as e:
+        sys.exit(f"Error: {e}")
+    elapsed = time.perf_counter() - start
+    print(f"Generated {counts['entries']:,} entries in {args.root} in {elapsed:.1f}s")
+    for key, value in counts.items():
+        if key != 'entries':
+            print(f"  {key:<16} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,14 +12,91 @@ SAVE_NEW_SCAN = True   # Default to True to save new scans
 # Directory to store saved scan data files.
 SCAN_DATA_DIRECTORY = "scan_data"
 
+# Set to True for incremental rescans. Scans then record each directory's (device, inode, mtime),
+# and when a saved scan exists for the target it is used as the baseline for a new scan instead of
+# being reused as-is: directories whose device, inode and mtime are unchanged keep their previous
+# entries without re-stat'ing them, everything else is scanned normally.
+# Note: a directory's mtime only changes when entries are added, removed or renamed, so size
+# changes of files inside an otherwise unchanged directory are not picked up in incremental mode.
+# Supported by the 'scandir' and 'threaded' traversal engines.
+INCREMENTAL_SCAN = False
+
+# Set to True to write new scans to the scan file while scanning instead of after the scan.
+# Records are appended in chunks of SCAN_STREAM_CHUNK_RECORDS, so memory use is bounded by the
+# chunk size rather than the size of the tree, and a checkpoint (pending directories and running
+# totals) is written at every chunk and at least every SCAN_CHECKPOINT_INTERVAL_SECONDS.
+# Streamed scans always use the 'scandir' traversal engine. Only used when SAVE_NEW_SCAN is True.
+STREAM_SCAN_TO_DISK = False
+SCAN_STREAM_CHUNK_RECORDS = 100000
+SCAN_CHECKPOINT_INTERVAL_SECONDS = 30
+
+# Set to True to also export every newly saved scan to a SQLite database next to the scan file
+# (see scan_database.py), for ad-hoc queries with `python file_analyzer.py query TARGET ...`.
+# The query subcommand builds the database on demand when it is missing or older than the scan.
+SAVE_SCAN_DATABASE = False
+
+# Set to True to continue an interrupted streamed scan (crash, Ctrl-C, reboot) of the selected
+# target directory from its last checkpoint instead of starting over.
+RESUME_INTERRUPTED_SCAN = False
+
+# Set to True to only aggregate the scan instead of keeping every record: the scanner feeds each
+# entry to streaming aggregators (symlink list, size histogram) and summary_data, and the report and
+# plots are produced from those. Memory stays proportional to the number of types and symlinks, not
+# files. Size plots use logarithmic buckets (~3% wide) instead of exact sizes. Scans are neither
+# loaded nor saved in this mode.
+STREAMING_AGGREGATION = False
+
 # --- Report Generation Configuration ---
 # Directory where text analysis reports will be saved.
 REPORT_OUTPUT_DIRECTORY = "reports"
 
+# Formats of the scan report, written side by side under the same file name: 'text' (.txt, the
+# report to read), 'json' (.json, one object with summary_data, the duplicate groups and the symlink
+# list), 'jsonl' (.jsonl, a summary line, then one line per symlink) and 'csv' (.csv, the symlink list
+# as a table). The batch roll-up report is always text.
+REPORT_FORMATS = ('text',)
+
+# Memory budget (MB) for sorting the detailed symlink list by path. Longer lists are sorted in runs
+# written to temporary files and merged while the report is written, so memory stays bounded.
+REPORT_SORT_MEMORY_MB = 64
+
 # Set to True to include the detailed list of all symbolic links in the report.
 # Set to False to omit it and only show the summary table.
 INCLUDE_DETAILED_SYMLINK_LIST = True
 
+# Number of types, directories and largest changes of each kind listed in the Markdown summary of
+# `file_analyzer.py compare` (scan_diff.py). Its CSV file lists every change.
+DIFF_REPORT_TOP_N = 20
+
+# Number of largest directories (by the bytes of their whole subtree) and largest files listed in
+# the report's directory tree section. The per-directory roll-up itself (directory_tree.py) covers
+# every directory and is saved with the scan.
+DIRECTORY_TREE_TOP_N = 20
+
+
+# --- Duplicate File Detection ---
+# Set to True to look for files with identical content before writing the report (see
+# duplicate_finder.py): files are grouped by size, then by a hash of their first and last
+# DUPLICATE_PARTIAL_HASH_BYTES, and only files that still match are hashed in full. The report
+# lists the duplicate groups and the bytes that removing the copies would free.
+# Needs the records, so it does not run in STREAMING_AGGREGATION mode.
+FIND_DUPLICATE_FILES = True
+
+# Files smaller than this are not considered (empty files are never reported).
+DUPLICATE_MIN_SIZE_BYTES = 1
+
+# Bytes hashed at the start and at the end of each candidate in the partial hash stage.
+DUPLICATE_PARTIAL_HASH_BYTES = 4096
+
+# Number of hashing threads. None picks min(32, 4 * CPU count).
+DUPLICATE_HASH_WORKERS = None
+
+# Cap on the read bandwidth of all hashing threads together, in MB/s. None means unlimited.
+DUPLICATE_MAX_READ_MB_PER_SECOND = None
+
+# Number of duplicate groups (largest reclaimable space first) listed in the report.
+DUPLICATE_REPORT_TOP_GROUPS = 50
+
 
 # --- Plot Generation Configuration ---
 PLOT_OUTPUT_DIRECTORY = "Plots"
@@ -33,6 +110,19 @@ PLOT_OUTPUT_DIRECTORY = "Plots"
 # Recommended for avoiding double count: 'own_size' or 'exclude'
 SYMLINK_SIZE_HANDLING_FOR_PLOTS = 'exclude'
 
+# Number of worker processes rendering the plots (headless, on the Agg backend). The data each plot
+# needs is prepared in the main process, so the workers only receive small arrays.
+# None: one worker process per plot, so all plots are drawn at the same time. 1: render in the main process.
+PLOT_WORKER_PROCESSES = None
+
+# The CDF plot is drawn from the empirical CDF reduced to at most about this many vertices, taken on
+# a logarithmic size grid (the CDF is exact at every vertex). Trees with fewer distinct sizes are drawn exactly.
+CDF_MAX_POINTS = 3000
+
+# Set to True to also write the reduced CDF series next to the CDF plot, as a CSV file with the
+# same name (columns: size_bytes, cumulative_count, cumulative_probability).
+CDF_EXPORT_CSV = False
+
 # For file type bar chart, how many top types to display
 BAR_CHART_TOP_N_TYPES = 20
 
@@ -40,8 +130,60 @@ BAR_CHART_TOP_N_TYPES = 20
 TOP_N_HIDDEN_TYPES = 10
 
 # --- Directory Analysis Configuration ---
-# Interval for printing file processing progress updates during directory scan.
-PROGRESS_UPDATE_INTERVAL_FILES = 500  # Update after every N files processed in current dir
+# Traversal engine used by analyze_directory:
+# - 'walk': The original os.walk based scanner. Asks pathlib for is_symlink()/lstat() on every entry.
+# - 'scandir': Walks with os.scandir and reuses the type, symlink flag and lstat data cached on each
+#              DirEntry, which saves two to three system calls per entry. Same records and summary keys.
+# - 'threaded': The scandir engine run on a pool of worker threads with work stealing, so several
+#               directories are listed at once (keeps NVMe / network filesystems busy). Same records
+#               and summary as the serial engines, only the record order differs.
+# - 'process': Splits the top of the tree into subtrees and scans them in worker processes, which
+#              also spreads the CPU-bound per-entry work (records, paths, suffixes) over all cores.
+#              Records come back through shared memory in a compact binary form. Same output as
+#              the serial engines, only the record order differs.
+TRAVERSAL_ENGINE = 'scandir'
+
+# Number of worker threads for the 'threaded' engine. None picks min(32, 4 * CPU count).
+SCAN_WORKER_THREADS = None
+
+# Number of worker processes for the 'process' engine. None uses one per CPU.
+SCAN_WORKER_PROCESSES = None
+
+# Maximum number of symlink targets whose stat() result is kept per scan (an LRU cache, see
+# symlink_targets.py), so many links to the same target cost one stat() call. 0 disables the cache.
+SYMLINK_TARGET_CACHE_SIZE = 65536
+
+# Maximum number of hard-linked inodes remembered per scan to count each one's size once (see
+# disk_usage.py). Only inodes with more than one link are stored, at 16-32 bytes each; links of
+# inodes beyond the limit are counted in full and reported as untracked.
+HARD_LINK_SET_MAX_INODES = 8 * 1024 * 1024
+
+# --- Scan Progress (progress.py) ---
+# Seconds between refreshes of the progress line. It is drawn by a background thread that samples
+# the scan's counters; the scan loops themselves never print progress.
+PROGRESS_REFRESH_SECONDS = 0.2
+
+# When stdout is not a terminal (redirected to a file or pipe), a plain progress line is logged
+# every this many seconds instead of redrawing the line in place.
+PROGRESS_LOG_INTERVAL_SECONDS = 10
+
+# Warnings and access errors printed per refresh at most while scanning; the rest are only counted
+# (skipped_access_errors in the summary and report).
+PROGRESS_MAX_MESSAGES_PER_REFRESH = 20
+
+# --- Run Metrics (instrumentation.py) ---
+# Set to True to time each phase of a run (scan, symlink chain resolution, saving, duplicate search,
+# report, plots) and write the timings with the scan rates as JSON next to the report
+# (<report name>.metrics.json). A summary of the runs is printed when the program ends.
+COLLECT_RUN_METRICS = True
+
+# Set to True to also count the stat, lstat, readlink and scandir calls of each run. The calls then go
+# through counting wrappers, which slows the scan down a little; the worker processes of the
+# 'process' engine are not counted.
+COUNT_SYSCALLS = False
 
-# Interval for printing directory scanning progress updates.
-PROGRESS_UPDATE_INTERVAL_DIRS = 20   # Update after every N directories (roots) visited
+# Profiler run around each analysis: None, 'cprofile' (every call, main thread only; written as
+# <report name>.metrics.pstats) or 'sampling' (stacks of all threads every PROFILER_SAMPLE_INTERVAL_MS,
+# written as <report name>.metrics.samples.txt in collapsed-stack format for flame graph tools).
+RUN_PROFILER = None
+PROFILER_SAMPLE_INTERVAL_MS = 5
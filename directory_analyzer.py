@@ -1,10 +1,24 @@
 # directory_analyzer.py
 import os
+import errno
 import pathlib
 import collections
+import stat
 import sys
-from fs_utils import is_hidden
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import resource_tracker, shared_memory
+from fs_utils import is_hidden, is_hidden_entry
 import config
+import instrumentation
+import progress
+import record_codec
+from directory_tree import DirectoryTree
+from disk_usage import InodeSet, allocated_bytes, inode_key
+from record_store import FileRecordStore, print_memory_comparison
+from size_sketch import FileSizeDistribution
+from symlink_targets import SymlinkChainResolver, TargetStatCache
 
 # Define constants for special types to avoid magic strings
 SYMLINK_TYPE_STR = ".<symlink>"
@@ -15,6 +29,16 @@ NON_FILE_TYPE_STR = ".<non_file_type>"
 ERROR_TYPE_STR = ".<error_processing>"
 NO_EXTENSION_STR = ".<no_ext>"
 
+# Names accepted by config.TRAVERSAL_ENGINE
+TRAVERSAL_ENGINES = ('walk', 'scandir', 'threaded', 'process')
+
+# errno values that pathlib.Path.exists() treats as "does not exist" rather than raising.
+# The scandir engine uses the same set so broken / looping links are classified identically.
+_TARGET_MISSING_ERRNOS = (errno.ENOENT, errno.ENOTDIR, errno.EBADF, errno.ELOOP)
+
+# Used by _scan_one_directory when no TargetStatCache is given: every target lookup calls stat()
+_UNCACHED_TARGET_STATS = TargetStatCache(max_entries=0)
+
 
 def get_absolute_target_path(symlink_path_obj, target_path_str_from_readlink):
     """
@@ -35,245 +59,1314 @@ def get_absolute_target_path(symlink_path_obj, target_path_str_from_readlink):
         return (symlink_path_obj.parent / target_as_path).absolute()
 
 
-def analyze_directory(directory_path, os_name):
+def get_type_from_suffix(path_obj):
+    """Returns the lowercase extension of a path, or NO_EXTENSION_STR if it has none."""
+    return path_obj.suffix.lower() if path_obj.suffix else NO_EXTENSION_STR
+
+
+class ScanCounters:
+    """
+    Running totals for a scan: entry counts, per-type counts/sizes, hidden item statistics and
+    the file size distribution sketches (size_sketch.py).
+    Every traversal engine feeds one of these and turns it into summary_data at the end.
+    """
+
+    def __init__(self):
+        self.visited_roots = 0
+        self.total_files_processed = 0
+        self.total_dir_symlinks_found = 0
+        self.skipped_access_errors = 0
+        self.bytes_processed = 0  # Sum of size_bytes of the entries added so far, for the progress display
+
+        # General file type aggregation
+        self.file_types_count = collections.defaultdict(int)
+        self.file_types_size = collections.defaultdict(int)
+
+        # Statistics for hidden files
+        self.total_hidden_files_count = 0
+        self.total_hidden_files_size = 0
+        self.hidden_file_types_count = collections.defaultdict(int)
+        self.hidden_file_types_size = collections.defaultdict(int)
+
+        # Mergeable size sketches of the file-like records (all_files_data)
+        self.size_distribution = FileSizeDistribution()
+
+        # Symlink target lookups and how they were answered (symlink_targets.py)
+        self.symlink_target_lookups = 0
+        self.symlink_target_record_hits = 0
+        self.symlink_target_cache_hits = 0
+
+        # Resolved symlink chains (symlink_targets.SymlinkChainResolver)
+        self.symlink_chain_depths = collections.defaultdict(int)  # depth -> links whose chain ends at a target
+        self.symlink_loop_members = 0
+        self.symlink_unterminated_chains = 0  # Chains that lead into a loop (or are too long) without being on it
+
+        # Allocated bytes per type, and the hard links counted after the first link of their inode (disk_usage.py)
+        self.file_types_allocated = collections.defaultdict(int)
+        self.hard_link_duplicates_size = collections.defaultdict(int)
+        self.hard_link_duplicates_allocated = collections.defaultdict(int)
+        self.hard_linked_inodes = 0
+        self.hard_link_duplicates = 0
+        self.hard_links_untracked = 0
+
+    def add_file(self, file_info):
+        """Adds one all_files_data record: type and hidden-item aggregates plus the size distribution."""
+        self.add_entry(file_info)
+        self.size_distribution.add_record(file_info)
+
+    def add_entry(self, entry_info):
+        """Adds one record to the type and hidden-item aggregates (directory symlinks; file records use add_file)."""
+        self.file_types_count[entry_info['type']] += 1
+        self.file_types_size[entry_info['type']] += entry_info['size_bytes']
+        self.bytes_processed += entry_info['size_bytes']
+        self.file_types_allocated[entry_info['type']] += entry_info.get('allocated_bytes', 0)  # Missing in older saved scans
+
+        # This applies to both regular files and symlinks (based on their own hidden status)
+        if entry_info['is_hidden']:
+            self.total_hidden_files_count += 1
+            self.total_hidden_files_size += entry_info['size_bytes']  # Use the item's own size
+            self.hidden_file_types_count[entry_info['type']] += 1
+            self.hidden_file_types_size[entry_info['type']] += entry_info['size_bytes']
+
+    def add_symlink_chain(self, chain):
+        """Counts one resolved symlink chain (a symlink_targets.SymlinkChain)."""
+        if chain.in_loop:
+            self.symlink_loop_members += 1
+        elif chain.final_target is None:
+            self.symlink_unterminated_chains += 1
+        else:
+            self.symlink_chain_depths[chain.depth] += 1
+
+    def add_hard_link(self, entry_info, outcome):
+        """Counts one entry with several hard links by its InodeSet.add outcome ('new', 'seen' or 'untracked')."""
+        if outcome == 'new':
+            self.hard_linked_inodes += 1
+        elif outcome == 'seen':
+            self.hard_link_duplicates += 1
+            self.hard_link_duplicates_size[entry_info['type']] += entry_info['size_bytes']
+            self.hard_link_duplicates_allocated[entry_info['type']] += entry_info['allocated_bytes']
+        else:
+            self.hard_links_untracked += 1
+
+    def add_error_entry(self, entry_info):
+        """Counts a record that could not be processed (only its type count, no size)."""
+        self.file_types_count[entry_info['type']] += 1
+        self.size_distribution.add_record(entry_info)  # Still in all_files_data, so still plotted
+
+    def merge(self, other):
+        """Adds the totals of another ScanCounters (e.g. a worker's share of the scan) into this one."""
+        self.visited_roots += other.visited_roots
+        self.total_files_processed += other.total_files_processed
+        self.total_dir_symlinks_found += other.total_dir_symlinks_found
+        self.skipped_access_errors += other.skipped_access_errors
+        self.bytes_processed += other.bytes_processed
+        self.total_hidden_files_count += other.total_hidden_files_count
+        self.total_hidden_files_size += other.total_hidden_files_size
+        self.symlink_target_lookups += other.symlink_target_lookups
+        self.symlink_target_record_hits += other.symlink_target_record_hits
+        self.symlink_target_cache_hits += other.symlink_target_cache_hits
+        self.symlink_loop_members += other.symlink_loop_members
+        self.symlink_unterminated_chains += other.symlink_unterminated_chains
+        self.hard_linked_inodes += other.hard_linked_inodes
+        self.hard_link_duplicates += other.hard_link_duplicates
+        self.hard_links_untracked += other.hard_links_untracked
+        for mine, theirs in ((self.file_types_count, other.file_types_count),
+                             (self.file_types_allocated, other.file_types_allocated),
+                             (self.hard_link_duplicates_size, other.hard_link_duplicates_size),
+                             (self.hard_link_duplicates_allocated, other.hard_link_duplicates_allocated),
+                             (self.symlink_chain_depths, other.symlink_chain_depths),
+                             (self.file_types_size, other.file_types_size),
+                             (self.hidden_file_types_count, other.hidden_file_types_count),
+                             (self.hidden_file_types_size, other.hidden_file_types_size)):
+            for key, value in theirs.items():
+                mine[key] += value
+        self.size_distribution.merge(other.size_distribution)
+
+    def progress_sample(self):
+        """Running totals for the progress display (progress.ProgressSample)."""
+        return progress.ProgressSample(self.visited_roots, self.total_files_processed + self.total_dir_symlinks_found,
+                                       self.bytes_processed, self.skipped_access_errors)
+
+    def to_state(self):
+        """JSON-serializable snapshot of the totals, for scan checkpoints."""
+        state = dict(self.__dict__)
+        state['size_distribution'] = self.size_distribution.to_dict()
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuilds counters from a to_state() snapshot."""
+        counters = cls()
+        for name, value in state.items():
+            if name == 'size_distribution':
+                value = FileSizeDistribution.from_dict(value)
+            elif name == 'symlink_chain_depths':
+                value = collections.defaultdict(int, {int(depth): count for depth, count in value.items()})  # JSON keys are strings
+            elif isinstance(value, dict):
+                value = collections.defaultdict(int, value)
+            setattr(counters, name, value)
+        return counters
+
+    def to_summary_data(self, abs_directory_path):
+        """Builds the summary_data dictionary (see DATA_STRUCTURES.md) from the totals."""
+        return {
+            "target_directory": str(abs_directory_path),
+            "total_directories_scanned": self.visited_roots,
+            "total_file_entries_processed": self.total_files_processed,
+            "total_directory_symlinks_found": self.total_dir_symlinks_found,
+            "skipped_access_errors": self.skipped_access_errors,
+            "file_types_summary": dict(sorted(self.file_types_count.items(), key=lambda item: item[1], reverse=True)),
+            "file_types_size_summary": dict(self.file_types_size),
+            "total_hidden_files_count": self.total_hidden_files_count,
+            "total_hidden_files_size": self.total_hidden_files_size,
+            "hidden_file_types_summary": dict(sorted(self.hidden_file_types_count.items(), key=lambda item: item[1], reverse=True)),
+            "hidden_file_types_size_summary": dict(self.hidden_file_types_size),
+            "file_size_distribution": self.size_distribution.to_dict(),
+            "symlink_target_lookups": self.symlink_target_summary(),
+            "symlink_chains": self.symlink_chain_summary(),
+            "disk_usage": self.disk_usage_summary()
+        }
+
+    def disk_usage_summary(self):
+        """Apparent, unique (hard links counted once) and allocated bytes, in total and per type."""
+        types = {}
+        for type_str, apparent in self.file_types_size.items():
+            types[type_str] = {
+                "apparent_bytes": apparent,
+                "unique_apparent_bytes": apparent - self.hard_link_duplicates_size.get(type_str, 0),
+                "allocated_bytes": self.file_types_allocated.get(type_str, 0) - self.hard_link_duplicates_allocated.get(type_str, 0)
+            }
+        return {
+            "apparent_bytes": sum(self.file_types_size.values()),
+            "unique_apparent_bytes": sum(self.file_types_size.values()) - sum(self.hard_link_duplicates_size.values()),
+            "allocated_bytes": sum(self.file_types_allocated.values()) - sum(self.hard_link_duplicates_allocated.values()),
+            "hard_linked_inodes": self.hard_linked_inodes,
+            "duplicate_hard_links": self.hard_link_duplicates,
+            "untracked_hard_links": self.hard_links_untracked,
+            "types": dict(sorted(types.items(), key=lambda item: item[1]["allocated_bytes"], reverse=True))
+        }
+
+    def symlink_chain_summary(self):
+        """Resolved symlink chains: counts by chain depth, links on loops and chains that never end."""
+        return {
+            "resolved": sum(self.symlink_chain_depths.values()),
+            "max_depth": max(self.symlink_chain_depths, default=0),
+            "depth_counts": sorted([depth, count] for depth, count in self.symlink_chain_depths.items()),
+            "in_loops": self.symlink_loop_members,
+            "unterminated": self.symlink_unterminated_chains
+        }
+
+    def symlink_target_summary(self):
+        """Symlink target lookups, and how many were answered from scanned records / the stat cache."""
+        answered = self.symlink_target_record_hits + self.symlink_target_cache_hits
+        return {
+            "lookups": self.symlink_target_lookups,
+            "record_hits": self.symlink_target_record_hits,
+            "cache_hits": self.symlink_target_cache_hits,
+            "stat_calls": self.symlink_target_lookups - answered,
+            "hit_rate": answered / self.symlink_target_lookups if self.symlink_target_lookups else 0.0
+        }
+
+
+class PreviousSnapshot:
+    """
+    Index over a previously saved scan for incremental rescans (config.INCREMENTAL_SCAN):
+    which file records and directory symlinks were listed directly in each directory,
+    and the (st_dev, st_ino, st_mtime_ns) key that directory had at the time.
+    """
+
+    def __init__(self, all_files_data, directory_symlinks_data):
+        self.store = all_files_data
+        self._dir_keys = {all_files_data.directories[code]: dir_key
+                          for code, dir_key in all_files_data.directory_stats.items()}
+        self._starts, self._rows = all_files_data.rows_by_directory()
+        self._dir_symlinks = collections.defaultdict(list)
+        for dir_symlink_info in directory_symlinks_data:
+            self._dir_symlinks[os.path.dirname(str(dir_symlink_info['path']))].append(dir_symlink_info)
+
+    @classmethod
+    def from_saved_scan(cls, all_files_data, directory_symlinks_data):
+        """Returns a PreviousSnapshot, or None if the saved scan has no directory keys to compare."""
+        if not isinstance(all_files_data, FileRecordStore) or not all_files_data.directory_stats:
+            return None
+        return cls(all_files_data, directory_symlinks_data)
+
+    def unchanged_entries(self, directory, dir_key):
+        """
+        Returns (rows of self.store, directory symlink records) listed in the directory last time
+        if its key is unchanged, otherwise None. Directories that had entries which could not be
+        processed are always rescanned.
+        """
+        if self._dir_keys.get(directory) != dir_key:
+            return None
+        code = self.store.directory_code(directory)  # Known directory, so this never adds a new code
+        rows = self._rows[self._starts[code]:self._starts[code + 1]] if code + 1 < len(self._starts) else ()
+        error_code = self.store.find_type_code(ERROR_TYPE_STR)
+        if error_code is not None and any(self.store.type_codes[row] == error_code for row in rows):
+            return None
+        return rows, self._dir_symlinks.get(directory, ())
+
+
+def _new_dir_symlink_info(dir_path_obj, dir_name):
+    return {
+        'path': dir_path_obj, 'name': dir_name, 'is_symlink': True,
+        'type': SYMLINK_TO_DIR_TYPE_STR, 'symlink_target_path': None,
+        'symlink_target_type': '.<dir>', 'size_bytes': 0, 'is_hidden': False,
+        'symlink_chain_depth': None, 'symlink_final_target': None, 'symlink_in_loop': None,
+        'allocated_bytes': 0, 'hard_links': 0, 'inode': None
+    }
+
+
+def _new_file_info(file_path, name):
+    return {
+        'path': file_path, 'name': name, 'is_symlink': False, 'is_hidden': False,
+        'symlink_target_path': None, 'symlink_target_type': None,
+        'symlink_target_size_bytes': None, 'size_bytes': 0, 'type': ERROR_TYPE_STR,
+        'symlink_chain_depth': None, 'symlink_final_target': None, 'symlink_in_loop': None,
+        'allocated_bytes': 0, 'hard_links': 0, 'inode': None
+    }
+
+
+def _fill_disk_usage(info, lstat_info):
+    """Sets the allocated_bytes, hard_links and inode fields of a record from the entry's lstat result."""
+    info['allocated_bytes'] = allocated_bytes(lstat_info)
+    info['hard_links'] = lstat_info.st_nlink
+    info['inode'] = inode_key(lstat_info)
+
+
+def _count_hard_links(inode_set, counters, all_files_data, directory_symlinks_data):
+    """
+    Passes the entries with more than one hard link through inode_set (shared by the whole scan) and
+    counts every link after the first of its inode as a duplicate (see disk_usage.py).
+    """
+    with instrumentation.phase("scan.hard_links"):
+        for row, inode in all_files_data.inodes.items():
+            counters.add_hard_link(all_files_data[row], inode_set.add(inode))
+        for dir_symlink_info in directory_symlinks_data:
+            if dir_symlink_info.get('inode') is not None:
+                counters.add_hard_link(dir_symlink_info, inode_set.add(dir_symlink_info['inode']))
+
+
+def _resolve_symlink_chains(resolver, counters, all_files_data, directory_symlinks_data):
+    """
+    Resolves the chain of every symlink record with a SymlinkChainResolver (shared by the whole scan)
+    and fills its symlink_chain_depth, symlink_final_target and symlink_in_loop fields.
+    The immediate targets the scan already read are handed to the resolver, saving their readlink().
+    """
+    with instrumentation.phase("scan.symlink_chains"):
+        for row in all_files_data.symlink_rows():
+            target_path = all_files_data.symlink_target_path_at(row)
+            chain = resolver.resolve(all_files_data.path_string_at(row),
+                                     target_path if isinstance(target_path, pathlib.Path) else None)
+            if chain is not None:
+                all_files_data.set_symlink_chain(row, chain)
+                counters.add_symlink_chain(chain)
+        for dir_symlink_info in directory_symlinks_data:
+            _resolve_record_chain(resolver, counters, dir_symlink_info)
+
+
+def _resolve_record_chain(resolver, counters, record):
+    """Resolves the chain of one symlink record dict and fills its symlink_* chain fields."""
+    target_path = record['symlink_target_path']
+    chain = resolver.resolve(record['path'], target_path if isinstance(target_path, pathlib.Path) else None)
+    if chain is not None:
+        record['symlink_chain_depth'] = chain.depth
+        record['symlink_final_target'] = None if chain.final_target is None else pathlib.Path(chain.final_target)
+        record['symlink_in_loop'] = chain.in_loop
+        counters.add_symlink_chain(chain)
+
+
+def _print_scan_complete(counters):
+    print(f"Directory scan complete. Processed {counters.visited_roots} directories and {counters.total_files_processed} file entries.")
+
+
+def analyze_directory(directory_path, os_name, previous_scan=None, scan_stream=None):
     """
     Traverses the given directory, collects file information,
     treating symlinks as distinct items with their own sizes.
     Also identifies directory symbolic links and shows progress.
+
+    The traversal itself is done by the engine selected with config.TRAVERSAL_ENGINE;
+    all engines return the same (all_files_data, directory_symlinks_data, summary_data).
+    all_files_data is a FileRecordStore (see record_store.py), whose rows read like the record dicts.
+
+    previous_scan is an optional (all_files_data, directory_symlinks_data) pair from a saved scan.
+    With config.INCREMENTAL_SCAN on, directories whose (st_dev, st_ino, st_mtime_ns) did not change
+    since that scan keep their previous entries instead of being stat'ed again.
+
+    scan_stream is an optional scan_file.ScanStreamWriter (see config.STREAM_SCAN_TO_DISK). Records
+    are then written to the scan file in chunks with periodic checkpoints while scanning, the scan
+    continues from the writer's checkpoint if it was opened to resume, and the returned
+    all_files_data is the finished scan file, memory-mapped.
+
+    all_files_data.directory_tree is the per-directory roll-up of the scan (directory_tree.py), and
+    summary_data['directory_tree'] its largest directories and files.
     """
     print(f"Starting analysis of: {directory_path}")
     abs_directory_path = pathlib.Path(directory_path).resolve()
     print(f"Analyzing: {abs_directory_path}")
 
-    all_files_data = []
-    directory_symlinks_data = []
+    engine = config.TRAVERSAL_ENGINE
+    previous = None
+    if config.INCREMENTAL_SCAN and previous_scan is not None:
+        previous = PreviousSnapshot.from_saved_scan(*previous_scan)
+        if previous is None:
+            print("Saved scan has no directory modification times; performing a full scan.")
+        elif engine not in ('scandir', 'threaded'):
+            print(f"Incremental rescans are not supported by the '{engine}' engine; using 'scandir'.")
+            engine = 'scandir'
+        if previous is not None:
+            print("Incremental scan: reusing entries of directories unchanged since the saved scan.")
+    if scan_stream is not None and engine != 'scandir':
+        print(f"Streamed scans are not supported by the '{engine}' engine; using 'scandir'.")
+        engine = 'scandir'
 
-    # Counters for overall summary
-    final_total_files_processed = 0
-    final_total_dir_symlinks_found = 0
-    skipped_access_errors = 0
-    visited_roots = 0
+    if engine == 'scandir':
+        scan_result = _analyze_directory_scandir(abs_directory_path, os_name, previous, scan_stream)
+    elif engine == 'threaded':
+        scan_result = _analyze_directory_threaded(abs_directory_path, os_name, previous)
+    elif engine == 'process':
+        scan_result = _analyze_directory_processes(abs_directory_path, os_name)
+    else:
+        if engine != 'walk':
+            print(f"Warning: Unknown TRAVERSAL_ENGINE '{engine}' (expected one of {TRAVERSAL_ENGINES}). Using 'walk'.", file=sys.stderr)
+        scan_result = _analyze_directory_walk(abs_directory_path, os_name)
 
-    # General file type aggregation
-    file_types_count = collections.defaultdict(int)
-    file_types_size = collections.defaultdict(int)
+    all_files_data, _, summary_data = scan_result
+    if all_files_data.directory_tree is None:  # Streamed scans build it chunk by chunk
+        with instrumentation.phase("scan.directory_tree"):
+            all_files_data.directory_tree = DirectoryTree.from_records(abs_directory_path, all_files_data)
+            summary_data['directory_tree'] = all_files_data.directory_tree.summary()
+    print_memory_comparison(all_files_data)
+    return scan_result
 
-    # --- Statistics for hidden files ---
-    total_hidden_files_count = 0
-    total_hidden_files_size = 0
-    hidden_file_types_count = collections.defaultdict(int)
-    hidden_file_types_size = collections.defaultdict(int)
-    # --------------------------------------
 
-    # Progress related
-    spinner_chars = ['|', '/', '-', '\\']
-    spinner_idx = 0
-    total_files_processed_in_walk = 0
+def _analyze_directory_walk(abs_directory_path, os_name):
+    """
+    The original os.walk based engine.
+    Builds a pathlib.Path for every entry and asks it for is_symlink()/lstat(),
+    so it costs a few system calls per entry on top of the ones os.walk makes.
+    """
+    all_files_data = FileRecordStore()
+    directory_symlinks_data = []
+    counters = ScanCounters()
+    target_cache = TargetStatCache()
 
     def walk_error_handler(os_error):
-        nonlocal skipped_access_errors
-        # Using \r and end='' to overwrite the line for errors can be messy with other prints
-        # So, just print errors on a new line.
-        print(f"\nAccess denied or error reading directory: {os_error.filename}. Skipping.", file=sys.stderr)
-        skipped_access_errors += 1
-
-    for root, dirs, files in os.walk(abs_directory_path, topdown=True, onerror=walk_error_handler, followlinks=False):
-        visited_roots += 1
-        current_path_obj = pathlib.Path(root)
-
-        # --- Progress Update for Directories ---
-
-        if visited_roots % config.PROGRESS_UPDATE_INTERVAL_DIRS == 0 or visited_roots == 1 :
-            # Truncate long paths for display
-            display_path = str(current_path_obj)
-            if len(display_path) > 70: display_path = "..." + display_path[-67:]
-            print(f"\rScanning {spinner_chars[spinner_idx % len(spinner_chars)]} [{visited_roots} dirs]: {display_path:<70}", end="", flush=True)
-            spinner_idx += 1
-
-        # --- Process directory entries to find directory symlinks ---
-        processed_dirs_this_iteration = [] # To keep track of dirs successfully processed
-        for dir_name in dirs:
-            dir_path_obj = current_path_obj / dir_name
-            try: # <------------------------------------ ADD TRY HERE
-                if dir_path_obj.is_symlink():
-                    final_total_dir_symlinks_found += 1
-                    dir_symlink_info = {
-                        'path': dir_path_obj, 'name': dir_name, 'is_symlink': True,
-                        'type': SYMLINK_TO_DIR_TYPE_STR, 'symlink_target_path': None,
-                        'symlink_target_type': '.<dir>', 'size_bytes': 0, 'is_hidden': False
-                    }
-                    # The following try-except is for issues within symlink processing
-                    try:
-                        dir_symlink_info['is_hidden'] = is_hidden(dir_path_obj, os_name)
-                        lstat_info = dir_path_obj.lstat()
-                        dir_symlink_info['size_bytes'] = lstat_info.st_size
-                        target_path_str = os.readlink(dir_path_obj)
-
-                        # Use the new helper function to get absolute path without full resolve
-                        # This should prevent symlink loop errors from .resolve()
-
-                        immediate_absolute_target = get_absolute_target_path(dir_path_obj, target_path_str)
-                        dir_symlink_info['symlink_target_path'] = immediate_absolute_target
-
-                        # Now check existence and type of this immediate_absolute_target
-
-                        if not immediate_absolute_target.exists():
-                            dir_symlink_info['symlink_target_type'] = ".<broken>"
-                            dir_symlink_info['type'] = BROKEN_SYMLINK_TYPE_STR
-                        elif not immediate_absolute_target.is_dir():
-                            dir_symlink_info['symlink_target_type'] = ".<target_not_dir>"
-                            dir_symlink_info['type'] = SYMLINK_TYPE_STR
-                            print(f"\nWarning: Dir symlink {dir_path_obj} points to non-dir {immediate_absolute_target}", file=sys.stderr)
-                        # If it exists and is a dir, symlink_target_type remains '.<dir>' (default)
-
-
-                    except RuntimeError as e_runtime:
-                        print(f"\nRuntimeError processing dir symlink target {dir_path_obj}: {e_runtime}", file=sys.stderr)
-                        dir_symlink_info['type'] = SYMLINK_ERROR_TYPE_STR
-                        dir_symlink_info['symlink_target_path'] = f"Error: {e_runtime}"
-                    except OSError as e_link_ops: # Catch OS errors during readlink, lstat on symlink itself
-                        print(f"\nOSError processing dir symlink {dir_path_obj} (target ops or link itself): {e_link_ops}", file=sys.stderr)
-                        dir_symlink_info['type'] = SYMLINK_ERROR_TYPE_STR
-                        dir_symlink_info['symlink_target_path'] = f"Error: {e_link_ops}"
-
-                    directory_symlinks_data.append(dir_symlink_info)
-                    file_types_count[dir_symlink_info['type']] += 1
-                    file_types_size[dir_symlink_info['type']] += dir_symlink_info['size_bytes']
-                    if dir_symlink_info['is_hidden']:
-                        total_hidden_files_count += 1
-                        total_hidden_files_size += dir_symlink_info['size_bytes']
-                        hidden_file_types_count[dir_symlink_info['type']] += 1
-                        hidden_file_types_size[dir_symlink_info['type']] += dir_symlink_info['size_bytes']
-                # else: # Not a symlink, it's a regular directory entry from 'dirs' list.
-                      # No special processing needed here for regular dirs beyond os.walk traversing them.
-
-                processed_dirs_this_iteration.append(dir_name) # If successful
-
-            except PermissionError as e_perm:
-                print(f"\nPermission denied processing directory entry: {dir_path_obj}. Error: {e_perm}. Skipping this entry.", file=sys.stderr)
-                skipped_access_errors += 1
-                continue # Skip to the next dir_name in dirs
+        progress.warn(f"Access denied or error reading directory: {os_error.filename}. Skipping.")
+        counters.skipped_access_errors += 1
+
+    with progress.ProgressReporter(counters.progress_sample):
+        for root, dirs, files in os.walk(abs_directory_path, topdown=True, onerror=walk_error_handler, followlinks=False):
+            counters.visited_roots += 1
+            current_path_obj = pathlib.Path(root)
+
+            # --- Process directory entries to find directory symlinks ---
+            processed_dirs_this_iteration = [] # To keep track of dirs successfully processed
+            for dir_name in dirs:
+                dir_path_obj = current_path_obj / dir_name
+                try:
+                    if dir_path_obj.is_symlink():
+                        counters.total_dir_symlinks_found += 1
+                        dir_symlink_info = _new_dir_symlink_info(dir_path_obj, dir_name)
+                        # The following try-except is for issues within symlink processing
+                        try:
+                            dir_symlink_info['is_hidden'] = is_hidden(dir_path_obj, os_name)
+                            lstat_info = dir_path_obj.lstat()
+                            dir_symlink_info['size_bytes'] = lstat_info.st_size
+                            _fill_disk_usage(dir_symlink_info, lstat_info)
+                            target_path_str = os.readlink(dir_path_obj)
+
+                            # Use the new helper function to get absolute path without full resolve
+                            # This should prevent symlink loop errors from .resolve()
+
+                            immediate_absolute_target = get_absolute_target_path(dir_path_obj, target_path_str)
+                            dir_symlink_info['symlink_target_path'] = immediate_absolute_target
+
+                            # Now check existence and type of this immediate_absolute_target
+                            # (one stat, shared by all links to the same target)
+
+                            target_stat = _stat_symlink_target(immediate_absolute_target, target_cache, counters)
+                            if target_stat is None:
+                                dir_symlink_info['symlink_target_type'] = ".<broken>"
+                                dir_symlink_info['type'] = BROKEN_SYMLINK_TYPE_STR
+                            elif not stat.S_ISDIR(target_stat.st_mode):
+                                dir_symlink_info['symlink_target_type'] = ".<target_not_dir>"
+                                dir_symlink_info['type'] = SYMLINK_TYPE_STR
+                                progress.warn(f"Warning: Dir symlink {dir_path_obj} points to non-dir {immediate_absolute_target}")
+                            # If it exists and is a dir, symlink_target_type remains '.<dir>' (default)
+
+
+                        except RuntimeError as e_runtime:
+                            progress.warn(f"RuntimeError processing dir symlink target {dir_path_obj}: {e_runtime}")
+                            dir_symlink_info['type'] = SYMLINK_ERROR_TYPE_STR
+                            dir_symlink_info['symlink_target_path'] = f"Error: {e_runtime}"
+                        except OSError as e_link_ops: # Catch OS errors during readlink, lstat on symlink itself
+                            progress.warn(f"OSError processing dir symlink {dir_path_obj} (target ops or link itself): {e_link_ops}")
+                            dir_symlink_info['type'] = SYMLINK_ERROR_TYPE_STR
+                            dir_symlink_info['symlink_target_path'] = f"Error: {e_link_ops}"
+
+                        directory_symlinks_data.append(dir_symlink_info)
+                        counters.add_entry(dir_symlink_info)
+                    # else: # Not a symlink, it's a regular directory entry from 'dirs' list.
+                          # No special processing needed here for regular dirs beyond os.walk traversing them.
+
+                    processed_dirs_this_iteration.append(dir_name) # If successful
+
+                except PermissionError as e_perm:
+                    progress.warn(f"Permission denied processing directory entry: {dir_path_obj}. Error: {e_perm}. Skipping this entry.")
+                    counters.skipped_access_errors += 1
+                    continue # Skip to the next dir_name in dirs
+                except OSError as e_os:
+                    progress.warn(f"OSError processing directory entry: {dir_path_obj}. Error: {e_os}. Skipping this entry.")
+                    counters.skipped_access_errors += 1
+                    continue # Skip to the next dir_name in dirs
+
+            # If you were modifying `dirs` in place for topdown=True traversal pruning,
+            # you would do: `dirs[:] = processed_dirs_this_iteration`
+            # But since we are just reading, it's not strictly necessary here.
+
+            # Process file entries
+            for name in files:
+                counters.total_files_processed += 1
+                file_path = current_path_obj / name
+                file_info = _new_file_info(file_path, name)
+                try:
+                    file_info['is_hidden'] = is_hidden(file_path, os_name)
+                    lstat_info = file_path.lstat()
+                    _fill_disk_usage(file_info, lstat_info)
+
+                    # Logic for symlinks to files (as before)
+                    if file_path.is_symlink():
+                        file_info['is_symlink'] = True
+                        file_info['size_bytes'] = lstat_info.st_size
+                        file_info['type'] = SYMLINK_TYPE_STR
+                        try:
+                            target_path_str = os.readlink(file_path)
+
+                            # Use the new helper function
+                            immediate_absolute_target = get_absolute_target_path(file_path, target_path_str)
+                            file_info['symlink_target_path'] = immediate_absolute_target
+                            target_stat = _stat_symlink_target(immediate_absolute_target, target_cache, counters)
+                            if target_stat is not None:
+                                if stat.S_ISREG(target_stat.st_mode):
+                                    file_info['symlink_target_size_bytes'] = target_stat.st_size
+                                    file_info['symlink_target_type'] = get_type_from_suffix(immediate_absolute_target)
+                                else:
+                                    file_info['symlink_target_type'] = ".<target_not_file>"
+                                    if stat.S_ISDIR(target_stat.st_mode):
+                                         file_info['type'] = SYMLINK_TO_DIR_TYPE_STR
+                                    else:
+                                         file_info['type'] = ".<symlink_to_special>"
+                            else:
+                                file_info['symlink_target_type'] = ".<broken>"
+                                file_info['type'] = BROKEN_SYMLINK_TYPE_STR
+                        except RuntimeError as e_runtime:
+                            progress.warn(f"RuntimeError processing file symlink target {file_path}: {e_runtime}")
+                            file_info['type'] = SYMLINK_ERROR_TYPE_STR
+                            file_info['symlink_target_path'] = f"Error: {e_runtime}"
+                        except OSError as e_link:
+                            progress.warn(f"OSError processing file symlink target {file_path}: {e_link}")
+                            file_info['type'] = SYMLINK_ERROR_TYPE_STR
+                            file_info['symlink_target_path'] = f"Error: {e_link}"
+                    else: # Not a symlink
+                        if (lstat_info.st_mode & 0o170000) == 0o100000:
+                            file_info['size_bytes'] = lstat_info.st_size
+                            file_info['type'] = get_type_from_suffix(file_path)
+                        else: # Non-regular file type from 'files' list
+                            file_info['size_bytes'] = lstat_info.st_size
+                            file_info['type'] = NON_FILE_TYPE_STR
+                            progress.warn(f"Warning: Non-regular file '{file_path}' (mode: {oct(lstat_info.st_mode)}) found.")
+
+                    all_files_data.append(file_info, parent_dir=root)
+                    counters.add_file(file_info)
+
+                except OSError as e_stat:
+                    progress.warn(f"OSError during main processing of {file_path}: {e_stat}. Skipping.")
+                    counters.skipped_access_errors += 1
+                    file_info['type'] = ERROR_TYPE_STR # Mark as error
+                    # Potentially set is_hidden to False or a special state if stat failed before is_hidden check
+                    file_info['is_hidden'] = False # Or some other default on error
+                    all_files_data.append(file_info, parent_dir=root)
+                    counters.add_error_entry(file_info) # Count as error type
+                    continue
+
+    _print_scan_complete(counters)
+    _resolve_symlink_chains(SymlinkChainResolver(), counters, all_files_data, directory_symlinks_data)
+    _count_hard_links(InodeSet(), counters, all_files_data, directory_symlinks_data)
+
+    summary_data = counters.to_summary_data(abs_directory_path)
+
+    return all_files_data, directory_symlinks_data, summary_data
+
+
+def _process_dir_symlink_entry(entry, os_name):
+    """
+    Builds a directory symlink record from an os.DirEntry that is a symlink to a directory.
+    The entry already reported is_dir() through the link, so the target is known to exist
+    and to be a directory; only lstat (cached on the entry) and readlink are needed.
+    """
+    dir_path_obj = pathlib.Path(entry.path)
+    dir_symlink_info = _new_dir_symlink_info(dir_path_obj, entry.name)
+    try:
+        dir_symlink_info['is_hidden'] = is_hidden_entry(entry, os_name)
+        lstat_info = entry.stat(follow_symlinks=False)
+        dir_symlink_info['size_bytes'] = lstat_info.st_size
+        _fill_disk_usage(dir_symlink_info, lstat_info)
+        target_path_str = os.readlink(entry.path)
+        dir_symlink_info['symlink_target_path'] = get_absolute_target_path(dir_path_obj, target_path_str)
+    except OSError as e_link_ops:
+        progress.warn(f"OSError processing dir symlink {dir_path_obj} (target ops or link itself): {e_link_ops}")
+        dir_symlink_info['type'] = SYMLINK_ERROR_TYPE_STR
+        dir_symlink_info['symlink_target_path'] = f"Error: {e_link_ops}"
+    return dir_symlink_info
+
+
+def _stat_symlink_target(target_path, target_cache, counters, sibling_stats=None):
+    """
+    stat() of a symlink's absolute target path, following further links: one call answers
+    exists / is_file / is_dir / size together. Returns None if the target does not exist (the
+    errnos pathlib's exists() treats as missing); other errors raise OSError.
+    The result comes from sibling_stats (lstat results of the regular files in the link's own
+    directory, keyed by path) or the scan's TargetStatCache when possible.
+    """
+    target_key = str(target_path)
+    if sibling_stats:
+        sibling_stat = sibling_stats.get(target_key)
+        if sibling_stat is not None:
+            counters.symlink_target_lookups += 1
+            counters.symlink_target_record_hits += 1
+            return sibling_stat
+    try:
+        return target_cache.stat(target_key, counters)
+    except OSError as e_target:
+        if e_target.errno not in _TARGET_MISSING_ERRNOS:
+            raise
+        return None
+
+
+def _fill_file_symlink_target(entry, file_info, target_cache, counters, sibling_stats=None):
+    """
+    Fills the symlink_* fields of a file symlink record.
+    One stat() of the target (see _stat_symlink_target) answers exists / is_file / is_dir / target size together.
+    """
+    file_path = file_info['path']
+    try:
+        target_path_str = os.readlink(entry.path)
+        immediate_absolute_target = get_absolute_target_path(file_path, target_path_str)
+        file_info['symlink_target_path'] = immediate_absolute_target
+        target_stat = _stat_symlink_target(immediate_absolute_target, target_cache, counters, sibling_stats)
+        if target_stat is None:
+            file_info['symlink_target_type'] = ".<broken>"
+            file_info['type'] = BROKEN_SYMLINK_TYPE_STR
+            return
+        if stat.S_ISREG(target_stat.st_mode):
+            file_info['symlink_target_size_bytes'] = target_stat.st_size
+            file_info['symlink_target_type'] = get_type_from_suffix(immediate_absolute_target)
+        else:
+            file_info['symlink_target_type'] = ".<target_not_file>"
+            if stat.S_ISDIR(target_stat.st_mode):
+                file_info['type'] = SYMLINK_TO_DIR_TYPE_STR
+            else:
+                file_info['type'] = ".<symlink_to_special>"
+    except OSError as e_link:
+        progress.warn(f"OSError processing file symlink target {file_path}: {e_link}")
+        file_info['type'] = SYMLINK_ERROR_TYPE_STR
+        file_info['symlink_target_path'] = f"Error: {e_link}"
+
+
+def _process_file_entry(entry, os_name):
+    """
+    Builds a file record from an os.DirEntry that os.walk would have listed under 'files'.
+    Returns (file_info, ok); ok is False when the entry itself could not be stat'ed.
+    The target fields of a file symlink are left for _fill_file_symlink_target.
+    """
+    file_path = pathlib.Path(entry.path)
+    file_info = _new_file_info(file_path, entry.name)
+    try:
+        lstat_info = entry.stat(follow_symlinks=False)
+        file_info['is_hidden'] = is_hidden_entry(entry, os_name)
+        file_info['size_bytes'] = lstat_info.st_size
+        _fill_disk_usage(file_info, lstat_info)
+
+        if stat.S_ISLNK(lstat_info.st_mode):
+            file_info['is_symlink'] = True
+            file_info['type'] = SYMLINK_TYPE_STR
+        elif stat.S_ISREG(lstat_info.st_mode):
+            file_info['type'] = get_type_from_suffix(file_path)
+        else: # Non-regular file type (fifo, socket, device...)
+            file_info['type'] = NON_FILE_TYPE_STR
+            progress.warn(f"Warning: Non-regular file '{file_path}' (mode: {oct(lstat_info.st_mode)}) found.")
+    except OSError as e_stat:
+        progress.warn(f"OSError during main processing of {file_path}: {e_stat}. Skipping.")
+        file_info['type'] = ERROR_TYPE_STR # Mark as error
+        file_info['is_hidden'] = False
+        return file_info, False
+    return file_info, True
+
+
+def _directory_key(stat_result):
+    """(st_dev, st_ino, st_mtime_ns) of a directory: unchanged key means an unchanged list of entries."""
+    return stat_result.st_dev, stat_result.st_ino, stat_result.st_mtime_ns
+
+
+def _root_directory_item(root):
+    """Pending-directory item (path, directory key) for the scan root."""
+    if not config.INCREMENTAL_SCAN:
+        return root, None
+    try:
+        return root, _directory_key(os.stat(root))
+    except OSError:
+        return root, None
+
+
+def _subdirectory_item(entry):
+    """Pending-directory item (path, directory key) for a subdirectory found while listing its parent."""
+    if not config.INCREMENTAL_SCAN:
+        return entry.path, None
+    try:
+        return entry.path, _directory_key(entry.stat(follow_symlinks=False))
+    except OSError:
+        return entry.path, None
+
+
+def _carry_over_directory(root, dir_key, previous, carried, counters, all_files_data, directory_symlinks_data):
+    """
+    Incremental rescan of a directory whose key matches the previous snapshot: its file records and
+    directory symlinks are copied from the snapshot, and the listing is only used to find the
+    real subdirectories (non-symlinks whose d_type says directory, so no stat per entry).
+    """
+    rows, dir_symlinks = carried
+    try:
+        with os.scandir(root) as scandir_it:
+            subdirectories = [_subdirectory_item(entry) for entry in scandir_it
+                              if entry.is_dir(follow_symlinks=False)]
+    except OSError as os_error:
+        progress.warn(f"Access denied or error reading directory: {os_error.filename}. Skipping.")
+        counters.skipped_access_errors += 1
+        return None
+
+    counters.visited_roots += 1
+    all_files_data.record_directory(root, dir_key)
+    previous_store = previous.store
+    for row in rows:
+        all_files_data.copy_row_from(previous_store, row)
+        counters.total_files_processed += 1
+        counters.add_file(previous_store[row])
+    for dir_symlink_info in dir_symlinks:
+        directory_symlinks_data.append(dir_symlink_info)
+        counters.total_dir_symlinks_found += 1
+        counters.add_entry(dir_symlink_info)
+    return subdirectories
+
+
+def _scan_one_directory(item, os_name, counters, all_files_data, directory_symlinks_data, previous=None,
+                        target_cache=None):
+    """
+    Lists one directory with os.scandir and records its file entries and directory symlinks.
+    item is a (path, directory key) pair; the key is None unless config.INCREMENTAL_SCAN is on.
+    With a PreviousSnapshot, directories whose key is unchanged are carried over instead.
+    File symlink targets are resolved once the whole directory has been listed, so links to
+    regular files in the same directory reuse those files' lstat results; other targets go through
+    target_cache (the scan's TargetStatCache; without one every lookup calls stat()).
+    Returns the (path, directory key) items of the real subdirectories to descend into
+    (in listing order), or None if the directory could not be read.
+    """
+    root, dir_key = item
+    if previous is not None and dir_key is not None:
+        carried = previous.unchanged_entries(root, dir_key)
+        if carried is not None:
+            return _carry_over_directory(root, dir_key, previous, carried, counters, all_files_data,
+                                         directory_symlinks_data)
+
+    try:
+        with os.scandir(root) as scandir_it:
+            entries = list(scandir_it)
+    except OSError as os_error:
+        progress.warn(f"Access denied or error reading directory: {os_error.filename}. Skipping.")
+        counters.skipped_access_errors += 1
+        return None
+
+    counters.visited_roots += 1
+    if dir_key is not None:
+        all_files_data.record_directory(root, dir_key)
+    subdirectories = []
+    file_records = []  # (entry, file_info, ok), in listing order
+    has_file_symlinks = False
+    for entry in entries:
+        # Same classification as os.walk: is_dir() follows symlinks, errors count as "not a dir".
+        try:
+            entry_is_dir = entry.is_dir()
+        except OSError:
+            entry_is_dir = False
+
+        if entry_is_dir:
+            try:
+                entry_is_symlink = entry.is_symlink()
             except OSError as e_os:
-                print(f"\nOSError processing directory entry: {dir_path_obj}. Error: {e_os}. Skipping this entry.", file=sys.stderr)
-                skipped_access_errors += 1
-                continue # Skip to the next dir_name in dirs
-
-        # If you were modifying `dirs` in place for topdown=True traversal pruning,
-        # you would do: `dirs[:] = processed_dirs_this_iteration`
-        # But since we are just reading, it's not strictly necessary here.
-
-        # Process file entries
-        for name in files:
-            final_total_files_processed += 1
-            total_files_processed_in_walk +=1
-            file_path = current_path_obj / name
-            file_info = {
-                'path': file_path, 'name': name, 'is_symlink': False, 'is_hidden': False,
-                'symlink_target_path': None, 'symlink_target_type': None,
-                'symlink_target_size_bytes': None, 'size_bytes': 0, 'type': ERROR_TYPE_STR
-            }
+                progress.warn(f"OSError processing directory entry: {entry.path}. Error: {e_os}. Skipping this entry.")
+                counters.skipped_access_errors += 1
+                continue
+            if entry_is_symlink:
+                counters.total_dir_symlinks_found += 1
+                dir_symlink_info = _process_dir_symlink_entry(entry, os_name)
+                directory_symlinks_data.append(dir_symlink_info)
+                counters.add_entry(dir_symlink_info)
+            else:
+                subdirectories.append(_subdirectory_item(entry))
+            continue
+
+        counters.total_files_processed += 1
+        file_info, ok = _process_file_entry(entry, os_name)
+        file_records.append((entry, file_info, ok))
+        has_file_symlinks = has_file_symlinks or file_info['is_symlink']
+
+    if has_file_symlinks:
+        if target_cache is None:
+            target_cache = _UNCACHED_TARGET_STATS
+        # lstat results are cached on the DirEntry objects, so this costs no system calls
+        sibling_stats = {entry.path: entry.stat(follow_symlinks=False) for entry, file_info, ok in file_records
+                         if ok and not file_info['is_symlink'] and file_info['type'] != NON_FILE_TYPE_STR}
+        for entry, file_info, ok in file_records:
+            if ok and file_info['is_symlink']:
+                _fill_file_symlink_target(entry, file_info, target_cache, counters, sibling_stats)
+
+    for entry, file_info, ok in file_records:
+        all_files_data.append(file_info, parent_dir=root)
+        if ok:
+            counters.add_file(file_info)
+        else:
+            counters.skipped_access_errors += 1
+            counters.add_error_entry(file_info)
+
+    return subdirectories
+
+
+def _scan_subtree(item, os_name, counters, all_files_data, directory_symlinks_data, target_cache=None):
+    """Scans a whole subtree with _scan_one_directory, depth-first in os.walk order, without progress output."""
+    pending_dirs = [item]
+    while pending_dirs:
+        subdirectories = _scan_one_directory(pending_dirs.pop(), os_name, counters, all_files_data, directory_symlinks_data,
+                                             target_cache=target_cache)
+        if subdirectories:
+            pending_dirs.extend(reversed(subdirectories))
+
+
+def _checkpoint_state(pending_dirs, counters, directory_tree, inode_set):
+    """
+    Scanner state saved with a stream checkpoint: the pending-directory stack, the running totals,
+    the directory tree of the records written so far and the hard-linked inodes seen so far.
+    """
+    return {'pending_dirs': pending_dirs, 'counters': counters.to_state(), 'directory_tree': directory_tree.to_state(),
+            'inode_set': inode_set.to_state()}
+
+
+def _restore_checkpoint_state(state, abs_directory_path):
+    """Inverse of _checkpoint_state. Returns (pending_dirs, counters, directory_tree, inode_set)."""
+    pending_dirs = [(path, tuple(dir_key) if dir_key is not None else None) for path, dir_key in state['pending_dirs']]
+    if 'directory_tree' in state:
+        directory_tree = DirectoryTree.from_state(state['directory_tree'])
+    else:  # Checkpoint written before the tree was saved with it: only the rest of the scan is rolled up
+        directory_tree = DirectoryTree(abs_directory_path)
+    if 'inode_set' in state:
+        inode_set = InodeSet.from_state(state['inode_set'])
+    else:  # Older checkpoint: links whose first link was written before it are counted as first links again
+        inode_set = InodeSet()
+    return pending_dirs, ScanCounters.from_state(state['counters']), directory_tree, inode_set
+
+
+def _analyze_directory_scandir(abs_directory_path, os_name, previous=None, scan_stream=None):
+    """
+    os.scandir based engine. Visits directories in the same top-down order as os.walk,
+    but takes the entry type, symlink flag and lstat result from the cached DirEntry data
+    instead of asking the filesystem again through pathlib.
+
+    With a scan_stream, the records collected so far are handed to it whenever
+    config.SCAN_STREAM_CHUNK_RECORDS have accumulated or config.SCAN_CHECKPOINT_INTERVAL_SECONDS
+    have passed, followed by a checkpoint of the pending directories and counters. Chunks are
+    only cut between directories, so a checkpoint always matches the records written before it.
+    Each chunk is added to the scan's DirectoryTree before it is written, since the records are
+    not kept in memory.
+    """
+    all_files_data = FileRecordStore()
+    directory_symlinks_data = []
+    counters = ScanCounters()
+    target_cache = TargetStatCache()
+    chain_resolver = SymlinkChainResolver()
+    inode_set = InodeSet()
+
+    pending_dirs = [_root_directory_item(str(abs_directory_path))]  # Stack of directories still to list
+    directory_tree = DirectoryTree(abs_directory_path) if scan_stream is not None else None
+    if scan_stream is not None and scan_stream.checkpoint_state is not None:
+        pending_dirs, counters, directory_tree, inode_set = _restore_checkpoint_state(
+            scan_stream.checkpoint_state, abs_directory_path)
+        print(f"Resuming interrupted scan: {counters.visited_roots} directories and "
+              f"{counters.total_files_processed} file entries already scanned, {len(pending_dirs)} directories pending.")
+    last_checkpoint_time = time.monotonic()
+
+    with progress.ProgressReporter(counters.progress_sample):
+        while pending_dirs:
+            item = pending_dirs.pop()
+            subdirectories = _scan_one_directory(item, os_name, counters, all_files_data, directory_symlinks_data,
+                                                 previous, target_cache)
+            if subdirectories is None:
+                continue
+
+            # Reversed so the first listed subdirectory is popped (and walked) first, like os.walk.
+            pending_dirs.extend(reversed(subdirectories))
+
+            # --- Streamed save: flush the chunk and checkpoint ---
+            if scan_stream is not None and (
+                    len(all_files_data) + len(directory_symlinks_data) >= config.SCAN_STREAM_CHUNK_RECORDS
+                    or time.monotonic() - last_checkpoint_time >= config.SCAN_CHECKPOINT_INTERVAL_SECONDS):
+                _resolve_symlink_chains(chain_resolver, counters, all_files_data, directory_symlinks_data)
+                _count_hard_links(inode_set, counters, all_files_data, directory_symlinks_data)
+                directory_tree.add_records(all_files_data)
+                scan_stream.write_chunk(all_files_data, directory_symlinks_data)
+                scan_stream.checkpoint(_checkpoint_state(pending_dirs, counters, directory_tree, inode_set))
+                all_files_data = FileRecordStore()
+                directory_symlinks_data = []
+                last_checkpoint_time = time.monotonic()
+
+    _print_scan_complete(counters)
+    _resolve_symlink_chains(chain_resolver, counters, all_files_data, directory_symlinks_data)
+    _count_hard_links(inode_set, counters, all_files_data, directory_symlinks_data)
+
+    summary_data = counters.to_summary_data(abs_directory_path)
+
+    if scan_stream is not None:
+        directory_tree.add_records(all_files_data)
+        summary_data['directory_tree'] = directory_tree.finish().summary()
+        scan_stream.write_chunk(all_files_data, directory_symlinks_data)
+        all_files_data, directory_symlinks_data = scan_stream.finish(summary_data, str(abs_directory_path),
+                                                                     directory_tree)
+        print(f"Scan data streamed to: {scan_stream.filepath}")
+
+    return all_files_data, directory_symlinks_data, summary_data
+
+
+class _DirectoryRecords(list):
+    """
+    Record sink for _scan_one_directory in the aggregation pipeline: a plain list of the record
+    dicts of one directory, accepting the FileRecordStore calls the scanner makes.
+    """
+
+    def append(self, record, parent_dir=None):
+        super().append(record)
+
+    def record_directory(self, directory, dir_key):
+        pass
+
+
+def iter_scan_entries(abs_directory_path, os_name, counters):
+    """
+    Generator stage of the streaming aggregation pipeline (config.STREAMING_AGGREGATION).
+    Walks the tree like the scandir engine and yields (record, is_dir_symlink) for every file-like
+    entry and directory symlink, one directory at a time, so only the records of the directory
+    being listed are in memory. counters is filled as the scan goes (summary_data totals).
+    """
+    pending_dirs = [_root_directory_item(str(abs_directory_path))]  # Stack of directories still to list
+    target_cache = TargetStatCache()
+
+    while pending_dirs:
+        item = pending_dirs.pop()
+        files_data = _DirectoryRecords()
+        directory_symlinks_data = []
+        subdirectories = _scan_one_directory(item, os_name, counters, files_data, directory_symlinks_data,
+                                             target_cache=target_cache)
+        if subdirectories is None:
+            continue
+
+        pending_dirs.extend(reversed(subdirectories))
+
+        for file_info in files_data:
+            yield file_info, False
+        for dir_symlink_info in directory_symlinks_data:
+            yield dir_symlink_info, True
+
+
+def aggregate_directory(directory_path, os_name, aggregators):
+    """
+    Streaming aggregation mode: scans the directory through iter_scan_entries and feeds every
+    record to the given aggregators (see aggregators.py) instead of collecting all_files_data.
+    Memory stays proportional to what the aggregators keep, not to the number of files (the
+    SymlinkChainResolver resolving symlink chains on the way remembers one entry per link).
+
+    Returns summary_data, identical to the one analyze_directory returns for the same tree.
+    """
+    print(f"Starting analysis of: {directory_path}")
+    abs_directory_path = pathlib.Path(directory_path).resolve()
+    print(f"Analyzing: {abs_directory_path} (streaming aggregation, records are not kept)")
+
+    counters = ScanCounters()
+    inode_set = InodeSet()
+    directory_tree = DirectoryTree(abs_directory_path)  # One node per directory, not per file
+    chain_resolver = SymlinkChainResolver()
+    with progress.ProgressReporter(counters.progress_sample):
+        for record, is_dir_symlink in iter_scan_entries(abs_directory_path, os_name, counters):
+            if record['is_symlink']:
+                with instrumentation.phase("scan.symlink_chains"):
+                    _resolve_record_chain(chain_resolver, counters, record)
+            if record['inode'] is not None:
+                counters.add_hard_link(record, inode_set.add(record['inode']))
+            if is_dir_symlink:
+                for aggregator in aggregators:
+                    aggregator.add_dir_symlink(record)
+            else:
+                directory_tree.add_record(record)
+                for aggregator in aggregators:
+                    aggregator.add_file(record)
+
+    _print_scan_complete(counters)
+    summary_data = counters.to_summary_data(abs_directory_path)
+    summary_data['directory_tree'] = directory_tree.finish().summary()
+    return summary_data
+
+
+class _WorkStealingWalker:
+    """
+    Runs _scan_one_directory on a pool of threads.
+
+    Every worker owns a deque of directories still to list. A worker pushes the subdirectories
+    it finds onto the tail of its own deque and pops from the tail (depth-first, good locality);
+    when its deque is empty it steals from the head of another worker's deque, which holds the
+    oldest and usually largest subtrees. deque append/pop/popleft are atomic in CPython, so the
+    deques need no lock; only the count of outstanding directories (queued or being listed) is
+    guarded, and the scan is finished when it drops to zero.
+
+    Each worker fills its own record lists and ScanCounters, which are merged once all workers stop.
+
+    Several roots can share one pool (batch mode): queued directories are tagged with the index of
+    their root and every worker keeps separate records and counters per root. The roots are handed
+    out round-robin, the first ones on top of each worker's deque, so give them largest first.
+    nested_roots maps the paths of further roots that lie inside the scanned roots to their index
+    (numbered after root_items): their subtrees are scanned once, as part of the enclosing root's
+    walk, but recorded under their own index.
+    """
+
+    def __init__(self, root_items, os_name, num_workers, previous=None, nested_roots=None):
+        self.os_name = os_name
+        self.previous = previous
+        self.nested_roots = nested_roots or {}
+        self.num_workers = max(1, num_workers)
+        self.num_roots = len(root_items) + len(self.nested_roots)
+        self.deques = [collections.deque() for _ in range(self.num_workers)]
+        self.counters = [[ScanCounters() for _ in range(self.num_roots)] for _ in range(self.num_workers)]
+        self.files_data = [[FileRecordStore() for _ in range(self.num_roots)] for _ in range(self.num_workers)]
+        self.dir_symlinks_data = [[[] for _ in range(self.num_roots)] for _ in range(self.num_workers)]
+        self.target_cache = TargetStatCache()  # Shared by all workers
+        self.errors = []
+
+        self._condition = threading.Condition()
+        self._outstanding = len(root_items)
+        self._idle_workers = 0
+        self._done = not root_items
+        for root_idx, root_item in enumerate(root_items):
+            self.deques[root_idx % self.num_workers].appendleft((root_idx, root_item))
+
+    def _next_directory(self, worker_idx):
+        own = self.deques[worker_idx]
+        while True:
+            try:
+                return own.pop()
+            except IndexError:
+                pass
+            for offset in range(1, self.num_workers):
+                victim = self.deques[(worker_idx + offset) % self.num_workers]
+                try:
+                    return victim.popleft()
+                except IndexError:
+                    continue
+            with self._condition:
+                if self._done:
+                    return None
+                self._idle_workers += 1
+                self._condition.wait(timeout=0.05)
+                self._idle_workers -= 1
+
+    def _push_directories(self, own, subdirectories):
+        # Count them as outstanding before they become visible to thieves, otherwise a thief could
+        # finish one and drive the count to zero while this worker's parent directory is still open.
+        with self._condition:
+            self._outstanding += len(subdirectories)
+        # Reversed so the first listed subdirectory is popped first, like the serial engine.
+        own.extend(reversed(subdirectories))
+        if self._idle_workers:
+            with self._condition:
+                self._condition.notify(len(subdirectories))
+
+    def _finish_directory(self):
+        with self._condition:
+            self._outstanding -= 1
+            if self._outstanding == 0:
+                self._done = True
+                self._condition.notify_all()
+
+    def _worker(self, worker_idx):
+        own = self.deques[worker_idx]
+        nested_roots = self.nested_roots
+        while True:
+            tagged_item = self._next_directory(worker_idx)
+            if tagged_item is None:
+                return
+            root_idx, item = tagged_item
+            counters = self.counters[worker_idx][root_idx]
             try:
-                file_info['is_hidden'] = is_hidden(file_path, os_name)
-                lstat_info = file_path.lstat()
-
-                # Logic for symlinks to files (as before)
-                if file_path.is_symlink():
-                    file_info['is_symlink'] = True
-                    file_info['size_bytes'] = lstat_info.st_size
-                    file_info['type'] = SYMLINK_TYPE_STR
+                subdirectories = _scan_one_directory(item, self.os_name, counters, self.files_data[worker_idx][root_idx],
+                                                     self.dir_symlinks_data[worker_idx][root_idx], self.previous,
+                                                     self.target_cache)
+                if subdirectories:
+                    self._push_directories(own, [(nested_roots.get(subdirectory[0], root_idx), subdirectory)
+                                                 for subdirectory in subdirectories])
+            except Exception as e:  # Never leave the outstanding count stuck on an unexpected error
+                self.errors.append((item[0], e))
+                counters.skipped_access_errors += 1
+            finally:
+                self._finish_directory()
+
+    def progress_sample(self):
+        """Totals of all workers and roots so far, for the progress display (read while the workers run)."""
+        samples = [c.progress_sample() for worker_counters in self.counters for c in worker_counters]
+        return progress.ProgressSample(*(sum(values) for values in zip(*samples)))
+
+    def run(self):
+        """
+        Scans the tree(s) and returns one (all_files_data, directory_symlinks_data, merged ScanCounters)
+        per root index: the entries recorded under that index only, without those of nested roots.
+        """
+        threads = [threading.Thread(target=self._worker, args=(i,), name=f"scan-worker-{i}", daemon=True)
+                   for i in range(self.num_workers)]
+        with progress.ProgressReporter(self.progress_sample):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        for root, error in self.errors:
+            print(f"\nUnexpected error while scanning {root}: {error!r}. Skipping.", file=sys.stderr)
+
+        results = []
+        for root_idx in range(self.num_roots):
+            merged = ScanCounters()
+            all_files_data = FileRecordStore()
+            directory_symlinks_data = []
+            for worker_idx in range(self.num_workers):
+                merged.merge(self.counters[worker_idx][root_idx])
+                all_files_data.extend(self.files_data[worker_idx][root_idx])
+                directory_symlinks_data.extend(self.dir_symlinks_data[worker_idx][root_idx])
+            results.append((all_files_data, directory_symlinks_data, merged))
+        return results
+
+
+def _analyze_directory_threaded(abs_directory_path, os_name, previous=None):
+    """
+    Multi-threaded variant of the scandir engine (see _WorkStealingWalker).
+    Produces the same records and summary as the serial engines; only the order of the
+    records (and of equal-count entries in the summary tables) can differ.
+    """
+    num_workers = config.SCAN_WORKER_THREADS or min(32, (os.cpu_count() or 1) * 4)
+    print(f"Scanning with {num_workers} worker threads.")
+    start_time = time.perf_counter()
+
+    walker = _WorkStealingWalker([_root_directory_item(str(abs_directory_path))], os_name, num_workers, previous)
+    all_files_data, directory_symlinks_data, counters = walker.run()[0]
+    _resolve_symlink_chains(SymlinkChainResolver(), counters, all_files_data, directory_symlinks_data)
+    _count_hard_links(InodeSet(), counters, all_files_data, directory_symlinks_data)
+
+    _print_scan_complete(counters)
+    print(f"Threaded scan took {time.perf_counter() - start_time:.2f} s.")
+
+    summary_data = counters.to_summary_data(abs_directory_path)
+
+    return all_files_data, directory_symlinks_data, summary_data
+
+
+def find_enclosing_roots(abs_paths):
+    """
+    For resolved root paths (pathlib.Path), returns {path: enclosing root} for every root that lies
+    inside another one of the roots (the innermost enclosing root). Duplicate paths are not nested.
+    """
+    roots = set(abs_paths)
+    enclosing = {}
+    for path in roots:
+        for parent in path.parents:
+            if parent in roots:
+                enclosing[path] = parent
+                break
+    return enclosing
+
+
+def analyze_directories(directory_paths, os_name):
+    """
+    Batch mode: scans several directories with one shared pool of worker threads (the work-stealing
+    walker of the 'threaded' engine, config.SCAN_WORKER_THREADS workers), instead of one scan and
+    one pool per directory. The directories are started in the given order, so pass them largest first.
+
+    Paths that resolve to the same directory are scanned once, and a directory inside another given
+    directory (e.g. /home and /) is scanned only once, as part of the enclosing one's walk; each
+    still gets its own complete result.
+
+    Returns (results, rollup_summary_data): one (all_files_data, directory_symlinks_data, summary_data)
+    per given path, in the given order (the same objects for paths resolving to the same directory),
+    and one summary_data over all the directories, counting the entries of overlapping ones once.
+    """
+    abs_paths = [pathlib.Path(directory_path).resolve() for directory_path in directory_paths]
+    unique_paths = list(dict.fromkeys(abs_paths))
+    enclosing = find_enclosing_roots(unique_paths)
+    for path in unique_paths:
+        if path in enclosing:
+            print(f"{path} is inside {enclosing[path]}; it is scanned as part of that directory.")
+    if len(unique_paths) < len(abs_paths):
+        print(f"{len(abs_paths) - len(unique_paths)} duplicate directories are scanned once.")
+
+    # Root indices: the top-level directories (started in the given order), then the nested ones
+    ordered_paths = [path for path in unique_paths if path not in enclosing] + [path for path in unique_paths if path in enclosing]
+    root_index = {path: root_idx for root_idx, path in enumerate(ordered_paths)}
+    num_top_level = len(unique_paths) - len(enclosing)
+
+    num_workers = config.SCAN_WORKER_THREADS or min(32, (os.cpu_count() or 1) * 4)
+    print(f"Scanning {num_top_level} directories with {num_workers} shared worker threads.")
+    start_time = time.perf_counter()
+
+    walker = _WorkStealingWalker([_root_directory_item(str(path)) for path in ordered_paths[:num_top_level]],
+                                 os_name, num_workers,
+                                 nested_roots={str(path): root_index[path] for path in ordered_paths[num_top_level:]})
+    own_results = walker.run()
+
+    chain_resolver = SymlinkChainResolver()
+    inode_set = InodeSet()  # Shared, so a file linked under several roots counts once in the roll-up
+    rollup_counters = ScanCounters()
+    for all_files_data, directory_symlinks_data, counters in own_results:
+        _resolve_symlink_chains(chain_resolver, counters, all_files_data, directory_symlinks_data)
+        _count_hard_links(inode_set, counters, all_files_data, directory_symlinks_data)
+        rollup_counters.merge(counters)
+    _print_scan_complete(rollup_counters)
+    print(f"Batch scan took {time.perf_counter() - start_time:.2f} s.")
+
+    # A directory's result is its own entries plus those recorded under the roots nested in it
+    results_by_path = {}
+    for path in ordered_paths:
+        parts = [own_results[root_index[other]] for other in ordered_paths
+                 if other == path or path in other.parents]
+        if len(parts) == 1:
+            all_files_data, directory_symlinks_data, counters = parts[0]
+        else:
+            all_files_data, directory_symlinks_data, counters = FileRecordStore(), [], ScanCounters()
+            for part_files, part_dir_symlinks, part_counters in parts:
+                all_files_data.extend(part_files)
+                directory_symlinks_data.extend(part_dir_symlinks)
+                counters.merge(part_counters)
+        summary_data = counters.to_summary_data(path)
+        all_files_data.directory_tree = DirectoryTree.from_records(path, all_files_data)
+        summary_data['directory_tree'] = all_files_data.directory_tree.summary()
+        results_by_path[path] = (all_files_data, directory_symlinks_data, summary_data)
+
+    rollup_summary_data = rollup_counters.to_summary_data(", ".join(str(path) for path in ordered_paths[:num_top_level]))
+    return [results_by_path[path] for path in abs_paths], rollup_summary_data
+
+
+# Split the target until there are this many subtrees per worker process (small ones balance better) ...
+_SUBTREES_PER_PROCESS = 4
+# ... but never list more than this many directory levels in the parent process.
+_MAX_SPLIT_DEPTH = 3
+
+
+def _scan_subtree_in_worker(item, os_name):
+    """
+    Worker-process side of the 'process' engine. Scans one subtree and publishes its records,
+    encoded with record_codec, in a new shared memory block.
+    Returns (shared memory name, payload size, ScanCounters); the parent unlinks the block.
+    """
+    all_files_data = FileRecordStore()
+    directory_symlinks_data = []
+    counters = ScanCounters()
+    _scan_subtree(item, os_name, counters, all_files_data, directory_symlinks_data, TargetStatCache())
+
+    payload = record_codec.encode_records(all_files_data, directory_symlinks_data)
+    del all_files_data, directory_symlinks_data
+    shm = shared_memory.SharedMemory(create=True, size=len(payload))
+    try:
+        shm.buf[:len(payload)] = payload
+        shm_name = shm.name
+    finally:
+        shm.close()
+    # Ownership passes to the parent, which unlinks the block; without this the resource tracker
+    # would also try to clean it up (and warn about a "leak") when the pool shuts down.
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm_name, len(payload), counters
+
+
+def _collect_shared_records(shm_name, size):
+    """Decodes and releases a shared memory block written by _scan_subtree_in_worker."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return record_codec.decode_records(shm.buf[:size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _split_into_subtrees(root_item, os_name, min_subtrees, counters, all_files_data, directory_symlinks_data):
+    """
+    Lists the top levels of the tree in this process, breadth first, until there are at least
+    min_subtrees unvisited directories (or _MAX_SPLIT_DEPTH levels were listed).
+    Entries of the listed directories are recorded directly; the returned directories are not visited yet.
+    """
+    frontier = [root_item]
+    target_cache = TargetStatCache()
+    for _ in range(_MAX_SPLIT_DEPTH):
+        if len(frontier) >= min_subtrees:
+            break
+        next_frontier = []
+        for directory in frontier:
+            subdirectories = _scan_one_directory(directory, os_name, counters, all_files_data, directory_symlinks_data,
+                                                 target_cache=target_cache)
+            if subdirectories:
+                next_frontier.extend(subdirectories)
+        frontier = next_frontier
+    return frontier
+
+
+def _analyze_directory_processes(abs_directory_path, os_name):
+    """
+    Multi-process engine. The top of the tree is split into subtrees that are scanned in a pool
+    of worker processes, so the per-entry Python work is not serialized by the GIL.
+    Workers send their records back through multiprocessing.shared_memory in the compact
+    record_codec format instead of pickling millions of dicts; only the small ScanCounters are
+    pickled, and they are merged into one summary_data here.
+    """
+    num_workers = config.SCAN_WORKER_PROCESSES or os.cpu_count() or 1
+    start_time = time.perf_counter()
+
+    all_files_data = FileRecordStore()
+    directory_symlinks_data = []
+    counters = ScanCounters()
+    subtrees = _split_into_subtrees(_root_directory_item(str(abs_directory_path)), os_name, num_workers * _SUBTREES_PER_PROCESS,
+                                    counters, all_files_data, directory_symlinks_data)
+    print(f"Scanning {len(subtrees)} subtrees with {num_workers} worker processes.")
+
+    if subtrees:
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            futures = {pool.submit(_scan_subtree_in_worker, item, os_name): item[0] for item in subtrees}
+            # Started once the workers are forked; the totals grow as their subtrees complete
+            with progress.ProgressReporter(counters.progress_sample):
+                for future in as_completed(futures):
                     try:
-                        target_path_str = os.readlink(file_path)
-
-                        # Use the new helper function
-                        immediate_absolute_target = get_absolute_target_path(file_path, target_path_str)
-                        file_info['symlink_target_path'] = immediate_absolute_target
-                        if immediate_absolute_target.exists():
-                            if immediate_absolute_target.is_file():
-                                target_stat = immediate_absolute_target.stat()
-                                file_info['symlink_target_size_bytes'] = target_stat.st_size
-                                file_info['symlink_target_type'] = immediate_absolute_target.suffix.lower() if immediate_absolute_target.suffix else NO_EXTENSION_STR
-                            else:
-                                file_info['symlink_target_type'] = ".<target_not_file>"
-                                if immediate_absolute_target.is_dir():
-                                     file_info['type'] = SYMLINK_TO_DIR_TYPE_STR
-                                else:
-                                     file_info['type'] = ".<symlink_to_special>"
-                        else:
-                            file_info['symlink_target_type'] = ".<broken>"
-                            file_info['type'] = BROKEN_SYMLINK_TYPE_STR
-                    except RuntimeError as e_runtime:
-                        print(f"\nRuntimeError processing file symlink target {file_path}: {e_runtime}", file=sys.stderr)
-                        file_info['type'] = SYMLINK_ERROR_TYPE_STR
-                        file_info['symlink_target_path'] = f"Error: {e_runtime}"
-                    except OSError as e_link:
-                        print(f"\nOSError processing file symlink target {file_path}: {e_link}", file=sys.stderr)
-                        file_info['type'] = SYMLINK_ERROR_TYPE_STR
-                        file_info['symlink_target_path'] = f"Error: {e_link}"
-                else: # Not a symlink
-                    if (lstat_info.st_mode & 0o170000) == 0o100000:
-                        file_info['size_bytes'] = lstat_info.st_size
-                        file_info['type'] = file_path.suffix.lower() if file_path.suffix else NO_EXTENSION_STR
-                    else: # Non-regular file type from 'files' list
-                        file_info['size_bytes'] = lstat_info.st_size
-                        file_info['type'] = NON_FILE_TYPE_STR
-                        print(f"\nWarning: Non-regular file '{file_path}' (mode: {oct(lstat_info.st_mode)}) found.", file=sys.stderr)
-
-                # EXTREMELY_LARGE_THRESHOLD = 10**12 # 1 TB, adjust as needed
-                #
-                # if file_info['size_bytes'] > EXTREMELY_LARGE_THRESHOLD:
-                #     print(f"\n[DEBUG] Extremely large file detected: "
-                #           f"Path: {file_info['path']}, Size: {file_info['size_bytes']} bytes, "
-                #           f"Type: {file_info['type']}, IsSymlink: {file_info['is_symlink']}", file=sys.stderr)
-                #     if file_info['is_symlink']:
-                #         print(f"          Symlink Target: {file_info.get('symlink_target_path')}", file=sys.stderr)
-                #         print(f"          Symlink Target Size: {file_info.get('symlink_target_size_bytes')}", file=sys.stderr)
-                #     return None, None, None
-
-                all_files_data.append(file_info)
-                # General aggregation
-                file_types_count[file_info['type']] += 1
-                file_types_size[file_info['type']] += file_info['size_bytes']
-
-                # --- Aggregate hidden file statistics ---
-                # This applies to both regular files and symlinks to files (based on their own hidden status)
-                if file_info['is_hidden']:
-                    total_hidden_files_count += 1
-                    total_hidden_files_size += file_info['size_bytes'] # Use the item's own size
-                    hidden_file_types_count[file_info['type']] += 1
-                    hidden_file_types_size[file_info['type']] += file_info['size_bytes']
-                # ----------------------------------------
-
-            except OSError as e_stat:
-                print(f"\nOSError during main processing of {file_path}: {e_stat}. Skipping.", file=sys.stderr)
-                skipped_access_errors += 1
-                file_info['type'] = ERROR_TYPE_STR # Mark as error
-                # Potentially set is_hidden to False or a special state if stat failed before is_hidden check
-                file_info['is_hidden'] = False # Or some other default on error
-                all_files_data.append(file_info)
-                file_types_count[file_info['type']] +=1 # Count as error type
-                continue
+                        shm_name, size, worker_counters = future.result()
+                        worker_files, worker_dir_symlinks = _collect_shared_records(shm_name, size)
+                    except Exception as e:
+                        progress.warn(f"Error scanning subtree {futures[future]} in worker process: {e!r}. Skipping.")
+                        counters.skipped_access_errors += 1
+                        continue
+                    counters.merge(worker_counters)
+                    all_files_data.extend(worker_files)
+                    directory_symlinks_data.extend(worker_dir_symlinks)
+    _resolve_symlink_chains(SymlinkChainResolver(), counters, all_files_data, directory_symlinks_data)
+    _count_hard_links(InodeSet(), counters, all_files_data, directory_symlinks_data)
 
-            # Progress update for files (as before)
-            if total_files_processed_in_walk % config.PROGRESS_UPDATE_INTERVAL_FILES == 0:
-                print(f"\rScanning {spinner_chars[spinner_idx % len(spinner_chars)]} [{visited_roots} dirs, {total_files_processed_in_walk} files processed]...", end="", flush=True)
-                spinner_idx +=1
-
-    print("\r" + " " * 100 + "\r", end="")
-    print(f"Directory scan complete. Processed {visited_roots} directories and {final_total_files_processed} file entries.")
-
-    summary_data = {
-        "target_directory": str(abs_directory_path),
-        "total_directories_scanned": visited_roots,
-        "total_file_entries_processed": final_total_files_processed,
-        "total_directory_symlinks_found": final_total_dir_symlinks_found,
-        "skipped_access_errors": skipped_access_errors,
-        "file_types_summary": dict(sorted(file_types_count.items(), key=lambda item: item[1], reverse=True)),
-        "file_types_size_summary": dict(file_types_size),
-        "total_hidden_files_count": total_hidden_files_count,
-        "total_hidden_files_size": total_hidden_files_size,
-        "hidden_file_types_summary": dict(sorted(hidden_file_types_count.items(), key=lambda item: item[1], reverse=True)),
-        "hidden_file_types_size_summary": dict(hidden_file_types_size)
-        # --------------------------------------------
-    }
+    _print_scan_complete(counters)
+    print(f"Multi-process scan took {time.perf_counter() - start_time:.2f} s.")
+
+    summary_data = counters.to_summary_data(abs_directory_path)
 
-    return all_files_data, directory_symlinks_data, summary_data
\ No newline at end of file
+    return all_files_data, directory_symlinks_data, summary_data
@@ -0,0 +1,237 @@
+# directory_tree.py
+"""
+Per-directory size roll-up of a scan: how many file entries and bytes every directory holds
+itself, and in its whole subtree (what `du` reports), without a second walk of the tree.
+
+The tree is kept as parallel arrays indexed by node number rather than nested dicts:
+
+    names        entry name of the directory (the full scanned root path for node 0)
+    parents      node number of the parent directory, -1 for the root
+    own_files    file-like entries listed directly in the directory
+    own_bytes    sum of their size_bytes
+    total_files  own_files of the directory and all directories below it
+    total_bytes  own_bytes of the directory and all directories below it
+
+Nodes are created when the first entry of a directory is added, ancestors first, so a parent
+always has a lower node number than its children: finish() rolls the own counts up into the
+totals in one pass over the nodes in reverse order. Directories without any file entry below
+them do not get a node.
+
+While records are added, a bounded min-heap keeps the config.DIRECTORY_TREE_TOP_N largest regular
+files; finish() picks the largest directories by total_bytes the same way. summary() puts both
+lists into summary_data['directory_tree'] for the report, and the arrays themselves are saved
+in the scan file (tree.* sections), so find(), children() and subtree_summary() work on a
+loaded scan without rescanning.
+"""
+import array
+import heapq
+import os
+
+import config
+from record_store import FLAG_IS_SYMLINK, FileRecordStore
+
+
+class DirectoryTree:
+    """Directory roll-up of one scanned root (see the module docstring)."""
+
+    def __init__(self, root, top_n=None):
+        self.top_n = config.DIRECTORY_TREE_TOP_N if top_n is None else top_n
+        self.names = [str(root)]
+        self.parents = array.array('q', [-1])
+        self.own_files = array.array('Q', [0])
+        self.own_bytes = array.array('q', [0])
+        self.total_files = None  # Filled by finish()
+        self.total_bytes = None
+        self._largest_files = []  # Min-heap of (size_bytes, path string), at most top_n entries
+        self._nodes = {str(root): 0}  # Directory path string -> node; rebuilt on demand for loaded trees
+
+    @classmethod
+    def from_columns(cls, names, parents, own_files, own_bytes, total_files, total_bytes):
+        """Builds a finished tree around the columns of a scan file (arrays or memoryviews) without copying them."""
+        tree = cls(names[0])
+        tree.names = names
+        tree.parents = parents
+        tree.own_files = own_files
+        tree.own_bytes = own_bytes
+        tree.total_files = total_files
+        tree.total_bytes = total_bytes
+        tree._nodes = None
+        return tree
+
+    @classmethod
+    def from_records(cls, root, all_files_data, top_n=None):
+        """Builds and finishes the tree of a FileRecordStore or list of record dicts."""
+        tree = cls(root, top_n)
+        tree.add_records(all_files_data)
+        tree.finish()
+        return tree
+
+    # --- Building ---
+
+    def _node(self, directory):
+        """Node of a directory path string, created (with its missing ancestors) if needed."""
+        nodes = self._path_index()
+        node = nodes.get(directory)
+        if node is not None:
+            return node
+        missing = []
+        while node is None:
+            missing.append(directory)
+            parent_dir = os.path.dirname(directory)
+            if parent_dir == directory:  # Reached the filesystem root outside the scanned root
+                node = -1
+                break
+            directory = parent_dir
+            node = nodes.get(directory)
+        for directory in reversed(missing):
+            self.names.append(os.path.basename(directory) or directory)
+            self.parents.append(node)
+            self.own_files.append(0)
+            self.own_bytes.append(0)
+            node = nodes[directory] = len(self.parents) - 1
+        return node
+
+    def _offer_file(self, size_bytes, path_of):
+        """Keeps a regular file in the top_n heap if it is large enough. path_of() builds its path only then."""
+        if len(self._largest_files) < self.top_n:
+            heapq.heappush(self._largest_files, (size_bytes, path_of()))
+        elif self.top_n and size_bytes > self._largest_files[0][0]:
+            heapq.heapreplace(self._largest_files, (size_bytes, path_of()))
+
+    def add_records(self, all_files_data):
+        """Adds the file-like records of a FileRecordStore (or an iterable of record dicts)."""
+        if not isinstance(all_files_data, FileRecordStore):
+            for record in all_files_data:
+                self.add_record(record)
+            return
+        store = all_files_data
+        node_of_code = {}
+        own_files, own_bytes = self.own_files, self.own_bytes
+        for row, (code, size_bytes, flags) in enumerate(zip(store.dir_idx, store.size_bytes, store.flags)):
+            node = node_of_code.get(code)
+            if node is None:
+                node = node_of_code[code] = self._node(store.directories[code])
+            own_files[node] += 1
+            own_bytes[node] += size_bytes
+            if not flags & FLAG_IS_SYMLINK:
+                self._offer_file(size_bytes, lambda: store.path_string_at(row))
+
+    def add_record(self, record):
+        """Adds one file-like record dict (as fed to the streaming aggregators)."""
+        path = str(record['path'])
+        node = self._node(os.path.dirname(path))
+        self.own_files[node] += 1
+        self.own_bytes[node] += record['size_bytes']
+        if not record['is_symlink']:
+            self._offer_file(record['size_bytes'], lambda: path)
+
+    def finish(self):
+        """Computes total_files and total_bytes bottom-up (children always come after their parent)."""
+        self.total_files = array.array('Q', self.own_files)
+        self.total_bytes = array.array('q', self.own_bytes)
+        parents = self.parents
+        for node in range(len(parents) - 1, 0, -1):
+            parent = parents[node]
+            if parent >= 0:
+                self.total_files[parent] += self.total_files[node]
+                self.total_bytes[parent] += self.total_bytes[node]
+        return self
+
+    # --- Checkpoints (config.STREAM_SCAN_TO_DISK) ---
+
+    def to_state(self):
+        """JSON-serializable snapshot of an unfinished tree, for scan checkpoints."""
+        return {
+            'names': self.names,
+            'parents': self.parents.tolist(),
+            'own_files': self.own_files.tolist(),
+            'own_bytes': self.own_bytes.tolist(),
+            'largest_files': self._largest_files,
+        }
+
+    @classmethod
+    def from_state(cls, state, top_n=None):
+        """Rebuilds an unfinished tree from a to_state() snapshot."""
+        tree = cls(state['names'][0], top_n)
+        tree.names = state['names']
+        tree.parents = array.array('q', state['parents'])
+        tree.own_files = array.array('Q', state['own_files'])
+        tree.own_bytes = array.array('q', state['own_bytes'])
+        tree._largest_files = [tuple(item) for item in state['largest_files']]
+        heapq.heapify(tree._largest_files)
+        tree._nodes = None
+        return tree
+
+    # --- Queries ---
+
+    def __len__(self):
+        return len(self.parents)
+
+    def path_of(self, node):
+        """Full path string of a node."""
+        parts = []
+        while node > 0:
+            parts.append(self.names[node])
+            node = self.parents[node]
+        parts.append(self.names[0] if node == 0 else '')
+        return os.path.join(*reversed(parts))
+
+    def _path_index(self):
+        if self._nodes is None:
+            nodes = {}
+            paths = []
+            for node, (name, parent) in enumerate(zip(self.names, self.parents)):
+                path = name if parent < 0 else os.path.join(paths[parent], name)
+                paths.append(path)
+                nodes[path] = node
+            self._nodes = nodes
+        return self._nodes
+
+    def find(self, directory):
+        """Node of a directory path, or None if no file entry was found in or below it."""
+        return self._path_index().get(str(directory))
+
+    def children(self, node):
+        """Nodes whose parent is node, largest total_bytes first."""
+        return sorted((child for child, parent in enumerate(self.parents) if parent == node),
+                      key=lambda child: self.total_bytes[child], reverse=True)
+
+    def subtree_summary(self, node):
+        """Own and total counts of a node, as listed in summary()['largest_directories']."""
+        return {
+            "path": self.path_of(node),
+            "total_bytes": self.total_bytes[node],
+            "total_files": self.total_files[node],
+            "own_bytes": self.own_bytes[node],
+            "own_files": self.own_files[node]
+        }
+
+    def largest_directories(self, top_n=None):
+        """The top_n (default: the tree's top_n) directories by total_bytes, largest first."""
+        top_n = self.top_n if top_n is None else top_n
+        nodes = heapq.nlargest(top_n, range(len(self.parents)), key=lambda node: (self.total_bytes[node], -node))
+        return [self.subtree_summary(node) for node in nodes]
+
+    def largest_files(self):
+        """The largest regular files seen while building, largest first."""
+        return [{"path": path, "size_bytes": size_bytes}
+                for size_bytes, path in sorted(self._largest_files, key=lambda item: (-item[0], item[1]))]
+
+    def summary(self):
+        """summary_data['directory_tree'] of a finished tree."""
+        return {
+            "directories": len(self.parents),
+            "largest_directories": self.largest_directories(),
+            "largest_files": self.largest_files()
+        }
+
+    # --- Pickling (a tree loaded from a scan file holds memoryviews) ---
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_nodes'] = None
+        for name, typecode in (('parents', 'q'), ('own_files', 'Q'), ('own_bytes', 'q'),
+                               ('total_files', 'Q'), ('total_bytes', 'q')):
+            if state[name] is not None and not isinstance(state[name], array.array):
+                state[name] = array.array(typecode, state[name])
+        return state
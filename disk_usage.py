@@ -0,0 +1,139 @@
+# disk_usage.py
+"""
+Hard-link aware disk usage.
+
+The type sizes in summary_data add up lstat().st_size per path: the apparent size. A file with
+several hard links is counted once per link, and sparse or compressed files count bytes that
+take no space. For capacity figures the scanners therefore also record, from the lstat they
+already do, the allocated bytes (st_blocks * 512; st_size where the platform has no st_blocks)
+and the link count of every entry, and the (st_dev, st_ino) of entries with more than one link.
+
+After the traversal (or directory by directory in streaming aggregation mode) the entries with
+more than one link are passed through an InodeSet: the first link of an inode counts, the others
+are recorded in ScanCounters as duplicate links, and summary_data['disk_usage'] reports apparent,
+unique (each inode once) and allocated bytes per type and in total.
+
+Only inodes with several links are ever stored, and the set stops growing at
+config.HARD_LINK_SET_MAX_INODES inodes: links of inodes it can no longer track are counted as
+'untracked' (and in full) instead of the memory growing with the volume.
+"""
+import array
+
+import config
+
+# Bytes per st_blocks unit (POSIX fixes it at 512 regardless of the filesystem block size)
+STAT_BLOCK_SIZE = 512
+
+_EMPTY = 0  # Free slot marker; inode number 0 is never a valid file
+_INITIAL_SLOTS = 1024
+_FIBONACCI_MULTIPLIER = 0x9E3779B97F4A7C15  # 2**64 / golden ratio, spreads sequential inode numbers
+_UINT64_MASK = (1 << 64) - 1
+
+
+def allocated_bytes(stat_result):
+    """Bytes allocated on disk for an lstat()/stat() result, or st_size where st_blocks is not available."""
+    blocks = getattr(stat_result, 'st_blocks', None)
+    return stat_result.st_size if blocks is None else blocks * STAT_BLOCK_SIZE
+
+
+def inode_key(stat_result):
+    """(st_dev, st_ino) of an entry with more than one hard link, None for single links or unknown inodes."""
+    st_ino = stat_result.st_ino
+    if stat_result.st_nlink > 1 and st_ino:
+        return stat_result.st_dev, (st_ino ^ (st_ino >> 64)) & _UINT64_MASK or 1  # Folds 128-bit file IDs (ReFS)
+    return None
+
+
+class _InodeTable:
+    """Open-addressing (linear probing) hash set of nonzero uint64 inode numbers of one device."""
+
+    __slots__ = ('slots', 'count', 'shift')
+
+    def __init__(self, num_slots=_INITIAL_SLOTS):
+        self.slots = array.array('Q', bytes(8 * num_slots))
+        self.count = 0
+        self.shift = 64 - (num_slots.bit_length() - 1)  # num_slots is a power of two
+
+    def _find(self, ino):
+        """Slot holding ino, or the free slot where it would go."""
+        slots = self.slots
+        mask = len(slots) - 1
+        idx = ((ino * _FIBONACCI_MULTIPLIER) & _UINT64_MASK) >> self.shift
+        while True:
+            value = slots[idx]
+            if value == ino or value == _EMPTY:
+                return idx
+            idx = (idx + 1) & mask
+
+    def __contains__(self, ino):
+        return self.slots[self._find(ino)] == ino
+
+    def insert_new(self, ino):
+        """Inserts an ino that is not in the table yet, growing it to stay at most half full."""
+        if 2 * (self.count + 1) > len(self.slots):
+            old_slots = self.slots
+            self.__init__(2 * len(old_slots))
+            for value in old_slots:
+                if value != _EMPTY:
+                    self.slots[self._find(value)] = value
+                    self.count += 1
+        self.slots[self._find(ino)] = ino
+        self.count += 1
+
+    def memory_usage_bytes(self):
+        return self.slots.itemsize * len(self.slots)
+
+
+class InodeSet:
+    """
+    Set of (st_dev, st_ino) pairs of hard-linked inodes: one compact open-addressing table of
+    uint64 inode numbers per device, 16 to 32 bytes per inode instead of a tuple in a Python set.
+    Holds at most max_entries inodes (config.HARD_LINK_SET_MAX_INODES by default).
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = config.HARD_LINK_SET_MAX_INODES if max_entries is None else max_entries
+        self._tables = {}  # st_dev -> _InodeTable
+        self.count = 0
+
+    def add(self, key):
+        """
+        Adds an (st_dev, st_ino) key from inode_key(). Returns 'new' for the first link of an inode, 'seen' for
+        further links, or 'untracked' if the inode is not in the set and the set is full.
+        """
+        st_dev, ino = key
+        table = self._tables.get(st_dev)
+        if table is not None and ino in table:
+            return 'seen'
+        if self.count >= self.max_entries:
+            return 'untracked'
+        if table is None:
+            table = self._tables[st_dev] = _InodeTable()
+        table.insert_new(ino)
+        self.count += 1
+        return 'new'
+
+    def __len__(self):
+        return self.count
+
+    # --- Checkpoints (config.STREAM_SCAN_TO_DISK) ---
+
+    def to_state(self):
+        """JSON-serializable snapshot of the set (the inode numbers of every device), for scan checkpoints."""
+        return {'tables': {str(st_dev): [ino for ino in table.slots if ino != _EMPTY]
+                           for st_dev, table in self._tables.items()}}
+
+    @classmethod
+    def from_state(cls, state, max_entries=None):
+        """Rebuilds a set from a to_state() snapshot."""
+        inode_set = cls(max_entries)
+        for st_dev, inos in state['tables'].items():
+            table = inode_set._tables[int(st_dev)] = _InodeTable()  # JSON keys are strings
+            for ino in inos:
+                table.insert_new(ino)
+            inode_set.count += len(inos)
+        return inode_set
+
+    def memory_usage_bytes(self):
+        """Bytes held by the hash tables."""
+        return sum(table.memory_usage_bytes() for table in self._tables.values())
@@ -0,0 +1,242 @@
+# duplicate_finder.py
+"""
+Content duplicate detection on a scan's all_files_data (config.FIND_DUPLICATE_FILES).
+
+Candidates are narrowed down in three stages, so most files are never read:
+
+    1. size          regular files are grouped by size_bytes; sizes with one file are dropped.
+                     Hard links of one inode (the 'inode' field) count as one file: they take
+                     no extra space, so they are neither read twice nor reported as duplicates.
+    2. partial hash  the first and last config.DUPLICATE_PARTIAL_HASH_BYTES of every remaining
+                     file are hashed; files no larger than both ends together are hashed whole
+                     here and are final after this stage.
+    3. full hash     only files whose size and partial hash still collide are hashed in full.
+
+Files are read through mmap and hashed on a pool of threads (config.DUPLICATE_HASH_WORKERS);
+hashlib releases the GIL while hashing, so the threads overlap I/O and hashing. All reads share
+one pacing budget, config.DUPLICATE_MAX_READ_MB_PER_SECOND, to cap the I/O bandwidth.
+
+find_duplicates returns the duplicate groups, the reclaimable bytes and per-stage throughput
+(files/s, MB/s); report_generator writes them in the report's duplicate files section.
+"""
+import collections
+import hashlib
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from directory_analyzer import ERROR_TYPE_STR, NON_FILE_TYPE_STR
+from record_store import FLAG_IS_SYMLINK, FileRecordStore
+
+_FULL_HASH_CHUNK_BYTES = 1024 * 1024
+
+
+class _ReadThrottle:
+    """
+    Paces reads to at most bytes_per_second across all threads: every read reserves the next
+    slot of the shared budget and sleeps until it starts. bytes_per_second None means unlimited.
+    """
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self._next_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self, num_bytes):
+        if not self.bytes_per_second:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + num_bytes / self.bytes_per_second
+        if start > now:
+            time.sleep(start - now)
+
+
+class _StageStats:
+    """Files, bytes read and wall time of one hashing stage."""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes_read = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, bytes_read):
+        with self._lock:
+            self.files += 1
+            self.bytes_read += bytes_read
+
+    def to_dict(self):
+        return {
+            "files": self.files,
+            "bytes_read": self.bytes_read,
+            "seconds": self.seconds,
+            "files_per_second": self.files / self.seconds if self.seconds else 0.0,
+            "mb_per_second": self.bytes_read / (1024 * 1024) / self.seconds if self.seconds else 0.0
+        }
+
+
+def _candidate_files(all_files_data, min_size, wanted_sizes=None):
+    """
+    Yields (path string, size, inode or None) for the regular files of at least min_size bytes.
+    Without wanted_sizes only the sizes are needed: path and inode are None. With it, only files
+    of those sizes are yielded.
+    """
+    if isinstance(all_files_data, FileRecordStore):
+        store = all_files_data
+        special_codes = {code for code, type_str in enumerate(store.types) if type_str in (ERROR_TYPE_STR, NON_FILE_TYPE_STR)}
+        for row, (flags, size, type_code) in enumerate(zip(store.flags, store.size_bytes, store.type_codes)):
+            if size >= min_size and not flags & FLAG_IS_SYMLINK and type_code not in special_codes:
+                if wanted_sizes is None:
+                    yield None, size, None
+                elif size in wanted_sizes:
+                    yield store.path_string_at(row), size, store.inodes.get(row)
+        return
+    for item in all_files_data:  # Scans saved as a list of dicts
+        size = item['size_bytes']
+        if (size >= min_size and not item['is_symlink'] and item['type'] not in (ERROR_TYPE_STR, NON_FILE_TYPE_STR)
+                and (wanted_sizes is None or size in wanted_sizes)):
+            yield str(item['path']), size, item.get('inode')
+
+
+def _hash_file(path, size, partial_bytes, throttle, stats, full):
+    """
+    Hashes a file through mmap: the first and last partial_bytes (the whole file if it is not larger
+    than both), or everything if full. Returns the digest, or None if the file cannot be read or no
+    longer has the scanned size.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size != size:
+                return None
+            digest = hashlib.blake2b()
+            if full or size <= 2 * partial_bytes:
+                ranges = [(start, min(size, start + _FULL_HASH_CHUNK_BYTES)) for start in range(0, size, _FULL_HASH_CHUNK_BYTES)]
+            else:
+                ranges = [(0, partial_bytes), (size - partial_bytes, size)]
+            # Every memoryview must be released before the map can be closed
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                for start, end in ranges:
+                    throttle.wait(end - start)
+                    with view[start:end] as chunk:
+                        digest.update(chunk)
+            bytes_read = sum(end - start for start, end in ranges)
+    except (OSError, ValueError):
+        return None
+    stats.add(bytes_read)
+    return digest.digest()
+
+
+def _hash_stage(pool, files, partial_bytes, throttle, full):
+    """
+    Hashes (path, size) pairs on the pool. Returns ({(size, digest): [paths]}, number of unreadable files, stats).
+    """
+    stats = _StageStats()
+    start_time = time.perf_counter()
+    digests = pool.map(lambda file: _hash_file(file[0], file[1], partial_bytes, throttle, stats, full), files)
+    groups = collections.defaultdict(list)
+    errors = 0
+    for (path, size), digest in zip(files, digests):
+        if digest is None:
+            errors += 1
+        else:
+            groups[(size, digest)].append(path)
+    stats.seconds = time.perf_counter() - start_time
+    return groups, errors, stats
+
+
+def find_duplicates(all_files_data, min_size=None):
+    """
+    Finds regular files with identical content in all_files_data (a FileRecordStore or a list of
+    record dicts). Files smaller than min_size (config.DUPLICATE_MIN_SIZE_BYTES, at least 1) are ignored.
+
+    Returns a dictionary:
+        'groups': one dict per set of identical files, largest reclaimable first: 'size_bytes',
+                  'paths' (one path per inode, sorted), 'hard_links' (further paths of those inodes)
+                  and 'reclaimable_bytes' (size_bytes for every copy but one)
+        'duplicate_files', 'reclaimable_bytes': totals over the groups
+        'candidates': files that shared their size with another file
+        'unreadable': candidates that could not be read or changed since the scan
+        'stages': 'partial_hash' and 'full_hash' throughput ('files', 'bytes_read', 'seconds',
+                  'files_per_second', 'mb_per_second')
+    """
+    if min_size is None:
+        min_size = config.DUPLICATE_MIN_SIZE_BYTES
+    min_size = max(1, min_size)  # Empty files are all alike, and cannot be mapped
+    partial_bytes = config.DUPLICATE_PARTIAL_HASH_BYTES
+    max_mb_per_second = config.DUPLICATE_MAX_READ_MB_PER_SECOND
+    throttle = _ReadThrottle(max_mb_per_second * 1024 * 1024 if max_mb_per_second else None)
+    num_workers = config.DUPLICATE_HASH_WORKERS or min(32, (os.cpu_count() or 1) * 4)
+
+    # --- Stage 1: group by size, one path per inode ---
+    # Sizes are counted first, so only the paths of files with a shared size are ever built
+    size_counts = collections.Counter(size for _, size, _ in _candidate_files(all_files_data, min_size))
+    shared_sizes = {size for size, count in size_counts.items() if count > 1}
+    del size_counts
+    by_size = collections.defaultdict(dict)  # size -> {inode key or path: [paths]}
+    for path, size, inode in _candidate_files(all_files_data, min_size, shared_sizes):
+        by_size[size].setdefault(inode or path, []).append(path)
+    hard_links = {}  # path hashed for an inode -> its other paths
+    candidates = []
+    for size, inodes in by_size.items():
+        if len(inodes) < 2:
+            continue
+        for paths in inodes.values():
+            candidates.append((paths[0], size))
+            if len(paths) > 1:
+                hard_links[paths[0]] = paths[1:]
+    del by_size
+    print(f"Duplicate finder: {len(candidates)} files share their size with another file; "
+          f"hashing with {num_workers} threads.")
+
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        # --- Stage 2: first and last bytes (the whole file if it is small) ---
+        partial_groups, partial_errors, partial_stats = _hash_stage(pool, candidates, partial_bytes, throttle, full=False)
+        final_groups = []
+        full_candidates = []
+        for (size, _), paths in partial_groups.items():
+            if len(paths) < 2:
+                continue
+            if size <= 2 * partial_bytes:
+                final_groups.append((size, paths))  # Already hashed whole
+            else:
+                full_candidates.extend((path, size) for path in paths)
+        del partial_groups
+
+        # --- Stage 3: full content of the files that still collide ---
+        full_groups, full_errors, full_stats = _hash_stage(pool, full_candidates, partial_bytes, throttle, full=True)
+        final_groups.extend((size, paths) for (size, _), paths in full_groups.items() if len(paths) >= 2)
+
+    groups = []
+    for size, paths in final_groups:
+        paths.sort()
+        groups.append({
+            "size_bytes": size,
+            "paths": paths,
+            "hard_links": sorted(link for path in paths for link in hard_links.get(path, ())),
+            "reclaimable_bytes": size * (len(paths) - 1)
+        })
+    groups.sort(key=lambda group: (-group["reclaimable_bytes"], group["paths"][0]))
+    return {
+        "groups": groups,
+        "duplicate_files": sum(len(group["paths"]) - 1 for group in groups),
+        "reclaimable_bytes": sum(group["reclaimable_bytes"] for group in groups),
+        "candidates": len(candidates),
+        "unreadable": partial_errors + full_errors,
+        "stages": {"partial_hash": partial_stats.to_dict(), "full_hash": full_stats.to_dict()}
+    }
+
+
+def print_duplicate_summary(duplicates):
+    """Prints the totals and throughput of a find_duplicates result to the console."""
+    partial, full = duplicates["stages"]["partial_hash"], duplicates["stages"]["full_hash"]
+    print(f"Duplicate finder: {len(duplicates['groups'])} groups, {duplicates['duplicate_files']} duplicate files, "
+          f"{duplicates['reclaimable_bytes']} reclaimable bytes.")
+    print(f"  Partial hashes: {partial['files']} files in {partial['seconds']:.2f} s "
+          f"({partial['files_per_second']:.0f} files/s, {partial['mb_per_second']:.1f} MB/s); "
+          f"full hashes: {full['files']} files in {full['seconds']:.2f} s "
+          f"({full['files_per_second']:.0f} files/s, {full['mb_per_second']:.1f} MB/s).")
@@ -1,14 +1,308 @@
 # file_analyzer.py
-from os_utils import detect_os
-from fs_utils import get_target_directory
-from directory_analyzer import analyze_directory
-from report_generator import generate_report_filename, write_summary_report
+"""
+Entry point of the file analyzer.
+
+Run without arguments for the interactive mode (asks for the directory to analyze, then scans,
+writes the report and the plots). The subcommands run without any prompt, for scripts and cron jobs:
+
+    python file_analyzer.py scan TARGET [TARGET ...] [--report] [--plot]
+    python file_analyzer.py report TARGET [TARGET ...]
+    python file_analyzer.py plot TARGET [TARGET ...]
+    python file_analyzer.py batch [TARGET ...] [--manifest FILE] [--plot]
+    python file_analyzer.py query TARGET [--type EXT] [--min-size SIZE] [--under DIR] [--group-by KEY] [--sql SQL]
+    python file_analyzer.py compare OLD NEW
+
+Any config.py setting can be overridden with --set NAME=VALUE (see --help for the shortcuts).
+The scanner, the report writer and the plotting stack (NumPy, matplotlib) are only imported by the
+phase that needs them, so e.g. a scan-only run does not pay for loading matplotlib.
+"""
+import argparse
+import ast
+import pathlib
+import sys
+
 import config
-from plot_generator import generate_plots
-from serializer import load_scan, save_scan, scan_exists
+import instrumentation
+import progress
+from os_utils import detect_os
+
+
+def obtain_scan(target_dir_path_obj, current_os):
+    """
+    Loads the saved scan of target_dir_path_obj or performs a new one (saving it), following the
+    scan settings in config. Returns (all_file_details, dir_symlink_details, summary_stats); they are
+    None if no scan data is available. In streaming aggregation mode the record lists only hold the symlinks.
+    """
+    from directory_analyzer import aggregate_directory, analyze_directory
+    from serializer import (interrupted_scan_exists, load_scan, load_scan_summary, open_scan_stream, save_scan,
+                            save_scan_database, scan_exists)
+
+    target_dir_str = str(target_dir_path_obj)
+    all_file_details, dir_symlink_details, summary_stats = None, None, None
+    scan_loaded = False
+    previous_scan = None
+    scan_stream = None
+    resume_scan = (config.RESUME_INTERRUPTED_SCAN and not config.STREAMING_AGGREGATION
+                   and interrupted_scan_exists(target_dir_path_obj))
+    if resume_scan:
+        print(f"Found an interrupted scan of: {target_dir_str}. It will be resumed from its last checkpoint.")
+
+    if config.STREAMING_AGGREGATION:
+        from aggregators import SymlinkCollector
+
+        # Records are fed to aggregators and never collected, so there is nothing to load or save
+        print(f"Performing streaming aggregation scan for: {target_dir_str}")
+        if scan_exists(target_dir_path_obj):
+            progress.expect_totals(load_scan_summary(target_dir_path_obj))  # ETA of the progress display
+        symlink_collector = SymlinkCollector()
+        with instrumentation.phase("scan"):
+            summary_stats = aggregate_directory(target_dir_path_obj, current_os, [symlink_collector])
+        instrumentation.count_scan(summary_stats)
+        all_file_details, dir_symlink_details = symlink_collector.file_symlinks, symlink_collector.dir_symlinks
+        scan_loaded = True
+    elif ((config.LOAD_SAVED_SCAN and not resume_scan) or config.INCREMENTAL_SCAN) and scan_exists(target_dir_path_obj):
+        print(f"Attempting to load saved scan for: {target_dir_str}")
+        with instrumentation.phase("load_scan"):
+            all_file_details, dir_symlink_details, summary_stats = load_scan(target_dir_path_obj)
+        if all_file_details is not None and config.INCREMENTAL_SCAN:
+            # The saved scan becomes the baseline of an incremental rescan
+            previous_scan = (all_file_details, dir_symlink_details)
+            print("Loaded saved scan as the baseline for an incremental scan.")
+        elif all_file_details is not None: # Check if loading was successful
+            scan_loaded = True
+            print("Successfully loaded data from saved scan.")
+        else:
+            print("Failed to load saved scan. Proceeding with new scan.")
+
+    if not scan_loaded:
+        if resume_scan or (config.STREAM_SCAN_TO_DISK and config.SAVE_NEW_SCAN):
+            # The scan file is written while scanning, with checkpoints to resume from
+            scan_stream = open_scan_stream(target_dir_path_obj, resume=resume_scan)
+        print(f"Performing new scan for: {target_dir_str}")
+        # The totals of the previous scan (the incremental baseline, or the saved one) give the progress display an ETA
+        if summary_stats is None and scan_exists(target_dir_path_obj):
+            summary_stats = load_scan_summary(target_dir_path_obj)
+        progress.expect_totals(summary_stats)
+        with instrumentation.phase("scan"):
+            all_file_details, dir_symlink_details, summary_stats = analyze_directory(
+                target_dir_path_obj, current_os, previous_scan=previous_scan, scan_stream=scan_stream)
+        instrumentation.count_scan(summary_stats)
+        previous_scan = None  # Release the baseline before reporting
+
+        # Save the new scan only if it was successful and saving is enabled
+        # (a streamed scan has already been saved by analyze_directory)
+        if config.SAVE_NEW_SCAN and scan_stream is None and all_file_details is not None: # Ensure scan produced data
+            print(f"Attempting to save new scan for: {target_dir_str}")
+            with instrumentation.phase("save_scan"):
+                save_scan(all_file_details, dir_symlink_details, summary_stats, target_dir_path_obj)
+        if config.SAVE_NEW_SCAN and config.SAVE_SCAN_DATABASE and all_file_details is not None:
+            with instrumentation.phase("save_database"):
+                save_scan_database(all_file_details, dir_symlink_details, summary_stats, target_dir_path_obj)
+
+    return all_file_details, dir_symlink_details, summary_stats
+
+
+def print_console_summary(summary_stats, all_file_details, dir_symlink_details):
+    """Prints the short analysis summary and the first file types to the console."""
+    print("\n--- Analysis Summary (Console) ---")
+    print(f"Target Directory: {summary_stats.get('target_directory', 'N/A')}") # Use .get for safety
+    print(
+        f"Total Dirs Scanned: {summary_stats.get('total_directories_scanned', 0)}, "
+        f"File Entries: {summary_stats.get('total_file_entries_processed', 0)}, "
+        f"Dir Symlinks: {summary_stats.get('total_directory_symlinks_found', 0)}"
+    )
+    if summary_stats.get('skipped_access_errors', 0) > 0:
+        print(f"Skipped items due to errors: {summary_stats['skipped_access_errors']}")
+
+    print("\n--- File & Entry Types Summary (Console) ---")
+    file_types_summary_console = summary_stats.get('file_types_summary', {})
+    if file_types_summary_console:
+        print(f"{'Extension/Type':<30} {'Count':>10} {'Total Size (Bytes)':>20}")
+        print("-" * 65)
+        # Limit console output for brevity if desired, or print all
+        for ext_type, count in list(file_types_summary_console.items())[:15]:  # Example: top 15
+            size = summary_stats.get('file_types_size_summary', {}).get(ext_type, 0)
+            print(f"{ext_type:<30} {count:>10} {size:>20}")
+        if len(file_types_summary_console) > 15:
+            print("... and more ...")
+    else:
+        print("No file types summary available for console.")
+
+
+    if not config.STREAMING_AGGREGATION and (all_file_details or dir_symlink_details):
+        combined_entries = len(all_file_details or []) + len(dir_symlink_details or [])
+        print(f"\nCollected details for {combined_entries} total entries (files, file symlinks, dir symlinks).")
+
+
+def find_scan_duplicates(all_file_details):
+    """
+    Runs the duplicate finder on the records of a scan if config.FIND_DUPLICATE_FILES is set and the
+    records were kept. Returns its result, or None.
+    """
+    if not config.FIND_DUPLICATE_FILES or config.STREAMING_AGGREGATION or all_file_details is None:
+        return None
+    from duplicate_finder import find_duplicates, print_duplicate_summary
+
+    with instrumentation.phase("duplicates"):
+        duplicates = find_duplicates(all_file_details)
+    print_duplicate_summary(duplicates)
+    return duplicates
+
+
+def write_report(summary_stats, all_file_details, dir_symlink_details, current_os):
+    """Writes the reports of a scan (config.REPORT_FORMATS), with the duplicate files section if the duplicate finder runs."""
+    from report_generator import write_reports
+
+    duplicates = find_scan_duplicates(all_file_details)
+    with instrumentation.phase("report"):
+        report_filepaths = write_reports(
+            target_directory=summary_stats.get('target_directory'),
+            summary_data=summary_stats,
+            all_files_data=all_file_details,
+            dir_symlinks_data=dir_symlink_details,
+            os_name=current_os,
+            include_details=config.INCLUDE_DETAILED_SYMLINK_LIST,
+            duplicates=duplicates
+        )
+    if report_filepaths:
+        instrumentation.set_report_path(report_filepaths[0])
+
+
+def plot_scan(summary_stats, all_file_details, dir_symlink_details, current_os):
+    """
+    Generates the plots of a scan. all_file_details and dir_symlink_details may be None when the
+    plots can be drawn from summary_stats alone (streaming aggregation, plots of a saved summary).
+    """
+    from plot_generator import generate_plots  # Loads NumPy and matplotlib
+
+    records_kept = all_file_details is not None and not config.STREAMING_AGGREGATION
+    with instrumentation.phase("plots"):
+        generate_plots(
+            all_files_data=all_file_details if records_kept else None,
+            directory_symlinks_data=dir_symlink_details if records_kept else None,
+            summary_data=summary_stats,
+            os_name=current_os
+        )
+
+
+def analyze_target(target_dir_path_obj, current_os, report=True, plot=True):
+    """
+    Scans (or loads) one target directory, prints the console summary and writes the report and
+    plots if requested. Returns True on success, False if no scan data was available or an error occurred.
+    The run's metrics (config.COLLECT_RUN_METRICS, see instrumentation.py) are written next to its report.
+    """
+    run = instrumentation.start_run(target_dir_path_obj)
+    try:
+        all_file_details, dir_symlink_details, summary_stats = obtain_scan(target_dir_path_obj, current_os)
+
+        # Ensure we have valid data to proceed with reporting and plotting
+        if all_file_details is None or summary_stats is None:
+            print("No scan data available (either failed to load or new scan failed). Exiting analysis for this directory.")
+            return False
+
+        print_console_summary(summary_stats, all_file_details, dir_symlink_details)
+
+        # --- Generate Text Report ---
+        if report:
+            write_report(summary_stats, all_file_details, dir_symlink_details, current_os)
+
+        # --- Generate Plots ---
+        # In streaming aggregation mode only the symlink records exist; plots use summary_stats
+        if plot:
+            plot_scan(summary_stats, all_file_details, dir_symlink_details, current_os)
+        return True
+
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}") # Simplified error message for top level
+        import traceback
+        traceback.print_exc() # Still good for debugging
+        return False
+    finally:
+        instrumentation.finish_run(run, target_directory=target_dir_path_obj)
+
+
+def plot_saved_summary(target_dir_path_obj, current_os):
+    """
+    Draws the plots of a saved scan from its summary alone (size sketches and type counts), without
+    reading its records. Returns False if there is no such summary (older scan files, no saved scan),
+    so the caller can fall back to loading the whole scan.
+    """
+    from serializer import load_scan_summary, scan_exists
+
+    if (not config.LOAD_SAVED_SCAN or config.INCREMENTAL_SCAN or config.STREAMING_AGGREGATION
+            or config.RESUME_INTERRUPTED_SCAN or not scan_exists(target_dir_path_obj)):
+        return False
+    summary_stats = load_scan_summary(target_dir_path_obj)
+    if (summary_stats is None or 'file_size_distribution' not in summary_stats
+            or 'file_types_summary' not in summary_stats):
+        return False
+    print(f"Plotting the saved scan summary of: {target_dir_path_obj}")
+    plot_scan(summary_stats, None, None, current_os)
+    return True
+
+
+def _print_rows(columns, rows):
+    """Prints query results as a table: numbers right-aligned, text left-aligned, the last column unpadded."""
+    if not rows:
+        print("No matching entries.")
+        return
+    cells = [[str(column) for column in columns]] + [["" if value is None else str(value) for value in row] for row in rows]
+    numeric = [all(isinstance(row[i], (int, float)) or row[i] is None for row in rows) for i in range(len(columns))]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    for row in cells:
+        padded = [cell.rjust(width) if is_numeric else cell.ljust(width)
+                  for cell, width, is_numeric in zip(row[:-1], widths, numeric)]
+        print("  ".join(padded + [row[-1]]))
+    print(f"({len(rows)} rows)")
+
+
+def query_target(target_dir_path_obj, current_os, args):
+    """
+    Answers a query subcommand from the SQLite database of a target (see scan_database.py). The database
+    is built first, from the saved scan or a new scan, if it is missing, older than the saved scan or
+    --rebuild is given. Returns True if the query ran.
+    """
+    import sqlite3
+
+    from scan_database import query_entries, run_sql
+    from serializer import open_saved_scan_database, save_scan_database, scan_database_is_current
+
+    if args.rebuild or not scan_database_is_current(target_dir_path_obj):
+        if config.STREAMING_AGGREGATION:
+            print("Queries need the scan records, which are not kept in streaming aggregation mode.")
+            return False
+        config.SAVE_SCAN_DATABASE = False  # Exported below, whether the scan is new or loaded
+        all_file_details, dir_symlink_details, summary_stats = obtain_scan(target_dir_path_obj, current_os)
+        if all_file_details is None or not save_scan_database(all_file_details, dir_symlink_details, summary_stats,
+                                                              target_dir_path_obj):
+            return False
+
+    conn = open_saved_scan_database(target_dir_path_obj)
+    if conn is None:
+        return False
+    try:
+        if args.sql:
+            columns, rows = run_sql(conn, args.sql)
+        else:
+            types = [type_str if type_str.startswith('.') else '.' + type_str for type_str in args.types] or None
+            columns, rows = query_entries(conn, types=[type_str.lower() for type_str in types] if types else None,
+                                          min_size=args.min_size, max_size=args.max_size,
+                                          under=args.under.resolve() if args.under else None,
+                                          hidden=args.hidden, symlinks=args.symlinks, group_by=args.group_by,
+                                          limit=args.top or None)
+    except sqlite3.Error as e:
+        print(f"Query failed: {e}")
+        return False
+    finally:
+        conn.close()
+    _print_rows(columns, rows)
+    return True
+
 
 def main():
-    """Main function to run the file analysis."""
+    """Main function to run the file analysis interactively."""
+    from fs_utils import get_target_directory
+
     print("\nProject: File Analysis - CS350")
     print("By: Halil Nebioğlu - Murat Yiğit Mert")
 
@@ -22,96 +316,226 @@ def main():
     target_dir_path_obj = get_target_directory(current_os)
 
     if target_dir_path_obj: # Check if a valid directory was selected
-        target_dir_str = str(target_dir_path_obj)
+        analyze_target(target_dir_path_obj, current_os)
+        instrumentation.print_run_summary()
+    else:
+        print("No valid directory selected or user chose to exit. Exiting program.")
+
+
+# --- Command line interface ---
+
+# Shortcut flags for the most used config settings: flag -> (config name, value stored by the flag)
+_CONFIG_FLAGS = {
+    'engine': ('TRAVERSAL_ENGINE', None),
+    'no_save': ('SAVE_NEW_SCAN', False),
+    'stream': ('STREAM_SCAN_TO_DISK', True),
+    'resume': ('RESUME_INTERRUPTED_SCAN', True),
+    'incremental': ('INCREMENTAL_SCAN', True),
+    'streaming_aggregation': ('STREAMING_AGGREGATION', True),
+    'no_duplicates': ('FIND_DUPLICATE_FILES', False),
+    'scan_dir': ('SCAN_DATA_DIRECTORY', None),
+    'report_dir': ('REPORT_OUTPUT_DIRECTORY', None),
+    'report_formats': ('REPORT_FORMATS', None),
+    'count_syscalls': ('COUNT_SYSCALLS', True),
+    'profile': ('RUN_PROFILER', None),
+    'plot_dir': ('PLOT_OUTPUT_DIRECTORY', None),
+}
+
+
+def _parse_config_override(text):
+    """Parses a --set NAME=VALUE argument into (name, value). Values are Python literals or plain strings."""
+    name, sep, raw_value = text.partition('=')
+    name = name.strip()
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got '{text}'")
+    if not name.isupper() or not hasattr(config, name):
+        raise argparse.ArgumentTypeError(f"unknown config setting '{name}'")
+    try:
+        value = ast.literal_eval(raw_value.strip())
+    except (ValueError, SyntaxError):
+        value = raw_value.strip()  # e.g. TRAVERSAL_ENGINE=threaded
+    return name, value
+
+
+_SIZE_SUFFIXES = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def _parse_size(text):
+    """Parses a size argument: bytes, or a number with a K/M/G/T suffix (powers of 1024), e.g. 1G or 2.5M."""
+    number, suffix = text.strip().upper().rstrip('B'), ''
+    if number and number[-1] in _SIZE_SUFFIXES:
+        number, suffix = number[:-1], number[-1]
+    try:
+        return int(float(number) * _SIZE_SUFFIXES[suffix])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a size like 1048576, 512K or 1G, got '{text}'")
+
+
+def build_arg_parser():
+    """Builds the argparse parser of the non-interactive command line interface."""
+    common = argparse.ArgumentParser(add_help=False)
+    group = common.add_argument_group("config overrides")
+    group.add_argument('--set', dest='overrides', metavar='NAME=VALUE', action='append', default=[],
+                       type=_parse_config_override,
+                       help="Override a config.py setting, e.g. --set TRAVERSAL_ENGINE=threaded (repeatable)")
+    group.add_argument('--engine', choices=('walk', 'scandir', 'threaded', 'process'),
+                       help="Traversal engine (TRAVERSAL_ENGINE)")
+    group.add_argument('--no-save', action='store_true', help="Do not save new scans (SAVE_NEW_SCAN=False)")
+    group.add_argument('--stream', action='store_true', help="Stream new scans to disk (STREAM_SCAN_TO_DISK)")
+    group.add_argument('--resume', action='store_true',
+                       help="Resume an interrupted streamed scan (RESUME_INTERRUPTED_SCAN)")
+    group.add_argument('--incremental', action='store_true', help="Incremental rescan (INCREMENTAL_SCAN)")
+    group.add_argument('--streaming-aggregation', action='store_true',
+                       help="Aggregate without keeping records (STREAMING_AGGREGATION)")
+    group.add_argument('--no-duplicates', action='store_true',
+                       help="Skip the duplicate file search of the report (FIND_DUPLICATE_FILES=False)")
+    group.add_argument('--count-syscalls', action='store_true',
+                       help="Count stat/lstat/readlink/scandir calls in the run metrics (COUNT_SYSCALLS)")
+    group.add_argument('--profile', choices=('cprofile', 'sampling'),
+                       help="Profile each run, output next to its metrics (RUN_PROFILER)")
+    group.add_argument('--scan-dir', help="Directory of saved scans (SCAN_DATA_DIRECTORY)")
+    group.add_argument('--report-dir', help="Report output directory (REPORT_OUTPUT_DIRECTORY)")
+    group.add_argument('--report-format', dest='report_formats', action='append',
+                       choices=('text', 'json', 'jsonl', 'csv'),
+                       help="Report format, instead of REPORT_FORMATS (repeatable, e.g. --report-format text --report-format json)")
+    group.add_argument('--plot-dir', help="Plot output directory (PLOT_OUTPUT_DIRECTORY)")
+
+    parser = argparse.ArgumentParser(
+        prog="file_analyzer.py",
+        description="Analyzes the files of directory trees. Run without arguments for the interactive mode.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
 
-        all_file_details, dir_symlink_details, summary_stats = None, None, None
-        scan_loaded = False
+    scan_parser = subparsers.add_parser('scan', parents=[common],
+                                        help="Scan targets and save the scans (saved scans are not reused)")
+    scan_parser.add_argument('targets', nargs='+', type=pathlib.Path, metavar='TARGET')
+    scan_parser.add_argument('--report', action='store_true', help="Also write the report")
+    scan_parser.add_argument('--plot', action='store_true', help="Also generate the plots")
 
+    report_parser = subparsers.add_parser('report', parents=[common],
+                                          help="Write the report of targets (from the saved scan if there is one)")
+    report_parser.add_argument('targets', nargs='+', type=pathlib.Path, metavar='TARGET')
+    report_parser.add_argument('--plot', action='store_true', help="Also generate the plots")
+
+    plot_parser = subparsers.add_parser('plot', parents=[common],
+                                        help="Generate the plots of targets (from the saved scan if there is one)")
+    plot_parser.add_argument('targets', nargs='+', type=pathlib.Path, metavar='TARGET')
+
+    batch_parser = subparsers.add_parser('batch', parents=[common],
+                                         help="Scan many targets in one run with a shared worker pool, "
+                                              "one report each plus a roll-up (see batch_analyzer.py)")
+    batch_parser.add_argument('targets', nargs='*', type=pathlib.Path, metavar='TARGET')
+    batch_parser.add_argument('--manifest', help="File listing targets, one per line ('#' starts a comment)")
+    batch_parser.add_argument('--plot', action='store_true', help="Also generate the plots of every target")
+
+    query_parser = subparsers.add_parser('query', parents=[common],
+                                         help="Query the SQLite index of a target's scan (built on demand)")
+    query_parser.add_argument('target', type=pathlib.Path, metavar='TARGET')
+    query_parser.add_argument('--type', dest='types', action='append', default=[], metavar='EXT',
+                              help="Only entries of this type, e.g. .log (repeatable)")
+    query_parser.add_argument('--min-size', type=_parse_size, metavar='SIZE', help="Only entries of at least SIZE, e.g. 1G")
+    query_parser.add_argument('--max-size', type=_parse_size, metavar='SIZE', help="Only entries of at most SIZE")
+    query_parser.add_argument('--under', type=pathlib.Path, metavar='DIR', help="Only entries in the subtree of DIR")
+    hidden_group = query_parser.add_mutually_exclusive_group()
+    hidden_group.add_argument('--hidden', dest='hidden', action='store_const', const=True, help="Only hidden entries")
+    hidden_group.add_argument('--not-hidden', dest='hidden', action='store_const', const=False, help="Only visible entries")
+    symlink_group = query_parser.add_mutually_exclusive_group()
+    symlink_group.add_argument('--symlinks', dest='symlinks', action='store_const', const=True, help="Only symlinks")
+    symlink_group.add_argument('--no-symlinks', dest='symlinks', action='store_const', const=False, help="No symlinks")
+    query_parser.add_argument('--group-by', choices=('type', 'directory'),
+                              help="One row per type or directory (count and total size) instead of entries")
+    query_parser.add_argument('--top', type=int, default=50, metavar='N',
+                              help="Largest N entries or groups (default: 50, 0 for all)")
+    query_parser.add_argument('--sql', help="Run this read-only SQL instead (tables: entries, directories, "
+                                            "view entry_paths; see scan_database.py)")
+    query_parser.add_argument('--rebuild', action='store_true', help="Rebuild the database from the scan first")
+
+    compare_parser = subparsers.add_parser('compare', parents=[common],
+                                           help="Diff two saved scans: added, removed, resized and retyped entries, "
+                                                "type and directory deltas (Markdown and CSV, see scan_diff.py)")
+    compare_parser.add_argument('old', metavar='OLD', help="Scanned directory (its saved scan is used) or scan file")
+    compare_parser.add_argument('new', metavar='NEW', help="Scanned directory (its saved scan is used) or scan file")
+    return parser
+
+
+def _apply_config_overrides(args):
+    """Sets the subcommand defaults, then the shortcut flags and --set overrides, on the config module."""
+    # 'scan' and 'batch' always scan; 'report' and 'plot' reuse a saved scan when there is one
+    config.LOAD_SAVED_SCAN = args.command not in ('scan', 'batch')
+    for flag, (name, flag_value) in _CONFIG_FLAGS.items():
+        value = getattr(args, flag)
+        if value:
+            setattr(config, name, value if flag_value is None else flag_value)
+    for name, value in args.overrides:
+        setattr(config, name, value)
+
+
+def cli(argv=None):
+    """
+    Runs the command line interface (see the module docstring). Without arguments it runs the
+    interactive main(). Returns the process exit status: 0 if every target was analyzed, 1 otherwise.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        main()
+        return 0
+
+    args = build_arg_parser().parse_args(argv)
+    _apply_config_overrides(args)
+    if args.command == 'compare':
+        from scan_diff import write_scan_diff
+
+        return 0 if write_scan_diff(args.old, args.new) else 1
+
+    current_os = detect_os()
+    if current_os == "Unknown":
+        print("Unsupported operating system. Exiting.")
+        return 1
+
+    if args.command == 'batch':
+        from batch_analyzer import read_manifest, run_batch
+
+        targets = list(args.targets)
+        if args.manifest:
+            try:
+                targets.extend(read_manifest(args.manifest))
+            except OSError as e:
+                print(f"Error reading manifest {args.manifest}: {e}")
+                return 1
+        if not targets:
+            print("No targets given (list them as arguments or in a --manifest file).")
+            return 1
+        run = instrumentation.start_run("batch")
         try:
-            if config.LOAD_SAVED_SCAN and scan_exists(target_dir_path_obj):
-                print(f"Attempting to load saved scan for: {target_dir_str}")
-                all_file_details, dir_symlink_details, summary_stats = load_scan(target_dir_path_obj)
-                if all_file_details is not None: # Check if loading was successful
-                    scan_loaded = True
-                    print("Successfully loaded data from saved scan.")
-                else:
-                    print("Failed to load saved scan. Proceeding with new scan.")
-
-            if not scan_loaded:
-                print(f"Performing new scan for: {target_dir_str}")
-                all_file_details, dir_symlink_details, summary_stats = analyze_directory(target_dir_path_obj, current_os)
-
-                # Save the new scan only if it was successful and saving is enabled
-                if config.SAVE_NEW_SCAN and all_file_details is not None: # Ensure scan produced data
-                    print(f"Attempting to save new scan for: {target_dir_str}")
-                    save_scan(all_file_details, dir_symlink_details, summary_stats, target_dir_path_obj)
-
-            # Ensure we have valid data to proceed with reporting and plotting
-            if all_file_details is None or summary_stats is None:
-                print("No scan data available (either failed to load or new scan failed). Exiting analysis for this directory.")
-                return # Or raise an error
-
-            # --- Console Summary ---
-            print("\n--- Analysis Summary (Console) ---")
-            print(f"Target Directory: {summary_stats.get('target_directory', 'N/A')}") # Use .get for safety
-            print(
-                f"Total Dirs Scanned: {summary_stats.get('total_directories_scanned', 0)}, "
-                f"File Entries: {summary_stats.get('total_file_entries_processed', 0)}, "
-                f"Dir Symlinks: {summary_stats.get('total_directory_symlinks_found', 0)}"
-            )
-            if summary_stats.get('skipped_access_errors', 0) > 0:
-                print(f"Skipped items due to errors: {summary_stats['skipped_access_errors']}")
-
-            print("\n--- File & Entry Types Summary (Console) ---")
-            file_types_summary_console = summary_stats.get('file_types_summary', {})
-            if file_types_summary_console:
-                print(f"{'Extension/Type':<30} {'Count':>10} {'Total Size (Bytes)':>20}")
-                print("-" * 65)
-                # Limit console output for brevity if desired, or print all
-                for ext_type, count in list(file_types_summary_console.items())[:15]:  # Example: top 15
-                    size = summary_stats.get('file_types_size_summary', {}).get(ext_type, 0)
-                    print(f"{ext_type:<30} {count:>10} {size:>20}")
-                if len(file_types_summary_console) > 15:
-                    print("... and more ...")
-            else:
-                print("No file types summary available for console.")
-
-
-            if all_file_details or dir_symlink_details:
-                combined_entries = len(all_file_details or []) + len(dir_symlink_details or [])
-                print(f"\nCollected details for {combined_entries} total entries (files, file symlinks, dir symlinks).")
-
-            # The save_scan logic was moved up to only save *new* scans.
-            # If you wanted to re-save a loaded scan (e.g. if config changes how it's processed later),
-            # that would be a different logic branch.
-
-
-            # --- Generate Text Report ---
-            report_file = generate_report_filename()
-            write_summary_report(
-                report_filepath=report_file,
-                summary_data=summary_stats,
-                all_files_data=all_file_details,
-                dir_symlinks_data=dir_symlink_details,
-                os_name=current_os,
-                include_details=config.INCLUDE_DETAILED_SYMLINK_LIST
-            )
-
-            # --- Generate Plots ---
-            generate_plots(
-                all_files_data=all_file_details,
-                directory_symlinks_data=dir_symlink_details,
-                summary_data=summary_stats,
-                os_name=current_os
-            )
-
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}") # Simplified error message for top level
-            import traceback
-            traceback.print_exc() # Still good for debugging
-    else:
-        print("No valid directory selected or user chose to exit. Exiting program.")
+            batch_ok = run_batch(targets, current_os, plot=args.plot)
+        finally:
+            instrumentation.finish_run(run)
+        instrumentation.print_run_summary()
+        return 0 if batch_ok else 1
+
+    from fs_utils import check_target_directory
+
+    if args.command == 'query':
+        target_dir_path_obj = args.target
+        if not check_target_directory(target_dir_path_obj):
+            return 1
+        return 0 if query_target(target_dir_path_obj, current_os, args) else 1
+
+    failures = 0
+    for target_dir_path_obj in args.targets:
+        print(f"\n=== {args.command}: {target_dir_path_obj} ===")
+        if not check_target_directory(target_dir_path_obj):
+            failures += 1
+            continue
+        if args.command == 'plot' and plot_saved_summary(target_dir_path_obj, current_os):
+            continue
+        report = args.command == 'report' or getattr(args, 'report', False)
+        plot = args.command == 'plot' or getattr(args, 'plot', False)
+        if not analyze_target(target_dir_path_obj, current_os, report=report, plot=plot):
+            failures += 1
+    instrumentation.print_run_summary()
+    return 1 if failures else 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(cli())
@@ -26,20 +26,29 @@ def get_target_directory(os_name):
         else:
             target_path = pathlib.Path(user_input)
 
-        if target_path.exists():
-            if target_path.is_dir():
-                print(f"Selected directory: {target_path}")
-                return target_path
-            else:
-                print(f"Error: '{target_path}' is a file, not a directory. Please enter a valid directory path.")
-        else:
-            print(f"Error: Path '{target_path}' does not exist. Please enter a valid path.")
+        if check_target_directory(target_path):
+            print(f"Selected directory: {target_path}")
+            return target_path
 
         retry = input("Do you want to try entering a directory again? (yes/no): ").strip().lower()
         if retry != 'yes':
             return None
 
 
+def check_target_directory(target_path):
+    """
+    Checks that target_path (a pathlib.Path) is an existing directory, printing why not otherwise.
+    Returns True if it can be analyzed.
+    """
+    if target_path.exists():
+        if target_path.is_dir():
+            return True
+        print(f"Error: '{target_path}' is a file, not a directory. Please enter a valid directory path.")
+    else:
+        print(f"Error: Path '{target_path}' does not exist. Please enter a valid path.")
+    return False
+
+
 def is_hidden(filepath, os_name):
     """
     Checks if a file is hidden based on OS conventions.
@@ -54,3 +63,22 @@ def is_hidden(filepath, os_name):
     elif os_name == "Linux":
         return filepath.name.startswith('.')
     return False
+
+
+def is_hidden_entry(entry, os_name):
+    """
+    Same check as is_hidden, but for an os.DirEntry returned by os.scandir.
+    On Windows the attributes come from the entry's cached stat data, so no extra
+    system call is needed (symlinks still go through is_hidden, which follows the link).
+    """
+    if os_name == "Windows":
+        try:
+            if entry.is_symlink():
+                return is_hidden(pathlib.Path(entry.path), os_name)
+            # FILE_ATTRIBUTE_HIDDEN is 2
+            return bool(entry.stat(follow_symlinks=False).st_file_attributes & 2)
+        except (OSError, AttributeError):
+            return False
+    elif os_name == "Linux":
+        return entry.name.startswith('.')
+    return False
@@ -0,0 +1,390 @@
+# instrumentation.py
+"""
+Run metrics: where the time of an analysis run goes.
+
+A RunMetrics object is started for each analyzed target (or batch run) with start_run(), and the
+code of each phase wraps itself in `with phase("name"):`. Phases record wall time (perf_counter),
+CPU time of the process (process_time, all threads) and how often they ran. Names are dotted to
+show nesting: "scan.symlink_chains" runs inside "scan", so its time is part of the scan's too.
+phase() does nothing while no run is active, so library callers (batch workers, benchmarks)
+pay nothing.
+
+With config.COUNT_SYSCALLS the run also counts the stat, lstat, readlink and scandir calls made
+while it is active (count_syscalls, see below), and config.RUN_PROFILER runs cProfile or a
+sampling profiler around it. finish_run() derives entries/s and directories/s of the scan phase
+and writes everything as JSON next to the run's report; print_run_summary() prints the runs of
+the session at the end of file_analyzer.main / cli.
+
+Syscall counting wraps os.stat / os.lstat / os.readlink / os.scandir. DirEntry methods are
+implemented in C and cannot be patched, so the scandir wrapper hands out proxy entries that
+count a call only when CPython would actually hit the filesystem (POSIX rules: is_dir() /
+is_symlink() come from d_type, stat() results are cached on the entry, Windows lstat data comes
+from the listing). Worker processes of the 'process' engine are not counted.
+"""
+import contextlib
+import cProfile
+import collections
+import datetime
+import json
+import os
+import stat
+import sys
+import threading
+import time
+
+import config
+
+SYSCALLS = ('scandir', 'stat', 'lstat', 'readlink')
+
+_IS_WINDOWS = os.name == 'nt'
+
+
+# --- Syscall counting ---
+
+class SyscallCounter:
+    """Counts of the filesystem calls made while count_syscalls(counter) is active (thread-safe)."""
+
+    def __init__(self):
+        self.counts = dict.fromkeys(SYSCALLS, 0)
+        self._lock = threading.Lock()
+
+    def add(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+class _CountingDirEntry:
+    """Proxy around os.DirEntry that counts the stat calls CPython would really make."""
+
+    def __init__(self, entry, counter):
+        self._entry = entry
+        self._counter = counter
+        self._lstat_cached = _IS_WINDOWS  # Windows fills the lstat result from the directory listing
+        self._stat_cached = False
+        self.name = entry.name
+        self.path = entry.path
+
+    def __fspath__(self):
+        return self.path
+
+    def inode(self):
+        return self._entry.inode()
+
+    def is_symlink(self):
+        return self._entry.is_symlink()  # d_type, no syscall
+
+    def _test_mode(self, follow_symlinks, s_is):
+        # Mirrors CPython: for symlinks the type test goes through stat(), and errors mean False
+        if follow_symlinks and self._entry.is_symlink():
+            try:
+                return s_is(self.stat().st_mode)
+            except OSError:
+                return False
+        return None
+
+    def is_dir(self, *, follow_symlinks=True):
+        result = self._test_mode(follow_symlinks, stat.S_ISDIR)
+        return self._entry.is_dir(follow_symlinks=follow_symlinks) if result is None else result
+
+    def is_file(self, *, follow_symlinks=True):
+        result = self._test_mode(follow_symlinks, stat.S_ISREG)
+        return self._entry.is_file(follow_symlinks=follow_symlinks) if result is None else result
+
+    def stat(self, *, follow_symlinks=True):
+        if follow_symlinks and self._entry.is_symlink():
+            if not self._stat_cached:
+                self._counter.add('stat')
+            result = self._entry.stat(follow_symlinks=True)  # Raises for broken links (not cached)
+            self._stat_cached = True
+            return result
+        if not self._lstat_cached:
+            self._counter.add('lstat')
+            self._lstat_cached = True
+        return self._entry.stat(follow_symlinks=False)
+
+
+@contextlib.contextmanager
+def count_syscalls(counter):
+    """Counts the os.stat / os.lstat / os.readlink / os.scandir calls of all threads into counter while active."""
+    real_stat, real_lstat, real_readlink, real_scandir = os.stat, os.lstat, os.readlink, os.scandir
+
+    def counting_stat(path, *args, **kwargs):
+        # pathlib's lstat() is os.stat(..., follow_symlinks=False)
+        counter.add('stat' if kwargs.get('follow_symlinks', True) else 'lstat')
+        return real_stat(path, *args, **kwargs)
+
+    def counting_lstat(path, *args, **kwargs):
+        counter.add('lstat')
+        return real_lstat(path, *args, **kwargs)
+
+    def counting_readlink(path, *args, **kwargs):
+        counter.add('readlink')
+        return real_readlink(path, *args, **kwargs)
+
+    class _CountingScandir:
+        def __init__(self, path='.'):
+            counter.add('scandir')
+            self._it = real_scandir(path)
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            return _CountingDirEntry(next(self._it), counter)
+
+        def __enter__(self):
+            self._it.__enter__()
+            return self
+
+        def __exit__(self, *exc_info):
+            return self._it.__exit__(*exc_info)
+
+        def close(self):
+            self._it.close()
+
+    os.stat, os.lstat, os.readlink, os.scandir = counting_stat, counting_lstat, counting_readlink, _CountingScandir
+    try:
+        yield counter
+    finally:
+        os.stat, os.lstat, os.readlink, os.scandir = real_stat, real_lstat, real_readlink, real_scandir
+
+
+# --- Profilers (config.RUN_PROFILER) ---
+
+class _SamplingProfiler(threading.Thread):
+    """Samples the Python stacks of all other threads every interval_ms into collapsed-stack counts."""
+
+    def __init__(self, interval_ms):
+        super().__init__(name="run-metrics-sampler", daemon=True)
+        self.interval = interval_ms / 1000
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < 64:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write(self, output_path):
+        """Writes the samples as 'frame;frame;... count' lines (flame graph tools read them as is)."""
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# --- Run metrics ---
+
+class RunMetrics:
+    """Phase timers, syscall counts, rates and profiler output of one run (see the module docstring)."""
+
+    def __init__(self, name):
+        self.name = str(name)
+        self.started = datetime.datetime.now()
+        self.phases = {}  # Name -> {'wall_seconds', 'cpu_seconds', 'calls'}, in order of first use
+        self.counts = {}  # Entries and directories of the scanned target(s), for the rates
+        self.report_path = None  # Report the metrics file is written next to
+        self.metrics_path = None
+        self.profile_path = None
+        self.syscalls = SyscallCounter() if config.COUNT_SYSCALLS else None
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._child_cpu_start = self._child_cpu_seconds()
+        self._syscall_context = None
+        self._profiler = None
+        self._sampler = None
+
+    @staticmethod
+    def _child_cpu_seconds():
+        times = os.times()
+        return times.children_user + times.children_system  # Waited-for worker processes (0 on Windows)
+
+    def _start(self):
+        if self.syscalls is not None:
+            self._syscall_context = count_syscalls(self.syscalls)
+            self._syscall_context.__enter__()
+        if config.RUN_PROFILER == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif config.RUN_PROFILER == 'sampling':
+            self._sampler = _SamplingProfiler(config.PROFILER_SAMPLE_INTERVAL_MS)
+            self._sampler.start()
+        elif config.RUN_PROFILER is not None:
+            print(f"Unknown RUN_PROFILER '{config.RUN_PROFILER}' (expected None, 'cprofile' or 'sampling'); not profiling.")
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Adds the wall and CPU time of the block to phase `name`."""
+        timing = self.phases.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0})  # Parents first
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            timing['wall_seconds'] += time.perf_counter() - wall_start
+            timing['cpu_seconds'] += time.process_time() - cpu_start
+            timing['calls'] += 1
+
+    def count_scan(self, summary_data):
+        """Adds the entries and directories of a scan's summary_data (for the rates)."""
+        entries = (summary_data.get('total_file_entries_processed', 0)
+                   + summary_data.get('total_directory_symlinks_found', 0))
+        self.counts['entries'] = self.counts.get('entries', 0) + entries
+        self.counts['directories'] = self.counts.get('directories', 0) + summary_data.get('total_directories_scanned', 0)
+
+    def _stop(self):
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.process_time() - self._cpu_start
+        self.child_cpu_seconds = self._child_cpu_seconds() - self._child_cpu_start
+        if self._syscall_context is not None:
+            self._syscall_context.__exit__(None, None, None)
+            self._syscall_context = None
+        if self._profiler is not None:
+            self._profiler.disable()
+        elif self._sampler is not None:
+            self._sampler.stop()
+
+    def rates(self):
+        """Entries/s and directories/s of the 'scan' phase, if the run scanned anything."""
+        scan = self.phases.get('scan')
+        if not scan or not scan['wall_seconds'] or not self.counts:
+            return None
+        return {
+            'entries_per_second': self.counts['entries'] / scan['wall_seconds'],
+            'directories_per_second': self.counts['directories'] / scan['wall_seconds'],
+        }
+
+    def to_dict(self):
+        syscalls = None
+        if self.syscalls is not None:
+            syscalls = dict(self.syscalls.counts, total=self.syscalls.total)
+            if self.counts.get('entries'):
+                syscalls['per_entry'] = self.syscalls.total / self.counts['entries']
+        return {
+            'run': self.name,
+            'started': self.started.strftime('%Y-%m-%d %H:%M:%S'),
+            'traversal_engine': config.TRAVERSAL_ENGINE,
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'child_process_cpu_seconds': self.child_cpu_seconds,
+            'phases': self.phases,
+            'counts': self.counts,
+            'rates': self.rates(),
+            'syscalls': syscalls,
+            'profile': self.profile_path,
+        }
+
+    def write(self, metrics_path):
+        """Writes the metrics JSON (and the profiler output next to it)."""
+        stem = os.path.splitext(metrics_path)[0]
+        if self._profiler is not None:
+            self.profile_path = stem + ".pstats"
+            self._profiler.dump_stats(self.profile_path)
+        elif self._sampler is not None:
+            self.profile_path = stem + ".samples.txt"
+            self._sampler.write(self.profile_path)
+        with open(metrics_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        self.metrics_path = metrics_path
+
+
+_active_run = None
+_finished_runs = []
+
+
+def start_run(name):
+    """Starts the RunMetrics of a run (None if config.COLLECT_RUN_METRICS is off)."""
+    global _active_run
+    if not config.COLLECT_RUN_METRICS:
+        return None
+    _active_run = RunMetrics(name)
+    _active_run._start()
+    return _active_run
+
+
+def active_run():
+    """The RunMetrics of the running run, or None."""
+    return _active_run
+
+
+def phase(name):
+    """Context manager timing phase `name` of the active run; does nothing without one."""
+    if _active_run is None:
+        return contextlib.nullcontext()
+    return _active_run.phase(name)
+
+
+def count_scan(summary_data):
+    """Counts a scan's entries and directories in the active run, for its rates."""
+    if _active_run is not None and summary_data is not None:
+        _active_run.count_scan(summary_data)
+
+
+def set_report_path(report_path):
+    """Tells the active run where its report went, so its metrics are written next to it."""
+    if _active_run is not None:
+        _active_run.report_path = report_path
+
+
+def finish_run(run, target_directory=None):
+    """
+    Stops a run started by start_run and writes its metrics JSON: <report name>.metrics.json next to
+    its report, or a run_metrics_*.json file in config.REPORT_OUTPUT_DIRECTORY if it wrote none.
+    """
+    global _active_run
+    if run is None:
+        return
+    if _active_run is run:
+        _active_run = None
+    run._stop()
+    from report_generator import generate_report_filename  # The report stack is only loaded when needed
+
+    if run.report_path is not None:
+        metrics_path = os.path.splitext(run.report_path)[0] + ".metrics.json"
+    else:
+        metrics_path = generate_report_filename(target_directory=target_directory, report_name="run_metrics",
+                                                extension=".json")
+    try:
+        run.write(metrics_path)
+    except OSError as e:
+        print(f"Error writing run metrics to {metrics_path}: {e}")
+    _finished_runs.append(run)
+
+
+def print_run_summary():
+    """Prints the wall time of every phase of the runs finished so far, then forgets them."""
+    if not _finished_runs:
+        return
+    print("\n--- Run Metrics ---")
+    for run in _finished_runs:
+        print(f"{run.name}: {run.wall_seconds:.2f} s wall, {run.cpu_seconds:.2f} s CPU"
+              + (f" (+{run.child_cpu_seconds:.2f} s in worker processes)" if run.child_cpu_seconds else ""))
+        for name, timing in run.phases.items():
+            indent = "  " * (name.count('.') + 1)
+            print(f"{indent}{name:<{34 - len(indent)}} {timing['wall_seconds']:>9.3f} s wall {timing['cpu_seconds']:>9.3f} s CPU"
+                  + (f"  ({timing['calls']} calls)" if timing['calls'] > 1 else ""))
+        rates = run.rates()
+        if rates:
+            print(f"  {rates['entries_per_second']:.0f} entries/s, {rates['directories_per_second']:.0f} directories/s")
+        if run.syscalls is not None:
+            counts = run.syscalls.counts
+            print(f"  syscalls: {', '.join(f'{name} {counts[name]}' for name in SYSCALLS)} (total {run.syscalls.total})")
+        if run.metrics_path:
+            print(f"  Metrics: {run.metrics_path}" + (f", profile: {run.profile_path}" if run.profile_path else ""))
+    _finished_runs.clear()
@@ -1,11 +1,18 @@
 # plot_generator.py
 
 import os
+import csv
 import config
 import datetime
-import matplotlib.pyplot as plt
 import numpy as np
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from aggregators import size_for_plotting
+from record_store import FLAG_HAS_TARGET_SIZE, FLAG_IS_SYMLINK, FileRecordStore
+from size_sketch import FileSizeDistribution
 def generate_plot_filename(plot_name):
     """Generates a filename with a timestamp for a plot."""
     now = datetime.datetime.now()
@@ -17,49 +24,81 @@ def generate_plot_filename(plot_name):
 
 def get_sizes_for_plotting(all_files_data):
     """
-    Prepares a list of file sizes based on the SYMLINK_SIZE_HANDLING_FOR_PLOTS config.
-    This list is used for PMF, CDF, and scatter plots.
+    Prepares a NumPy array of file sizes based on the SYMLINK_SIZE_HANDLING_FOR_PLOTS config.
+    This array is used for PMF, CDF, and scatter plots.
+    For a FileRecordStore the sizes are selected from its columns with masks, without a Python loop.
     """
-    sizes = []
-
-    for item in all_files_data:
-        is_symlink = item.get('is_symlink', False)
-        size_bytes = item.get('size_bytes', 0) # This is symlink's own size if it's a symlink
-
-        if is_symlink:
-            if config.SYMLINK_SIZE_HANDLING_FOR_PLOTS == 'target':
-                # Potentially double counts if target is also in all_files_data
-                target_size = item.get('symlink_target_size_bytes')
-                if target_size is not None:
-                    sizes.append(target_size)
-            elif config.SYMLINK_SIZE_HANDLING_FOR_PLOTS == 'own_size':
-                if size_bytes >= 0: # Include 0-byte symlinks (Windows)
-                    sizes.append(size_bytes)
-            elif config.SYMLINK_SIZE_HANDLING_FOR_PLOTS == 'exclude':
-                pass # Do not include symlinks
-            else: # Default to excluding if config is unknown
-                pass
-        else: # Not a symlink (regular file)
-            if size_bytes >= 0: # We may want to control it for non-empty files but we are including them for distributions.
-                sizes.append(size_bytes)
-    return sizes
+    if isinstance(all_files_data, FileRecordStore):
+        size_bytes = all_files_data.numpy_column('size_bytes')
+        flags = all_files_data.numpy_column('flags')
+        is_symlink = (flags & FLAG_IS_SYMLINK) != 0
+        regular_sizes = size_bytes[~is_symlink & (size_bytes >= 0)]
+        if config.SYMLINK_SIZE_HANDLING_FOR_PLOTS == 'target':
+            # Potentially double counts if target is also in all_files_data
+            target_sizes = all_files_data.numpy_column('target_size_bytes')
+            return np.concatenate((regular_sizes, target_sizes[is_symlink & ((flags & FLAG_HAS_TARGET_SIZE) != 0)]))
+        elif config.SYMLINK_SIZE_HANDLING_FOR_PLOTS == 'own_size':
+            return np.concatenate((regular_sizes, size_bytes[is_symlink & (size_bytes >= 0)]))
+        return regular_sizes.copy()  # Not a view, so the store's memory can be released
+
+    sizes = (size_for_plotting(item) for item in all_files_data)
+    return np.fromiter((size for size in sizes if size is not None), dtype=np.int64)
+
+def _plot_binned(ax, counts, bin_edges, density=False, **bar_kwargs):
+    """
+    Draws pre-binned counts as bars on ax (what hist draws, without handing matplotlib every point).
+    With density=True the bars are normalized to a probability density like hist(density=True).
+    """
+    counts = np.asarray(counts, dtype=float)
+    bin_edges = np.asarray(bin_edges, dtype=float)
+    widths = np.diff(bin_edges)
+    if density and counts.sum() > 0:
+        counts = counts / (counts.sum() * widths)
+    ax.bar(bin_edges[:-1], counts, width=widths, align='edge', **bar_kwargs)
+
+def _size_arrays(sizes, weights):
+    """
+    Splits sizes (and their optional weights, e.g. bucket counts from a SizeSketch) for the size plots.
+    Returns (sizes, weights, positive sizes, positive weights, number of zero-byte files); weights stay None if not given.
+    """
+    sizes = np.asarray(sizes)
+    positive_mask = sizes > 0
+    if weights is None:
+        return sizes, None, sizes[positive_mask], None, int(np.count_nonzero(sizes == 0))
+    weights = np.asarray(weights)
+    return sizes, weights, sizes[positive_mask], weights[positive_mask], int(weights[sizes == 0].sum())
 
 def generate_plots(all_files_data, directory_symlinks_data, summary_data, os_name):
     """
     Main function to generate and save all specified plots.
+
+    The size plots (PMF, histogram, CDF) are drawn from the size sketches in
+    summary_data['file_size_distribution'] (see size_sketch.py); scans saved before the sketches
+    existed fall back to the sizes in all_files_data. all_files_data and directory_symlinks_data
+    are None in streaming aggregation mode (config.STREAMING_AGGREGATION), where the type bar
+    chart is drawn from summary_data['file_types_summary'] instead.
     """
     print(f"\n--- Generating Plots for {os_name} ---")
 
-    if not all_files_data and not directory_symlinks_data:
+    records_kept = all_files_data is not None
+    if not summary_data.get('file_types_summary') and not (records_kept and (all_files_data or directory_symlinks_data)):
         print("No data available to generate plots.")
         return
 
-    # Prepare sizes based on config (handles symlinks and potential double counting)
-    plot_sizes = get_sizes_for_plotting(all_files_data)
+    size_distribution = summary_data.get('file_size_distribution')
+    if size_distribution is not None:
+        # Pre-bucketed sizes (one weighted point per bucket) following SYMLINK_SIZE_HANDLING_FOR_PLOTS
+        plot_sizes, plot_weights = FileSizeDistribution.from_dict(size_distribution).plotted_sizes().weighted_sizes()
+    else:
+        # Prepare sizes based on config (handles symlinks and potential double counting)
+        plot_sizes = get_sizes_for_plotting(all_files_data or [])
+        plot_weights = None
+    type_counts = None if records_kept else summary_data.get('file_types_summary', {})
 
-    if not plot_sizes:
+    if len(plot_sizes) == 0:
         # More specific message based on why plot_sizes might be empty
-        if config.SYMLINK_SIZE_HANDLING_FOR_PLOTS == 'exclude' and not any(not f.get('is_symlink', False) for f in all_files_data):
+        if (records_kept and config.SYMLINK_SIZE_HANDLING_FOR_PLOTS == 'exclude'
+                and not any(not f.get('is_symlink', False) for f in all_files_data)):
             print("No non-symlink file data available to generate size-based plots (and symlinks are excluded).")
         else:
             print("No valid file sizes available to generate size-based plots after filtering/processing.")
@@ -73,18 +112,24 @@ def generate_plots(all_files_data, directory_symlinks_data, summary_data, os_nam
 
     base_plot_name_prefix = f"{os_name}_{sanitized_target_dir}"
 
-    if plot_sizes:
+    # The arrays each plot needs are prepared here; the figures are rendered by render_plot_jobs,
+    # each in its own worker process unless config.PLOT_WORKER_PROCESSES is 1
+    plot_jobs = []
+    if len(plot_sizes):
         # PMF plot (normalized histogram for probability density)
-        generate_pmf_plot(plot_sizes, os_name, base_plot_name_prefix)
+        plot_jobs.append(_pmf_plot_job(plot_sizes, os_name, base_plot_name_prefix, weights=plot_weights))
 
         # Histogram plot (frequency counts)
-        generate_size_histogram_plot(plot_sizes, os_name, base_plot_name_prefix)
+        plot_jobs.append(_size_histogram_plot_job(plot_sizes, os_name, base_plot_name_prefix, weights=plot_weights))
 
         # CDF plot
-        generate_cdf_plot(plot_sizes, os_name, base_plot_name_prefix)
+        plot_jobs.append(_cdf_plot_job(plot_sizes, os_name, base_plot_name_prefix, weights=plot_weights))
+
+    # Bar chart for file types uses all_files_data directly (or the summary counts when streaming)
+    plot_jobs.append(_file_type_bar_chart_job(all_files_data, directory_symlinks_data, os_name, base_plot_name_prefix,
+                                              type_counts=type_counts))
 
-    # Bar chart for file types uses all_files_data directly
-    generate_file_type_bar_chart(all_files_data, directory_symlinks_data, os_name, base_plot_name_prefix)
+    render_plot_jobs([job for job in plot_jobs if job is not None])
 
     print(f"Plots saved in '{config.PLOT_OUTPUT_DIRECTORY}' directory.")
 
@@ -93,231 +138,337 @@ def generate_plots(all_files_data, directory_symlinks_data, summary_data, os_nam
     #generate_scatter_plot(all_files_data,os_name)
     #generate_file_type_bar_chart(all_files_data,os_name)
 
-def generate_pmf_plot(sizes, os_name, base_plot_name_prefix):
+def _new_figure(figsize):
+    """Creates a Figure on the Agg canvas (no pyplot state, no GUI backend) and its axes."""
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+def _render_plot_job(job):
+    """Renders one plot job (see render_plot_jobs). Runs in a plot worker process or in the main process."""
+    job['render'](job['spec'], job['filename'])
+    return job['filename']
+
+def _render_in_worker(pool, jobs):
+    """Submits the jobs to a process pool. Returns the (job, filename, error) results, in job order."""
+    futures = [(job, pool.submit(_render_plot_job, job)) for job in jobs]
+    results = []
+    for job, future in futures:
+        try:
+            results.append((job, future.result(), None))
+        except Exception as e:
+            results.append((job, None, e))
+    return results
+
+def render_plot_jobs(jobs):
     """
-    Generates a PMF plot (normalized histogram for probability density) of file sizes.
-    'sizes' is a list of integers.
+    Renders plot jobs, dicts with the plot 'name', the 'render' function, the output 'filename' and
+    the small pre-computed 'spec' the render function draws from.
+    With config.PLOT_WORKER_PROCESSES other than 1 every plot is rendered in its own worker process,
+    so the plots are drawn at the same time; otherwise they are drawn one after another in this process.
+    A plot that fails is reported and skipped, the other plots are still rendered.
+    Returns the filenames of the saved plots.
+    """
+    num_workers = min(len(jobs), config.PLOT_WORKER_PROCESSES or len(jobs))
+    if num_workers <= 1:
+        results = []
+        for job in jobs:
+            try:
+                results.append((job, _render_plot_job(job), None))
+            except Exception as e:
+                results.append((job, None, e))
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            results = _render_in_worker(pool, jobs)
+        # A worker process that died (crash, killed) breaks the whole pool and fails every plot
+        # still pending in it. Render those again, each in a fresh process of its own, so only the
+        # plot that actually died fails.
+        for position, (job, _, error) in enumerate(results):
+            if isinstance(error, BrokenProcessPool):
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    results[position] = _render_in_worker(pool, [job])[0]
+
+    saved_filenames = []
+    for job, plot_filename, error in results:
+        if error is not None:
+            print(f"Error rendering {job['name']} plot: {error}")
+        else:
+            print(f"Saved: {plot_filename}")
+            saved_filenames.append(plot_filename)
+    return saved_filenames
+
+
+def _render_size_bars(spec, plot_filename):
+    """Renders the PMF or size histogram from its pre-binned counts."""
+    fig, ax = _new_figure((10, 6))
+    _plot_binned(ax, spec['counts'], spec['bin_edges'], density=spec['density'],
+                 alpha=0.7, color=spec['color'], edgecolor='black')
+    if spec['xticks'] is not None:
+        ax.set_xticks(spec['xticks'])
+    if spec['log_scale']:
+        ax.set_xscale('log')
+        ax.set_xlabel("File Size (bytes) - Log Scale (Positive Sizes Only)")
+    else:
+        ax.set_xlabel("File Size (bytes) - Linear Scale")
+    if spec['zero_count_note']:
+        # Add a note if zero-byte files were present but not shown on log scale
+        ax.text(0.05, 0.05, f"Note: {spec['zero_count_note']} zero-byte files not shown on log scale",
+                transform=ax.transAxes, fontsize=9, color='gray')
+
+    ax.set_ylabel(spec['ylabel'])
+    ax.set_title(spec['title'])
+    ax.grid(True, which="both", ls="--", alpha=0.5)
+    fig.tight_layout()
+    fig.savefig(plot_filename)
+
+def _size_bars_job(sizes, weights, plot_label, density):
+    """
+    Bins the sizes for the PMF (density=True) or the size histogram.
+    Returns the spec for _render_size_bars, or None if there is nothing to plot.
     """
-    if not sizes:
-        print("PMF plot: No sizes to plot.")
-        return
-
-    plt.figure(figsize=(10, 6))
-
     # Use logarithmic bins for file sizes as they span many orders of magnitude
     # Filter out non-positive sizes before log, though get_sizes_for_plotting should handle most.
-    positive_sizes = [s for s in sizes if s > 0]
-    has_zero_sizes = any(s == 0 for s in sizes)
+    sizes, weights, positive_sizes, positive_weights, zero_count = _size_arrays(sizes, weights)
+    has_zero_sizes = zero_count > 0
+    spec = {'density': density, 'xticks': None, 'log_scale': False, 'zero_count_note': 0}
 
-    if not positive_sizes:
+    if not positive_sizes.size:
         if has_zero_sizes: # All files are 0 bytes
             # Create a single bar at 0 or a small range like [0, 1]
-            plt.hist(sizes, bins=[-0.5, 0.5], density=True, alpha=0.7, color='skyblue', edgecolor='black', align='mid')
-            plt.xticks([0])
-            plt.xlabel("File Size (bytes) - Linear Scale")
+            spec['counts'], spec['bin_edges'] = np.histogram(sizes, bins=[-0.5, 0.5], weights=weights)
+            spec['xticks'] = [0]
         else: # No files at all (or all filtered out)
-            print("PMF plot: No positive sizes to plot for log scale, and no zero-byte files.")
-            plt.close() # Close the empty figure
-            return
+            print(f"{plot_label}: No positive sizes to plot for log scale, and no zero-byte files.")
+            return None
     else: # There are positive sizes
-        min_val = min(positive_sizes)
-        max_val = max(positive_sizes)
+        min_val = positive_sizes.min()
+        max_val = positive_sizes.max()
 
         if min_val == max_val : # All positive files are the same size
              # Create bins around this single size for visibility
              bins = [min_val * 0.9 if min_val > 0 else -0.1, min_val * 1.1 if min_val > 0 else 0.1]
              if has_zero_sizes: # If zeros also exist, need to handle bins carefully
                  bins = sorted(list(set([-0.5, 0.5] + bins))) # Combine zero bin with the positive bin
-             plt.hist(sizes, bins=bins, density=True, alpha=0.7, color='skyblue', edgecolor='black')
-             plt.xlabel("File Size (bytes) - Linear Scale")
+             spec['counts'], spec['bin_edges'] = np.histogram(sizes, bins=bins, weights=weights)
         else:
             num_bins = 50
             # If zeros are present, they will be in their own bin if the log scale doesn't cover them
             # or might be excluded by log scale. It's often better to plot zeros separately or use symlog.
             # For simplicity, histogram on positive sizes with log bins.
             log_bins = np.logspace(np.log10(min_val), np.log10(max_val), num_bins)
-            plt.hist(positive_sizes, bins=log_bins, density=True, alpha=0.7, color='skyblue', edgecolor='black')
-            plt.xscale('log')
-            plt.xlabel("File Size (bytes) - Log Scale (Positive Sizes Only)")
-            if has_zero_sizes:
-                # Add a note if zero-byte files were present but not shown on log scale PMF
-                plt.text(0.05, 0.05, f"Note: {sizes.count(0)} zero-byte files not shown on log scale",
-                         transform=plt.gca().transAxes, fontsize=9, color='gray')
-
-
-    plt.ylabel("Probability Density")
-    plt.title(f"PMF of File Sizes ({os_name})")
-    plt.grid(True, which="both", ls="--", alpha=0.5)
-    plt.tight_layout()
-    plot_filename = generate_plot_filename(f"{base_plot_name_prefix}_pmf_file_sizes")
-    plt.savefig(plot_filename)
-    plt.close()
-    print(f"Saved: {plot_filename}")
-
-
-def generate_size_histogram_plot(sizes, os_name, base_plot_name_prefix):
+            spec['counts'], _ = np.histogram(positive_sizes, bins=log_bins, weights=positive_weights)
+            spec['bin_edges'] = log_bins
+            spec['log_scale'] = True
+            spec['zero_count_note'] = zero_count
+    return spec
+
+def _pmf_plot_job(sizes, os_name, base_plot_name_prefix, weights=None):
+    """Prepares the PMF plot job (normalized histogram for probability density), or returns None."""
+    if len(sizes) == 0:
+        print("PMF plot: No sizes to plot.")
+        return None
+    spec = _size_bars_job(sizes, weights, "PMF plot", density=True)
+    if spec is None:
+        return None
+    spec.update(color='skyblue', ylabel="Probability Density", title=f"PMF of File Sizes ({os_name})")
+    return {'name': 'PMF', 'render': _render_size_bars, 'spec': spec,
+            'filename': generate_plot_filename(f"{base_plot_name_prefix}_pmf_file_sizes")}
+
+def generate_pmf_plot(sizes, os_name, base_plot_name_prefix, weights=None):
     """
-    Generates a histogram (frequency counts) of file sizes.
-    'sizes' is a list of integers.
+    Generates a PMF plot (normalized histogram for probability density) of file sizes.
+    'sizes' is a list or array of integers; optional 'weights' gives the number of files of each size.
     """
-    if not sizes:
-        print("Size Histogram plot: No sizes to plot.")
-        return
+    job = _pmf_plot_job(sizes, os_name, base_plot_name_prefix, weights=weights)
+    if job is not None:
+        render_plot_jobs([job])
 
-    plt.figure(figsize=(10, 6))
 
-    positive_sizes = [s for s in sizes if s > 0]
-    has_zero_sizes = any(s == 0 for s in sizes)
+def _size_histogram_plot_job(sizes, os_name, base_plot_name_prefix, weights=None):
+    """Prepares the size histogram plot job (frequency counts), or returns None."""
+    if len(sizes) == 0:
+        print("Size Histogram plot: No sizes to plot.")
+        return None
+    spec = _size_bars_job(sizes, weights, "Size Histogram plot", density=False)
+    if spec is None:
+        return None
+    spec.update(color='coral', ylabel="Frequency (Count)", title=f"Histogram of File Sizes ({os_name})")
+    return {'name': 'size histogram', 'render': _render_size_bars, 'spec': spec,
+            'filename': generate_plot_filename(f"{base_plot_name_prefix}_histogram_file_sizes")}
+
+def generate_size_histogram_plot(sizes, os_name, base_plot_name_prefix, weights=None):
+    """
+    Generates a histogram (frequency counts) of file sizes.
+    'sizes' is a list or array of integers; optional 'weights' gives the number of files of each size.
+    """
+    job = _size_histogram_plot_job(sizes, os_name, base_plot_name_prefix, weights=weights)
+    if job is not None:
+        render_plot_jobs([job])
 
-    if not positive_sizes:
-        if has_zero_sizes: # All files are 0 bytes
-            counts, bins = np.histogram(sizes, bins=[-0.5, 0.5])
-            plt.bar(bins[:-1], counts, width=np.diff(bins), alpha=0.7, color='coral', edgecolor='black', align='edge')
-            plt.xticks([0])
-            plt.xlabel("File Size (bytes) - Linear Scale")
-        else:
-            print("Size Histogram plot: No positive sizes to plot for log scale, and no zero-byte files.")
-            plt.close()
-            return
-    else:
-        min_val = min(positive_sizes)
-        max_val = max(positive_sizes)
 
-        if min_val == max_val: # All positive files are the same size
-             bins = [min_val * 0.9 if min_val > 0 else -0.1, min_val * 1.1 if min_val > 0 else 0.1]
-             if has_zero_sizes:
-                 bins = sorted(list(set([-0.5, 0.5] + bins)))
-             counts, bins = np.histogram(sizes, bins=bins)
-             plt.bar(bins[:-1], counts, width=np.diff(bins), alpha=0.7, color='coral', edgecolor='black', align='edge')
-             plt.xlabel("File Size (bytes) - Linear Scale")
-        else:
-            num_bins = 50
-            log_bins = np.logspace(np.log10(min_val), np.log10(max_val), num_bins)
-            # Plot histogram for positive sizes on log scale
-            plt.hist(positive_sizes, bins=log_bins, alpha=0.7, color='coral', edgecolor='black')
-            plt.xscale('log')
-            plt.xlabel("File Size (bytes) - Log Scale (Positive Sizes Only)")
-            if has_zero_sizes:
-                plt.text(0.05, 0.05, f"Note: {sizes.count(0)} zero-byte files not shown on log scale",
-                         transform=plt.gca().transAxes, fontsize=9, color='gray')
-
-    plt.ylabel("Frequency (Count)")
-    plt.title(f"Histogram of File Sizes ({os_name})")
-    plt.grid(True, which="both", ls="--", alpha=0.5)
-    plt.tight_layout()
-    plot_filename = generate_plot_filename(f"{base_plot_name_prefix}_histogram_file_sizes")
-    plt.savefig(plot_filename)
-    plt.close()
-    print(f"Saved: {plot_filename}")
-
-
-def generate_cdf_plot(sizes, os_name, base_plot_name_prefix):
+def reduce_cdf(sizes, weights=None, max_points=None):
     """
-    Generates a CDF plot of file sizes.
-    'sizes' is a list of integers.
+    Reduces the empirical CDF of 'sizes' (optionally weighted) to at most about max_points vertices
+    (default config.CDF_MAX_POINTS). Returns (x, cumulative_counts): increasing distinct sizes and the
+    number of sizes <= each of them, i.e. the vertices of the step CDF.
+    With more distinct sizes than max_points, the vertices are the largest distinct sizes at or below
+    the points of a logarithmic grid from the smallest positive to the largest size, plus the smallest
+    size, so the CDF is still exact at every vertex and its shape is kept on a log axis.
     """
-    if not sizes:
-        print("CDF plot: No sizes to plot.")
-        return
+    if max_points is None:
+        max_points = config.CDF_MAX_POINTS
+    if weights is None:
+        x, counts = np.unique(sizes, return_counts=True)
+    else:
+        x, inverse = np.unique(sizes, return_inverse=True)
+        counts = np.bincount(inverse.ravel(), weights=weights, minlength=len(x)).astype(np.int64)
+    cumulative_counts = np.cumsum(counts)
+
+    if len(x) > max_points:
+        first_positive = int(np.searchsorted(x, 0, side='right'))
+        grid = np.geomspace(x[first_positive], x[-1], max_points - 1)
+        vertices = np.searchsorted(x, grid, side='right') - 1
+        vertices = np.unique(np.concatenate(([0, first_positive, len(x) - 1], vertices)))
+        x, cumulative_counts = x[vertices], cumulative_counts[vertices]
+    return x, cumulative_counts
+
+
+def export_cdf_csv(x, cumulative_counts, csv_filename):
+    """Writes a (reduced) CDF series as returned by reduce_cdf to a CSV file."""
+    total = cumulative_counts[-1] if len(cumulative_counts) else 0
+    with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['size_bytes', 'cumulative_count', 'cumulative_probability'])
+        for size, cumulative_count in zip(x.tolist(), cumulative_counts.tolist()):
+            writer.writerow([size, cumulative_count, cumulative_count / total])
+
+
+def _render_cdf(spec, plot_filename):
+    """Renders the CDF plot from its reduced series."""
+    fig, ax = _new_figure((10, 6))
+    ax.plot(spec['x'], spec['yvals'], marker='.', ms=4, markerfacecolor='navy', markeredgecolor='navy',
+            linestyle='-', drawstyle='steps-post', color='cornflowerblue')
+    if spec['log_scale']:
+        ax.set_xscale('log')
+        ax.set_xlabel("File Size (bytes) - Log Scale")
+    else:
+        ax.set_xlabel("File Size (bytes) - Linear Scale")
+    ax.set_xlim(left=spec['xlim_left'])
 
-    plt.figure(figsize=(10, 6))
+    ax.set_ylabel("Cumulative Probability (P(Size <= x))")
+    ax.set_title(spec['title'])
+    ax.grid(True, which="both", ls="--", alpha=0.5)
+    ax.set_ylim(0, 1.05)
+    fig.tight_layout()
+    fig.savefig(plot_filename)
 
-    sorted_sizes = np.sort(sizes) # Includes 0-byte files if they are in 'sizes'
-    yvals = np.arange(1, len(sorted_sizes) + 1) / float(len(sorted_sizes))
+def _cdf_plot_job(sizes, os_name, base_plot_name_prefix, weights=None):
+    """
+    Prepares the CDF plot job from the reduced CDF series (see reduce_cdf), or returns None.
+    The series is also written as CSV if config.CDF_EXPORT_CSV is True.
+    """
+    if len(sizes) == 0:
+        print("CDF plot: No sizes to plot.")
+        return None
 
-    plt.plot(sorted_sizes, yvals, marker='.', linestyle='none', ms=4, color='navy')
-    plt.plot(sorted_sizes, yvals, linestyle='-', drawstyle='steps-post', color='cornflowerblue')
+    # Includes 0-byte files if they are in 'sizes'
+    x, cumulative_counts = reduce_cdf(sizes, weights)
+    yvals = cumulative_counts / float(cumulative_counts[-1])
 
     # Determine if log scale is appropriate for X-axis
-    # If there are positive values and a significant range (e.g., max/min > 10 or many values)
-    positive_sizes_for_scale = [s for s in sorted_sizes if s > 0]
-    use_log_scale_x = False
-    if positive_sizes_for_scale:
-        min_pos = min(positive_sizes_for_scale)
-        max_pos = max(positive_sizes_for_scale)
-        if max_pos / (min_pos or 1) > 10 or len(set(positive_sizes_for_scale)) > 10: # Heuristic
-            use_log_scale_x = True
+    # If there are positive values and a significant range (e.g., max/min > 10 or many values).
+    # x is sorted and distinct, and the reduced series keeps the smallest positive and largest size.
+    positive_x = x[x > 0]
+    use_log_scale_x = positive_x.size > 0 and (positive_x[-1] / positive_x[0] > 10 or positive_x.size > 10) # Heuristic
 
+    # For xlim, ensure it starts from 0 or just before the first data point if linear
+    # For log, it must be > 0. Smallest positive value can be a guide.
     if use_log_scale_x:
-        plt.xscale('log')
-        plt.xlabel("File Size (bytes) - Log Scale")
-        # Adjust xlim for log scale: ensure min is slightly less than smallest positive if present
-        # x_min_limit = min_pos * 0.9 if min_pos > 0 else 1 # Avoid log(0) or log(negative)
-        # if x_min_limit <=0: x_min_limit = 1e-1 # a small positive number if min_pos was 0
-        # plt.xlim(left=x_min_limit)
-
+        xlim_left = positive_x[0] * 0.5 # Start a bit before the first positive point
     else:
-        plt.xlabel("File Size (bytes) - Linear Scale")
-        # plt.xlim(left=max(0, min(sorted_sizes) * 0.9 if sorted_sizes.size > 0 and min(sorted_sizes) >=0 else 0))
+        xlim_left = x[0] - (x[-1] - x[0]) * 0.05 if x.size > 1 else x[0] - 0.5
 
-    # For xlim, ensure it starts from 0 or just before the first data point if linear
-    # For log, it must be > 0. Smallest positive value can be a guide.
-    if sorted_sizes.size > 0:
-        if plt.gca().get_xscale() == 'log':
-            first_positive = next((s for s in sorted_sizes if s > 0), None)
-            if first_positive is not None:
-                plt.xlim(left=first_positive * 0.5) # Start a bit before the first positive point
-            else: # All zeros, log scale won't show anything useful, but plot is already linear
-                plt.xlim(left=-0.1) # Show around zero
-        else: # Linear scale
-            plt.xlim(left=min(sorted_sizes) - (max(sorted_sizes)-min(sorted_sizes))*0.05 if len(set(sorted_sizes)) > 1 else min(sorted_sizes)-0.5 )
-
-
-    plt.ylabel("Cumulative Probability (P(Size <= x))")
-    plt.title(f"CDF of File Sizes ({os_name})")
-    plt.grid(True, which="both", ls="--", alpha=0.5)
-    plt.ylim(0, 1.05)
-    plt.tight_layout()
     plot_filename = generate_plot_filename(f"{base_plot_name_prefix}_cdf_file_sizes")
-    plt.savefig(plot_filename)
-    plt.close()
-    print(f"Saved: {plot_filename}")
+    if config.CDF_EXPORT_CSV:
+        csv_filename = os.path.splitext(plot_filename)[0] + ".csv"
+        export_cdf_csv(x, cumulative_counts, csv_filename)
+        print(f"Saved: {csv_filename}")
 
+    spec = {'x': x, 'yvals': yvals, 'log_scale': bool(use_log_scale_x), 'xlim_left': float(xlim_left),
+            'title': f"CDF of File Sizes ({os_name})"}
+    return {'name': 'CDF', 'render': _render_cdf, 'spec': spec, 'filename': plot_filename}
 
-def generate_file_type_bar_chart(all_files_data, directory_symlinks_data, os_name, base_plot_name_prefix):
+def generate_cdf_plot(sizes, os_name, base_plot_name_prefix, weights=None):
     """
-    Generates a bar chart for file/entry type counts.
+    Generates a CDF plot of file sizes.
+    'sizes' is a list or array of integers; optional 'weights' gives the number of files of each size.
+    The CDF is drawn from its reduced series (see reduce_cdf), which is also written as CSV if
+    config.CDF_EXPORT_CSV is True.
     """
-    if not all_files_data and not directory_symlinks_data:
-        print("Bar chart: No data for file types.")
-        return
-
-    # Consolidate types from both lists
-    type_list = [f.get("type", "unknown") for f in all_files_data]
-    type_list.extend([d.get("type", "unknown") for d in directory_symlinks_data])
-
-    type_counter = Counter(type_list)
-    top_types = type_counter.most_common(config.BAR_CHART_TOP_N_TYPES)
-
-    if not top_types:
-        print("Bar chart: No file types to plot after processing.")
-        return
+    job = _cdf_plot_job(sizes, os_name, base_plot_name_prefix, weights=weights)
+    if job is not None:
+        render_plot_jobs([job])
 
-    types, counts = zip(*top_types)
 
-    plt.figure(figsize=(12, 8))
-    bars = plt.bar(types, counts, color='teal', edgecolor='black')
-    plt.xlabel("File / Entry Type")
-    plt.ylabel("Count")
-    plt.title(f"Top {len(types)} File & Entry Type Counts ({os_name})")
-    plt.xticks(rotation=45, ha="right")
+def _render_type_bar_chart(spec, plot_filename):
+    """Renders the bar chart of the top file / entry types."""
+    types, counts = spec['types'], spec['counts']
+    fig, ax = _new_figure((12, 8))
+    bars = ax.bar(range(len(types)), counts, color='teal', edgecolor='black')
+    ax.set_xlabel("File / Entry Type")
+    ax.set_ylabel("Count")
+    ax.set_title(spec['title'])
+    ax.set_xticks(range(len(types)), labels=types, rotation=45, ha="right")
 
     # Dynamic y-ticks
     if counts:
         max_c = max(counts)
         # Ensure step is at least 1
         step_val = max(1, int(max_c * 0.05 if max_c > 20 else (max_c * 0.1 if max_c > 10 else 1) ))
-        plt.yticks(np.arange(0, max_c + step_val, step=step_val))
+        ax.set_yticks(np.arange(0, max_c + step_val, step=step_val))
 
 
     for bar in bars:
         yval = bar.get_height()
         if yval > 0 :
-             plt.text(bar.get_x() + bar.get_width()/2.0, yval + (max(counts)*0.01 if counts and max(counts)>0 else 0.1), int(yval), ha='center', va='bottom', fontsize=9)
-
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    plot_filename = generate_plot_filename(f"{base_plot_name_prefix}_top_entry_types")
-    plt.savefig(plot_filename)
-    plt.close()
-    print(f"Saved: {plot_filename}")
\ No newline at end of file
+             ax.text(bar.get_x() + bar.get_width()/2.0, yval + (max(counts)*0.01 if counts and max(counts)>0 else 0.1), int(yval), ha='center', va='bottom', fontsize=9)
+
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    fig.savefig(plot_filename)
+
+def _file_type_bar_chart_job(all_files_data, directory_symlinks_data, os_name, base_plot_name_prefix, type_counts=None):
+    """Counts the top file / entry types for the bar chart job, or returns None if there are none."""
+    if type_counts is not None:
+        type_counter = Counter(type_counts)
+    else:
+        if not all_files_data and not directory_symlinks_data:
+            print("Bar chart: No data for file types.")
+            return None
+
+        # Consolidate types from both lists
+        type_list = [f.get("type", "unknown") for f in all_files_data]
+        type_list.extend([d.get("type", "unknown") for d in directory_symlinks_data])
+
+        type_counter = Counter(type_list)
+    top_types = type_counter.most_common(config.BAR_CHART_TOP_N_TYPES)
+
+    if not top_types:
+        print("Bar chart: No file types to plot after processing.")
+        return None
+
+    types, counts = zip(*top_types)
+    spec = {'types': list(types), 'counts': list(counts),
+            'title': f"Top {len(types)} File & Entry Type Counts ({os_name})"}
+    return {'name': 'entry type bar chart', 'render': _render_type_bar_chart, 'spec': spec,
+            'filename': generate_plot_filename(f"{base_plot_name_prefix}_top_entry_types")}
+
+def generate_file_type_bar_chart(all_files_data, directory_symlinks_data, os_name, base_plot_name_prefix, type_counts=None):
+    """
+    Generates a bar chart for file/entry type counts.
+    type_counts (type -> count, e.g. summary_data['file_types_summary']) is used instead of the records if given.
+    """
+    job = _file_type_bar_chart_job(all_files_data, directory_symlinks_data, os_name, base_plot_name_prefix,
+                                   type_counts=type_counts)
+    if job is not None:
+        render_plot_jobs([job])
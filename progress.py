@@ -0,0 +1,209 @@
+# progress.py
+"""
+Scan progress display, drawn by a background thread.
+
+The traversal loops never print progress themselves: they only keep their ScanCounters up to
+date. A ProgressReporter started around the traversal samples those counters through a
+`sample()` callable every config.PROGRESS_REFRESH_SECONDS and shows directories, entries and bytes
+scanned, entries/s and bytes/s over the last few seconds, and the access errors so far. When a
+previous scan of the same target exists (expect_totals()), it also shows how far the scan is
+compared to that scan's entry count and an ETA at the current rate.
+
+On a terminal the progress line is redrawn in place. When stdout is not a terminal (redirected to
+a file or a pipe) the reporter switches to a quiet log mode: a plain line every
+config.PROGRESS_LOG_INTERVAL_SECONDS, without carriage returns or spinner.
+
+Warnings and access errors found while scanning go through warn(). While a reporter is running
+they are queued and printed by its thread (at most config.PROGRESS_MAX_MESSAGES_PER_REFRESH per
+refresh, the rest only counted), so a tree full of unreadable entries does not slow the scan
+down with console output. Without a running reporter (library use, worker processes) warn()
+prints to stderr right away.
+
+Counters are read without locks: each is a Python int written by one thread, so a sample may be
+a moment behind but is never torn.
+"""
+import collections
+import os
+import shutil
+import sys
+import threading
+import time
+
+import config
+
+# What sample() returns: running totals of the scan
+ProgressSample = collections.namedtuple('ProgressSample', ['directories', 'entries', 'bytes', 'errors'])
+
+_SPINNER_CHARS = ['|', '/', '-', '\\']
+_RATE_WINDOW_SECONDS = 5.0  # Rates are averaged over the samples of this many seconds
+
+_active_reporter = None
+_expected_totals = None
+
+
+def expect_totals(summary_data):
+    """
+    Sets the totals of the previous scan of the target (its summary_data) for the ETA of the next
+    reporter started. Pass None to clear them.
+    """
+    global _expected_totals
+    if summary_data is None:
+        _expected_totals = None
+        return
+    _expected_totals = (summary_data.get('total_file_entries_processed', 0)
+                        + summary_data.get('total_directory_symlinks_found', 0))
+
+
+def warn(message):
+    """Prints a scan warning or error to stderr, through the running reporter if there is one."""
+    reporter = _active_reporter
+    if reporter is not None and reporter.owner_pid == os.getpid():  # A forked worker inherits the global, not the thread
+        reporter.messages.append(message)
+    else:
+        print(message, file=sys.stderr)
+
+
+def format_bytes(num_bytes):
+    """Human-readable size in powers of 1024, e.g. '1.5 GiB'."""
+    size = float(num_bytes)
+    for unit in ('B', 'KiB', 'MiB', 'GiB', 'TiB'):
+        if abs(size) < 1024 or unit == 'TiB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class ProgressReporter:
+    """
+    Background thread showing the progress of one scan (see the module docstring). A context
+    manager: the thread runs while the block runs, and the progress line is cleared on exit.
+    """
+
+    def __init__(self, sample, label="Scanning", stream=None):
+        self.sample = sample
+        self.label = label
+        self.stream = stream if stream is not None else sys.stdout
+        isatty = getattr(self.stream, 'isatty', None)
+        self.interactive = bool(isatty and isatty())
+        self.expected_entries = _expected_totals
+        self.messages = collections.deque()  # Appended by warn() from any scanning thread
+        self.messages_suppressed = 0
+        self.owner_pid = os.getpid()
+        self._history = collections.deque()  # (monotonic time, ProgressSample) within _RATE_WINDOW_SECONDS
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_time = None
+        self._last_log_time = None
+        self._line_length = 0
+        self._spinner_idx = 0
+
+    def start(self):
+        global _active_reporter, _expected_totals
+        _expected_totals = None  # Used by this scan only
+        self._start_time = self._last_log_time = time.monotonic()
+        self._history.append((self._start_time, self.sample()))  # A resumed scan does not start from zero
+        _active_reporter = self
+        self._thread = threading.Thread(target=self._run, name="scan-progress", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        global _active_reporter
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if _active_reporter is self:
+            _active_reporter = None
+        self._clear_line()
+        self._print_messages(limit=config.PROGRESS_MAX_MESSAGES_PER_REFRESH)
+        if self.messages_suppressed:
+            print(f"{self.messages_suppressed} more warnings and errors were not shown.", file=sys.stderr)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    # --- Reporter thread ---
+
+    def _run(self):
+        while not self._stop.wait(config.PROGRESS_REFRESH_SECONDS):
+            self.refresh()
+
+    def refresh(self):
+        """Takes a sample, prints the queued messages and redraws (or logs) the progress line."""
+        now = time.monotonic()
+        current = self.sample()
+        self._history.append((now, current))
+        while len(self._history) > 2 and now - self._history[0][0] > _RATE_WINDOW_SECONDS:
+            self._history.popleft()
+
+        if self.messages:
+            self._clear_line()
+            self._print_messages(limit=config.PROGRESS_MAX_MESSAGES_PER_REFRESH)
+        if self.interactive:
+            self._draw(self.format_line(current, now))
+        elif now - self._last_log_time >= config.PROGRESS_LOG_INTERVAL_SECONDS:
+            self._last_log_time = now
+            print(f"[{_format_duration(now - self._start_time)}] {self.format_line(current, now)}",
+                  file=self.stream, flush=True)
+
+    def rates(self, current, now):
+        """(entries/s, bytes/s) since the oldest sample of the rate window."""
+        then, previous = self._history[0]
+        elapsed = now - then
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (current.entries - previous.entries) / elapsed, (current.bytes - previous.bytes) / elapsed
+
+    def format_line(self, current, now):
+        """Progress text of a sample: percentage of the last scan and ETA first, so narrow terminals keep them."""
+        entries_rate, bytes_rate = self.rates(current, now)
+        parts = [f"{current.directories:,} dirs, {current.entries:,} entries ({entries_rate:,.0f}/s), "
+                 f"{format_bytes(current.bytes)} ({format_bytes(bytes_rate)}/s)"]
+        if current.errors:
+            parts.append(f"{current.errors:,} errors")
+        if self.expected_entries:
+            if current.entries < self.expected_entries:
+                remaining = (self.expected_entries - current.entries) / entries_rate if entries_rate > 0 else None
+                eta = _format_duration(remaining) if remaining is not None else "?"
+                parts.insert(0, f"{current.entries / self.expected_entries:.0%} ETA {eta}")
+            else:
+                parts.insert(0, "past last scan's total")
+        return " | ".join(parts)
+
+    def _draw(self, text):
+        spinner = _SPINNER_CHARS[self._spinner_idx % len(_SPINNER_CHARS)]
+        self._spinner_idx += 1
+        line = f"{self.label} {spinner} {text}"
+        width = shutil.get_terminal_size().columns - 1
+        if len(line) > width:
+            line = line[:max(width - 3, 0)] + "..."
+        self.stream.write("\r" + line.ljust(self._line_length))
+        self.stream.flush()
+        self._line_length = len(line)
+
+    def _clear_line(self):
+        if self.interactive and self._line_length:
+            self.stream.write("\r" + " " * self._line_length + "\r")
+            self.stream.flush()
+            self._line_length = 0
+
+    def _print_messages(self, limit):
+        shown = 0
+        while self.messages:
+            message = self.messages.popleft()
+            if shown < limit:
+                print(message, file=sys.stderr)
+                shown += 1
+            else:
+                self.messages_suppressed += 1
+        if shown:
+            sys.stderr.flush()
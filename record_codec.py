@@ -0,0 +1,175 @@
+# record_codec.py
+"""
+Compact binary encoding of scan records (all_files_data as a FileRecordStore and
+directory_symlinks_data, see DATA_STRUCTURES.md).
+
+Used to move records between processes without pickling one dict and one pathlib.Path
+per entry. The buffer is a header followed by two packed stores (files, then directory
+symlinks); each packed store is its FileRecordStore columns written back to back:
+
+    string tables   directories, types, symlink targets: count, end offsets (uint64)
+                    and UTF-8 bytes
+    symlink rows    uint64 row number of every symlink target
+    dir stats       directory code (uint64), st_dev, st_ino (uint64), st_mtime_ns (int64)
+                    of every directory in directory_stats
+    inodes          row number, st_dev, st_ino (uint64) of every entry in the inodes side table
+    name pool       end offsets (uint64) + UTF-8 bytes
+    columns         dir_idx, size_bytes, allocated_bytes, hard_links, target_size, flags,
+                    type_code, target_type, with the typecodes of COLUMN_TYPECODES
+
+All integers are little-endian. Strings are encoded with 'surrogatepass' so undecodable
+file names (surrogate-escaped on Linux, lone surrogates on Windows) round-trip.
+"""
+import array
+import struct
+import sys
+
+from record_store import COLUMN_TYPECODES, FileRecordStore
+
+_MAGIC = b"FAREC05\0"
+_HEADER = struct.Struct("<8sQ")  # magic, number of packed stores
+_COUNT = struct.Struct("<Q")
+_STR_ERRORS = 'surrogatepass'
+
+# Column attributes of FileRecordStore, in the order they are packed
+_COLUMNS = ('dir_idx', 'size_bytes', 'allocated_bytes', 'hard_links', 'target_size_bytes', 'flags', 'type_codes', 'target_type_codes')
+
+
+def _little_endian(arr):
+    if sys.byteorder != 'little':
+        arr.byteswap()
+    return arr
+
+
+def _pack_count(value):
+    return _COUNT.pack(value)
+
+
+def _pack_array(arr):
+    return _little_endian(array.array(arr.typecode, arr)).tobytes()
+
+
+def _pack_strings(strings):
+    heap = bytearray()
+    ends = array.array('Q')
+    for s in strings:
+        heap += s.encode('utf-8', _STR_ERRORS)
+        ends.append(len(heap))
+    return _pack_count(len(ends)) + _pack_array(ends) + bytes(heap)
+
+
+def _pack_store(store):
+    target_rows = array.array('Q', store.symlink_targets.keys())
+    parts = [
+        _pack_count(len(store)),
+        _pack_strings(store.directories),
+        _pack_strings(store.types),
+        _pack_count(len(target_rows)), _pack_array(target_rows),
+        _pack_strings(store.symlink_targets.values()),
+        _pack_count(len(store.directory_stats)),
+        _pack_array(array.array('Q', store.directory_stats.keys())),
+        _pack_array(array.array('Q', (key[0] for key in store.directory_stats.values()))),
+        _pack_array(array.array('Q', (key[1] for key in store.directory_stats.values()))),
+        _pack_array(array.array('q', (key[2] for key in store.directory_stats.values()))),
+        _pack_count(len(store.inodes)),
+        _pack_array(array.array('Q', store.inodes.keys())),
+        _pack_array(array.array('Q', (inode[0] for inode in store.inodes.values()))),
+        _pack_array(array.array('Q', (inode[1] for inode in store.inodes.values()))),
+        _pack_array(store.name_ends),
+        _pack_count(len(store.name_pool)), bytes(store.name_pool),
+    ]
+    parts.extend(_pack_array(getattr(store, column)) for column in _COLUMNS)
+    return b"".join(parts)
+
+
+class _Reader:
+    """Sequentially slices values out of a buffer."""
+
+    def __init__(self, buffer, offset=0):
+        self.buffer = buffer
+        self.offset = offset
+
+    def take_bytes(self, size):
+        chunk = self.buffer[self.offset:self.offset + size]
+        self.offset += size
+        return bytes(chunk)
+
+    def take_count(self):
+        (value,) = _COUNT.unpack_from(self.buffer, self.offset)
+        self.offset += _COUNT.size
+        return value
+
+    def take_array(self, typecode, count):
+        arr = array.array(typecode)
+        arr.frombytes(self.take_bytes(arr.itemsize * count))
+        return _little_endian(arr)
+
+    def take_strings(self):
+        count = self.take_count()
+        ends = self.take_array('Q', count)
+        heap = self.take_bytes(ends[-1] if count else 0)
+        strings = []
+        start = 0
+        for end in ends:
+            strings.append(heap[start:end].decode('utf-8', _STR_ERRORS))
+            start = end
+        return strings
+
+
+def _unpack_store(reader):
+    store = FileRecordStore()
+    count = reader.take_count()
+    for directory in reader.take_strings():
+        store.directory_code(directory)
+    for type_str in reader.take_strings():
+        store.type_code(type_str)
+    target_rows = reader.take_array('Q', reader.take_count())
+    store.symlink_targets = dict(zip(target_rows, reader.take_strings()))
+    num_dir_stats = reader.take_count()
+    dir_codes = reader.take_array('Q', num_dir_stats)
+    dir_keys = zip(reader.take_array('Q', num_dir_stats), reader.take_array('Q', num_dir_stats),
+                   reader.take_array('q', num_dir_stats))
+    store.directory_stats = dict(zip(dir_codes, dir_keys))
+    num_inodes = reader.take_count()
+    inode_rows = reader.take_array('Q', num_inodes)
+    store.inodes = dict(zip(inode_rows, zip(reader.take_array('Q', num_inodes), reader.take_array('Q', num_inodes))))
+    store.name_ends = reader.take_array('Q', count)
+    store.name_pool = bytearray(reader.take_bytes(reader.take_count()))
+    for column in _COLUMNS:
+        setattr(store, column, reader.take_array(COLUMN_TYPECODES[column], count))
+    return store
+
+
+def encode_records(all_files_data, directory_symlinks_data):
+    """
+    Encodes the file records (a FileRecordStore, or any iterable of record dicts) and the
+    directory symlink records into one bytes object.
+    """
+    if not isinstance(all_files_data, FileRecordStore):
+        files_store = FileRecordStore()
+        files_store.extend(all_files_data)
+        all_files_data = files_store
+    dir_symlinks_store = FileRecordStore()
+    dir_symlinks_store.extend(directory_symlinks_data)
+    return _HEADER.pack(_MAGIC, 2) + _pack_store(all_files_data) + _pack_store(dir_symlinks_store)
+
+
+def decode_records(buffer):
+    """
+    Decodes a buffer produced by encode_records (bytes, bytearray or memoryview).
+    Returns (all_files_data as a FileRecordStore, directory_symlinks_data as a list of dicts).
+    """
+    buffer = memoryview(buffer)
+    magic, num_stores = _HEADER.unpack_from(buffer, 0)
+    if magic != _MAGIC or num_stores != 2:
+        raise ValueError("Not an encoded record buffer (bad magic)")
+    reader = _Reader(buffer, _HEADER.size)
+    files_store = _unpack_store(reader)
+    dir_symlinks_store = _unpack_store(reader)
+
+    directory_symlinks_data = []
+    for view in dir_symlinks_store:
+        record = dict(view)
+        del record['symlink_target_size_bytes']  # Directory symlink records do not carry this key
+        directory_symlinks_data.append(record)
+    return files_store, directory_symlinks_data
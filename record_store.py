@@ -0,0 +1,467 @@
+# record_store.py
+"""
+Array-backed storage for all_files_data.
+
+A list of record dicts costs roughly a kilobyte per file (the dict, a pathlib.Path with
+its cached parts, the name string, boxed ints...). FileRecordStore keeps the same
+information in typed columns instead:
+
+    dir_idx        uint32  index into the interned parent directory table
+    name_ends      uint64  end offset of the entry name in one shared UTF-8 name pool
+    size_bytes     int64
+    allocated      int64   allocated_bytes (st_blocks * 512)
+    hard_links     uint32  st_nlink
+    target_size    int64   symlink_target_size_bytes (valid if FLAG_HAS_TARGET_SIZE)
+    flags          uint8   FLAG_* bits (is_symlink, is_hidden, ...)
+    type_code      uint32  categorical code into the interned type table
+    target_type    int32   categorical code of symlink_target_type, -1 for None
+
+symlink_target_path is only set for symlinks, so it lives in a small side table keyed by row, as do
+the resolved symlink chains (symlink_chain_depth, symlink_final_target, symlink_in_loop) and the
+(st_dev, st_ino) inode of entries with more than one hard link.
+When config.INCREMENTAL_SCAN is on, directory_stats maps directory codes to the
+(st_dev, st_ino, st_mtime_ns) key of every directory that was listed. directory_tree is the
+per-directory size roll-up of the scan (directory_tree.DirectoryTree), set after the traversal.
+
+A store loaded from a scan file (scan_file.py) holds read-only memoryviews over the mapped
+file instead of arrays; everything that reads the store works the same on both.
+
+Iterating the store (or indexing it) yields RecordView objects: read-only mappings with the
+exact keys and values described in DATA_STRUCTURES.md, so code written against the list of
+dicts (report_generator, plot_generator, serializer) keeps working unchanged.
+"""
+import array
+import os
+import pathlib
+import sys
+from collections.abc import Mapping
+
+_STR_ERRORS = 'surrogatepass'
+
+FLAG_IS_SYMLINK = 0x01
+FLAG_IS_HIDDEN = 0x02
+FLAG_HAS_TARGET_SIZE = 0x08    # symlink_target_size_bytes is not None
+FLAG_HAS_TARGET_PATH = 0x10    # symlink_target_path is not None
+FLAG_TARGET_IS_TEXT = 0x20     # symlink_target_path is an error message, not a path
+
+# Typed columns of a FileRecordStore and their array typecodes (one entry per row)
+COLUMN_TYPECODES = {
+    'dir_idx': 'I',
+    'name_ends': 'Q',
+    'size_bytes': 'q',
+    'allocated_bytes': 'q',
+    'hard_links': 'I',
+    'target_size_bytes': 'q',
+    'flags': 'B',
+    'type_codes': 'I',
+    'target_type_codes': 'i',
+}
+
+RECORD_KEYS = (
+    'path', 'name', 'is_symlink', 'is_hidden', 'symlink_target_path', 'symlink_target_type',
+    'symlink_target_size_bytes', 'size_bytes', 'type', 'symlink_chain_depth', 'symlink_final_target',
+    'symlink_in_loop', 'allocated_bytes', 'hard_links', 'inode'
+)
+
+
+# Record keys stored in FileRecordStore.symlink_chains, and their position in its (depth, final target, in loop) tuples
+_CHAIN_FIELDS = {'symlink_chain_depth': 0, 'symlink_final_target': 1, 'symlink_in_loop': 2}
+
+
+class RecordView(Mapping):
+    """Read-only dict-like view of one row of a FileRecordStore."""
+
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key):
+        store, row = self._store, self._row
+        if key == 'size_bytes':
+            return store.size_bytes[row]
+        if key == 'allocated_bytes':
+            return store.allocated_bytes[row]
+        if key == 'hard_links':
+            return store.hard_links[row]
+        if key == 'inode':
+            return store.inodes.get(row)
+        if key == 'type':
+            return store.types[store.type_codes[row]]
+        if key == 'is_symlink':
+            return bool(store.flags[row] & FLAG_IS_SYMLINK)
+        if key == 'is_hidden':
+            return bool(store.flags[row] & FLAG_IS_HIDDEN)
+        if key == 'path':
+            return pathlib.Path(store.directories[store.dir_idx[row]], store.name_at(row))
+        if key == 'name':
+            return store.name_at(row)
+        if key == 'symlink_target_path':
+            return store.symlink_target_path_at(row)
+        if key == 'symlink_target_type':
+            code = store.target_type_codes[row]
+            return store.types[code] if code >= 0 else None
+        if key == 'symlink_target_size_bytes':
+            return store.target_size_bytes[row] if store.flags[row] & FLAG_HAS_TARGET_SIZE else None
+        if key in _CHAIN_FIELDS:
+            chain = store.symlink_chains.get(row)
+            if chain is None:
+                return None
+            value = chain[_CHAIN_FIELDS[key]]
+            if key == 'symlink_final_target' and value is not None:
+                return pathlib.Path(value)
+            return value
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(RECORD_KEYS)
+
+    def __len__(self):
+        return len(RECORD_KEYS)
+
+    def __repr__(self):
+        return f"RecordView({dict(self)!r})"
+
+
+class FileRecordStore:
+    """
+    Columnar container for file records. Supports len(), iteration and indexing
+    (yielding RecordView rows), append() of record dicts and extend() with another store.
+    """
+
+    def __init__(self):
+        self.directories = []          # Interned parent directory strings
+        self._directory_codes = {}
+        self.types = []                # Interned 'type' / 'symlink_target_type' strings
+        self._type_code_of = {}
+
+        self.dir_idx = array.array('I')
+        self.name_ends = array.array('Q')
+        self.name_pool = bytearray()
+        self.size_bytes = array.array('q')
+        self.allocated_bytes = array.array('q')
+        self.hard_links = array.array('I')
+        self.target_size_bytes = array.array('q')
+        self.flags = array.array('B')
+        self.type_codes = array.array('I')
+        self.target_type_codes = array.array('i')
+        self.symlink_targets = {}      # row -> symlink_target_path string
+        self.symlink_chains = {}       # row -> (chain depth, final target string or None, in loop)
+        self.inodes = {}               # row -> (st_dev, st_ino) of entries with more than one hard link
+        self.directory_stats = {}      # directory code -> (st_dev, st_ino, st_mtime_ns)
+        self.directory_tree = None     # DirectoryTree of the whole scan (not carried by extend())
+        self._backing = None           # Keeps a memory-mapped scan file alive for memoryview columns
+
+    @classmethod
+    def from_columns(cls, directories, types, columns, name_pool, symlink_targets, directory_stats, backing=None,
+                     symlink_chains=None, inodes=None):
+        """
+        Builds a store around existing column buffers (arrays or memoryviews, keyed as in
+        COLUMN_TYPECODES) without copying them. backing is kept alive as long as the store.
+        """
+        store = cls()
+        # Tables are taken as-is (a streamed scan file may list a directory under more than one code)
+        store.directories = list(directories)
+        store._directory_codes = {d: i for i, d in enumerate(store.directories)}
+        store.types = list(types)
+        store._type_code_of = {t: i for i, t in enumerate(store.types)}
+        for name in COLUMN_TYPECODES:
+            setattr(store, name, columns[name])
+        store.name_pool = name_pool
+        store.symlink_targets = symlink_targets
+        store.directory_stats = directory_stats
+        store.symlink_chains = symlink_chains if symlink_chains is not None else {}
+        store.inodes = inodes if inodes is not None else {}
+        store._backing = backing
+        return store
+
+    # --- Interning ---
+
+    def directory_code(self, directory):
+        code = self._directory_codes.get(directory)
+        if code is None:
+            code = self._directory_codes[directory] = len(self.directories)
+            self.directories.append(directory)
+        return code
+
+    def type_code(self, type_str):
+        code = self._type_code_of.get(type_str)
+        if code is None:
+            code = self._type_code_of[type_str] = len(self.types)
+            self.types.append(type_str)
+        return code
+
+    def find_type_code(self, type_str):
+        """Code of an interned type string, or None if no record has that type (unlike type_code, never interns)."""
+        return self._type_code_of.get(type_str)
+
+    def record_directory(self, directory, dir_key):
+        """Remembers the (st_dev, st_ino, st_mtime_ns) key of a listed directory."""
+        self.directory_stats[self.directory_code(directory)] = dir_key
+
+    # --- Building ---
+
+    def append_fields(self, directory, name, flags, size_bytes, type_str,
+                      target_path=None, target_type=None, target_size=None, chain=None,
+                      allocated=0, hard_links=0, inode=None):
+        """
+        Appends one record given as raw fields. target_path must already be a string; chain is a
+        (depth, final target string or None, in loop) tuple for resolved symlinks, inode the
+        (st_dev, st_ino) of an entry with more than one hard link.
+        """
+        row = len(self.flags)
+        dir_code = self.directory_code(directory)
+        type_code = self.type_code(type_str)
+        target_type_code = -1 if target_type is None else self.type_code(target_type)
+        encoded_name = name.encode('utf-8', _STR_ERRORS)
+        if target_size is not None:
+            flags |= FLAG_HAS_TARGET_SIZE
+        if target_path is not None:
+            flags |= FLAG_HAS_TARGET_PATH
+        try:
+            self.dir_idx.append(dir_code)
+            self.size_bytes.append(size_bytes)
+            self.allocated_bytes.append(allocated)
+            self.hard_links.append(hard_links)
+            self.target_size_bytes.append(target_size or 0)
+            self.type_codes.append(type_code)
+            self.target_type_codes.append(target_type_code)
+            self.flags.append(flags)
+        except (OverflowError, TypeError):
+            self._truncate_columns(row)  # A value out of its column's range: no half-appended row
+            raise
+        self.name_pool += encoded_name
+        self.name_ends.append(len(self.name_pool))
+        if inode is not None:
+            self.inodes[row] = inode
+        if target_path is not None:
+            self.symlink_targets[row] = target_path
+        if chain is not None:
+            self.symlink_chains[row] = chain
+
+    def _truncate_columns(self, num_rows):
+        for name in COLUMN_TYPECODES:
+            del getattr(self, name)[num_rows:]
+
+    def append(self, record, parent_dir=None):
+        """
+        Appends a record dict (DATA_STRUCTURES.md schema). parent_dir is the directory string the
+        entry was listed in; pass it when known to avoid re-deriving it from record['path'].
+        """
+        if parent_dir is None:
+            parent_dir = os.path.dirname(str(record['path']))
+        flags = 0
+        if record['is_symlink']:
+            flags |= FLAG_IS_SYMLINK
+        if record['is_hidden']:
+            flags |= FLAG_IS_HIDDEN
+        target_path = record.get('symlink_target_path')
+        if isinstance(target_path, str):
+            flags |= FLAG_TARGET_IS_TEXT
+        elif target_path is not None:
+            target_path = str(target_path)
+        chain = None
+        if record.get('symlink_chain_depth') is not None:
+            final_target = record.get('symlink_final_target')
+            chain = (record['symlink_chain_depth'], None if final_target is None else str(final_target),
+                     bool(record.get('symlink_in_loop')))
+        self.append_fields(parent_dir, record['name'], flags, record['size_bytes'], record['type'],
+                           target_path, record.get('symlink_target_type'), record.get('symlink_target_size_bytes'),
+                           chain, record.get('allocated_bytes', 0), record.get('hard_links', 0), record.get('inode'))
+
+    def copy_row_from(self, other, row):
+        """Appends row `row` of another FileRecordStore without decoding it into a record."""
+        self.append_fields(other.directories[other.dir_idx[row]], other.name_at(row), other.flags[row],
+                           other.size_bytes[row], other.type_at(row), other.symlink_targets.get(row),
+                           other.types[other.target_type_codes[row]] if other.target_type_codes[row] >= 0 else None,
+                           other.target_size_bytes[row] if other.flags[row] & FLAG_HAS_TARGET_SIZE else None,
+                           other.symlink_chains.get(row), other.allocated_bytes[row], other.hard_links[row],
+                           other.inodes.get(row))
+
+    def rows_by_directory(self):
+        """
+        Groups row numbers by directory code (counting sort, O(rows)).
+        Returns (starts, rows): the rows of directory code c are rows[starts[c]:starts[c + 1]].
+        """
+        counts = [0] * (len(self.directories) + 1)
+        for code in self.dir_idx:
+            counts[code + 1] += 1
+        starts = array.array('Q', counts)
+        for code in range(1, len(starts)):
+            starts[code] += starts[code - 1]
+        next_slot = list(starts)
+        rows = array.array('Q', bytes(8 * len(self)))
+        for row, code in enumerate(self.dir_idx):
+            rows[next_slot[code]] = row
+            next_slot[code] += 1
+        return starts, rows
+
+    def extend(self, records):
+        """Appends all rows of another FileRecordStore (column-wise) or of an iterable of record dicts."""
+        if not isinstance(records, FileRecordStore):
+            for record in records:
+                self.append(record)
+            return
+        other = records
+        base_row = len(self.flags)
+        base_name = len(self.name_pool)
+        dir_map = [self.directory_code(d) for d in other.directories]
+        type_map = [self.type_code(t) for t in other.types]
+
+        self.dir_idx.extend(dir_map[i] for i in other.dir_idx)
+        self.name_pool += other.name_pool
+        self.name_ends.extend(end + base_name for end in other.name_ends)
+        self.size_bytes.extend(other.size_bytes)
+        self.allocated_bytes.extend(other.allocated_bytes)
+        self.hard_links.extend(other.hard_links)
+        self.target_size_bytes.extend(other.target_size_bytes)
+        self.flags.extend(other.flags)
+        self.type_codes.extend(type_map[c] for c in other.type_codes)
+        self.target_type_codes.extend(type_map[c] if c >= 0 else -1 for c in other.target_type_codes)
+        for row, target in other.symlink_targets.items():
+            self.symlink_targets[row + base_row] = target
+        for row, chain in other.symlink_chains.items():
+            self.symlink_chains[row + base_row] = chain
+        for row, inode in other.inodes.items():
+            self.inodes[row + base_row] = inode
+        for code, dir_key in other.directory_stats.items():
+            self.directory_stats[dir_map[code]] = dir_key
+
+    # --- Reading ---
+
+    def name_at(self, row):
+        start = self.name_ends[row - 1] if row else 0
+        return str(self.name_pool[start:self.name_ends[row]], 'utf-8', _STR_ERRORS)
+
+    def path_string_at(self, row):
+        return os.path.join(self.directories[self.dir_idx[row]], self.name_at(row))
+
+    def symlink_target_path_at(self, row):
+        target = self.symlink_targets.get(row)
+        if target is None or self.flags[row] & FLAG_TARGET_IS_TEXT:
+            return target
+        return pathlib.Path(target)
+
+    def set_symlink_chain(self, row, chain):
+        """Records the resolved chain (a symlink_targets.SymlinkChain) of the symlink in row `row`."""
+        self.symlink_chains[row] = (chain.depth, chain.final_target, chain.in_loop)
+
+    def symlink_rows(self):
+        """Row numbers of the symlink records."""
+        return [row for row, flags in enumerate(self.flags) if flags & FLAG_IS_SYMLINK]
+
+    def type_at(self, row):
+        return self.types[self.type_codes[row]]
+
+    def numpy_column(self, name):
+        """
+        Returns column `name` (see COLUMN_TYPECODES) as a NumPy array sharing the store's memory;
+        for a store loaded from a scan file this reads straight from the mapped file.
+        """
+        import numpy as np  # Only needed by callers that ask for NumPy columns
+        column = getattr(self, name)
+        return np.frombuffer(column, dtype=np.dtype(COLUMN_TYPECODES[name]))
+
+    def __len__(self):
+        return len(self.flags)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("record index out of range")
+        return RecordView(self, row)
+
+    def __iter__(self):
+        for row in range(len(self.flags)):
+            yield RecordView(self, row)
+
+    def __repr__(self):
+        return f"<FileRecordStore: {len(self)} records, {len(self.directories)} directories, {len(self.types)} types>"
+
+    # --- Pickling (drops the interning lookup dicts, they are rebuilt on load) ---
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_directory_codes']
+        del state['_type_code_of']
+        del state['_backing']
+        # Columns of a memory-mapped store are memoryviews; pickle them as arrays
+        for name, typecode in COLUMN_TYPECODES.items():
+            if not isinstance(state[name], array.array):
+                state[name] = array.array(typecode, state[name])
+        if not isinstance(state['name_pool'], bytearray):
+            state['name_pool'] = bytearray(state['name_pool'])
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('directory_stats', {})
+        state.setdefault('symlink_chains', {})
+        state.setdefault('inodes', {})
+        state.setdefault('directory_tree', None)
+        for name, typecode in (('allocated_bytes', 'q'), ('hard_links', 'I')):
+            state.setdefault(name, array.array(typecode, bytes(array.array(typecode).itemsize * len(state['flags']))))
+        state['_backing'] = None
+        self.__dict__.update(state)
+        self._directory_codes = {d: i for i, d in enumerate(self.directories)}
+        self._type_code_of = {t: i for i, t in enumerate(self.types)}
+
+    # --- Memory accounting ---
+
+    def memory_usage_bytes(self):
+        """Approximate bytes held by the store (columns, name pool, interned tables, symlink side table)."""
+        total = sum(column.itemsize * len(column) for column in (
+            self.dir_idx, self.name_ends, self.size_bytes, self.allocated_bytes, self.hard_links, self.target_size_bytes,
+            self.flags, self.type_codes, self.target_type_codes))
+        total += len(self.name_pool)
+        total += sum(sys.getsizeof(d) for d in self.directories) + 8 * len(self.directories)
+        total += sum(sys.getsizeof(t) for t in self.types)
+        total += sum(sys.getsizeof(t) + 8 for t in self.symlink_targets.values())
+        total += sum(sys.getsizeof(c) + (sys.getsizeof(c[1]) if c[1] else 0) + 8 for c in self.symlink_chains.values())
+        total += sum(sys.getsizeof(inode) + 8 for inode in self.inodes.values())
+        return total
+
+
+def _deep_dict_record_size(record):
+    """Bytes one record takes as a dict with a pathlib.Path (the pre-store representation)."""
+    size = sys.getsizeof(record)
+    path = record['path']
+    # A Path keeps its string form and its split parts once they have been used (sorting, suffix)
+    size += sys.getsizeof(path) + sys.getsizeof(str(path)) + sys.getsizeof(path.parts)
+    size += sum(sys.getsizeof(part) for part in path.parts)
+    size += sys.getsizeof(record['name'])
+    for key in ('size_bytes', 'symlink_target_size_bytes'):
+        if record.get(key) is not None:
+            size += sys.getsizeof(record[key])
+    target = record.get('symlink_target_path')
+    if target is not None:
+        size += sys.getsizeof(target) + sys.getsizeof(str(target))
+    return size
+
+
+def estimate_dict_list_bytes(store, sample_size=1000):
+    """
+    Estimates what the same records would take as a list of dicts, by converting an evenly
+    spaced sample of rows back to dicts and measuring them. Type strings are shared in both
+    representations and are not counted.
+    """
+    count = len(store)
+    if not count:
+        return 0
+    step = max(1, count // sample_size)
+    sample_rows = range(0, count, step)
+    sample_bytes = sum(_deep_dict_record_size(dict(store[row])) for row in sample_rows)
+    return int(sample_bytes / len(sample_rows) * count) + 8 * count  # + the list's pointer slots
+
+
+def print_memory_comparison(store):
+    """Prints bytes per record for the store and the estimated list-of-dicts equivalent."""
+    count = len(store)
+    if not count:
+        return
+    store_bytes = store.memory_usage_bytes()
+    dict_bytes = estimate_dict_list_bytes(store)
+    print(f"Record store: {count} records, {store_bytes / count:.1f} bytes/record "
+          f"(list of dicts: ~{dict_bytes / count:.1f} bytes/record, "
+          f"{store_bytes / (1024 * 1024):.1f} MiB vs ~{dict_bytes / (1024 * 1024):.1f} MiB).")
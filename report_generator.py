@@ -6,9 +6,16 @@ from directory_analyzer import ( # Keep these  needed for symlink summary
     SYMLINK_TO_DIR_TYPE_STR, SYMLINK_ERROR_TYPE_STR
 )
 import config
+from report_writer import (
+    REPORT_EXTENSIONS, ReportBuffer, sorted_symlink_rows, write_csv_report, write_json_report, write_jsonl_report
+)
+from size_sketch import REPORT_PERCENTILES, RELATIVE_ERROR, FileSizeDistribution
 
-def generate_report_filename():
-    """Generates a filename with a timestamp."""
+def generate_report_filename(target_directory=None, report_name="file_analysis_report", extension=".txt"):
+    """
+    Generates a filename with a timestamp. With target_directory, the (sanitized) directory is part of
+    the name, so the reports of several directories written in the same second do not collide.
+    """
     now = datetime.datetime.now()
     report_dir = config.REPORT_OUTPUT_DIRECTORY
 
@@ -20,14 +27,120 @@ def generate_report_filename():
         except OSError as e:
             print(f"Error creating report directory {report_dir}: {e}. Reports will be saved in current directory.")
             report_dir = "." # Fallback to current directory
-    filename = f"file_analysis_report_{now.strftime('%Y-%m-%d_%H-%M-%S')}.txt"
+    if target_directory is not None:
+        # Sanitize the directory path for use in filenames, like the plot filenames
+        sanitized_target_dir = str(target_directory).replace(':', '').replace('/', '_').replace('\\', '_')
+        report_name = f"{report_name}_{sanitized_target_dir[-30:]}"
+    filename = f"{report_name}_{now.strftime('%Y-%m-%d_%H-%M-%S')}{extension}"
 
     return os.path.join(report_dir, filename)
 
 
-def write_summary_report(report_filepath, summary_data, all_files_data, dir_symlinks_data, os_name, include_details):
-    """Writes the analysis summary and symlink details to a text file."""
-    with open(report_filepath, 'w', encoding='utf-8') as f:
+def _write_size_percentiles(f, summary_data):
+    """Writes the file size percentiles of summary_data['file_size_distribution'] (the report's percentile table)."""
+    size_distribution = summary_data.get('file_size_distribution')
+    if size_distribution is not None:
+        size_sketch = FileSizeDistribution.from_dict(size_distribution).plotted_sizes()
+        f.write(f"Sizes included: regular files, symlinks counted as "
+                f"'{config.SYMLINK_SIZE_HANDLING_FOR_PLOTS}' (SYMLINK_SIZE_HANDLING_FOR_PLOTS), {size_sketch.count} entries\n")
+        if size_sketch.count:
+            f.write(f"{'Percentile':<30} {'Size (Bytes)':>20}\n")
+            f.write("-" * 51 + "\n")
+            for percentile in REPORT_PERCENTILES:
+                f.write(f"{'p' + format(percentile, 'g'):<30} {size_sketch.quantile(percentile / 100):>20}\n")
+            f.write(f"{'max':<30} {size_sketch.max_positive or 0:>20}\n")
+            f.write(f"(Percentiles are within {RELATIVE_ERROR:.1%} of the exact value; sizes under 32 bytes and max are exact.)\n")
+    else:
+        f.write("Not available (scan was saved without size distribution data).\n")
+
+
+def _write_disk_usage(f, summary_data, top_n=None):
+    """
+    Writes apparent, unique (hard links counted once) and allocated bytes from summary_data['disk_usage'],
+    in total and for the top_n types by allocated bytes (all types if None).
+    """
+    disk_usage = summary_data.get('disk_usage')
+    if disk_usage is None:
+        f.write("Not available (scan was saved without disk usage data).\n")
+        return
+    f.write(f"Apparent Size (sum of file sizes, Bytes): {disk_usage['apparent_bytes']}\n")
+    f.write(f"Unique Apparent Size (hard links counted once, Bytes): {disk_usage['unique_apparent_bytes']}\n")
+    f.write(f"Allocated on Disk (hard links counted once, Bytes): {disk_usage['allocated_bytes']}\n")
+    f.write(f"Hard-linked inodes: {disk_usage['hard_linked_inodes']}, "
+            f"additional links not counted again: {disk_usage['duplicate_hard_links']}\n")
+    if disk_usage['untracked_hard_links']:
+        f.write(f"Hard links beyond HARD_LINK_SET_MAX_INODES (counted in full): {disk_usage['untracked_hard_links']}\n")
+
+    types = list(disk_usage['types'].items())
+    if types:
+        f.write(f"\n{'Extension/Type':<30} {'Apparent (Bytes)':>20} {'Unique (Bytes)':>20} {'Allocated (Bytes)':>20}\n")
+        f.write("-" * 93 + "\n")
+        for ext_type, usage in types[:top_n]:
+            f.write(f"{ext_type:<30} {usage['apparent_bytes']:>20} {usage['unique_apparent_bytes']:>20} "
+                    f"{usage['allocated_bytes']:>20}\n")
+        if top_n is not None and len(types) > top_n:
+            f.write("... and more ...\n")
+
+
+def _write_directory_tree(f, summary_data):
+    """Writes the largest directories (whole subtree) and largest files from summary_data['directory_tree']."""
+    directory_tree = summary_data.get('directory_tree')
+    if directory_tree is None:
+        f.write("Not available (scan was saved without the directory tree).\n")
+        return
+    f.write(f"Directories with file entries (and their parents): {directory_tree['directories']}\n")
+
+    f.write(f"\nTop {len(directory_tree['largest_directories'])} Directories by Subtree Size:\n")
+    f.write(f"{'Subtree (Bytes)':>20} {'Subtree Files':>14} {'Own (Bytes)':>20} {'Own Files':>10}  Directory\n")
+    f.write("-" * 100 + "\n")
+    for directory in directory_tree['largest_directories']:
+        f.write(f"{directory['total_bytes']:>20} {directory['total_files']:>14} {directory['own_bytes']:>20} "
+                f"{directory['own_files']:>10}  {directory['path']}\n")
+
+    f.write(f"\nTop {len(directory_tree['largest_files'])} Largest Files:\n")
+    f.write(f"{'Size (Bytes)':>20}  File\n")
+    f.write("-" * 100 + "\n")
+    for largest_file in directory_tree['largest_files']:
+        f.write(f"{largest_file['size_bytes']:>20}  {largest_file['path']}\n")
+
+
+def _write_duplicates(f, duplicates):
+    """Writes the totals, throughput and top duplicate groups of a duplicate_finder.find_duplicates result."""
+    if duplicates is None:
+        f.write("Not computed (FIND_DUPLICATE_FILES off or records not kept).\n")
+        return
+    f.write(f"Files sharing their size with another file: {duplicates['candidates']}\n")
+    f.write(f"Duplicate groups: {len(duplicates['groups'])}, duplicate files (copies beyond the first): "
+            f"{duplicates['duplicate_files']}\n")
+    f.write(f"Reclaimable Size (Bytes): {duplicates['reclaimable_bytes']}\n")
+    if duplicates['unreadable']:
+        f.write(f"Candidates not readable or changed since the scan: {duplicates['unreadable']}\n")
+    for stage_name, stage in (("Partial hash", duplicates['stages']['partial_hash']),
+                              ("Full hash", duplicates['stages']['full_hash'])):
+        f.write(f"{stage_name} stage: {stage['files']} files, {stage['bytes_read']} bytes read in {stage['seconds']:.2f} s "
+                f"({stage['files_per_second']:.0f} files/s, {stage['mb_per_second']:.1f} MB/s)\n")
+
+    groups = duplicates['groups']
+    if groups:
+        f.write(f"\nTop {config.DUPLICATE_REPORT_TOP_GROUPS} Groups by Reclaimable Size:\n")
+        for group in groups[:config.DUPLICATE_REPORT_TOP_GROUPS]:
+            f.write(f"- {len(group['paths'])} copies of {group['size_bytes']} bytes, "
+                    f"reclaimable: {group['reclaimable_bytes']} bytes\n")
+            for path in group['paths']:
+                f.write(f"    {path}\n")
+            for path in group['hard_links']:
+                f.write(f"    {path} (hard link)\n")
+        if len(groups) > config.DUPLICATE_REPORT_TOP_GROUPS:
+            f.write("... and more ...\n")
+
+
+def write_summary_report(report_filepath, summary_data, all_files_data, dir_symlinks_data, os_name, include_details,
+                         duplicates=None):
+    """
+    Writes the analysis summary and symlink details to a text file. duplicates is the
+    duplicate_finder.find_duplicates result of the scan, if it was computed.
+    """
+    with ReportBuffer(report_filepath) as f:
         f.write("--- File System Analysis Report ---\n")
         f.write(f"Operating System: {os_name}\n")
         # summary_data['target_directory'] should already be absolute from analyze_directory
@@ -56,6 +169,19 @@ def write_summary_report(report_filepath, summary_data, all_files_data, dir_syml
         else:
             f.write("No files or entries found or accessible to analyze.\n")
 
+        f.write("\n--- Disk Usage (Apparent vs. Allocated) ---\n")
+        _write_disk_usage(f, summary_data)
+
+        f.write("\n--- Largest Directories and Files ---\n")
+        _write_directory_tree(f, summary_data)
+
+        # --- File Size Percentiles (from the size sketches) ---
+        f.write("\n--- File Size Percentiles ---\n")
+        _write_size_percentiles(f, summary_data)
+
+        f.write("\n--- Duplicate Files (Same Content) ---\n")
+        _write_duplicates(f, duplicates)
+
         # --- Hidden Files Summary Section ---
         f.write("\n--- Hidden Items Summary ---\n")
         total_hidden_count = summary_data.get('total_hidden_files_count', 0)
@@ -120,29 +246,154 @@ def write_summary_report(report_filepath, summary_data, all_files_data, dir_syml
                     total_symlink_own_size_in_summary += own_size
             f.write("-" * 70 + "\n")
             f.write(f"{'Total Symlinks':<30} {total_symlinks_in_summary:>10} {total_symlink_own_size_in_summary:>25}\n")
+            target_lookups = summary_data.get('symlink_target_lookups')
+            if target_lookups and target_lookups['lookups']:
+                f.write(f"Target lookups: {target_lookups['lookups']} ({target_lookups['record_hits']} from scanned files, "
+                        f"{target_lookups['cache_hits']} from the target cache, {target_lookups['stat_calls']} stat calls; "
+                        f"hit rate {target_lookups['hit_rate']:.1%})\n")
+            _write_symlink_chain_summary(f, summary_data.get('symlink_chains'))
         else:
             f.write("No symbolic links found to summarize.\n")
 
         # --- Optional Detailed Symbolic Link List ---
         if include_details:
-            all_symlinks_detailed = [sl_info for sl_info in all_files_data if sl_info['is_symlink']] + dir_symlinks_data
             f.write("\n--- Symbolic Link Details (Detailed List) ---\n")
-            if all_symlinks_detailed:
-                f.write(f"Found {len(all_symlinks_detailed)} symbolic links (file and directory targets):\n")
-                for sl in sorted(all_symlinks_detailed, key=lambda x: x['path']):  # Sort by path
-                    f.write(f"  Link: {sl['path']}\n")
-                    f.write(f"    Type: {sl['type']}\n")
-                    f.write(f"    Own Size (bytes): {sl['size_bytes']}\n")
-                    f.write(f"    Target Path: {sl['symlink_target_path']}\n")
-                    if sl.get('symlink_target_type'):
-                        f.write(f"    Target Type: {sl['symlink_target_type']}\n")
-                    if sl.get('symlink_target_size_bytes') is not None: # For file symlinks
-                        f.write(f"    Target Size (bytes): {sl['symlink_target_size_bytes']}\n")
-                    f.write("-" * 20 + "\n")
-            else:
-                f.write("No symbolic links found for detailed listing.\n")
+            _write_symlink_details(f, sorted_symlink_rows(all_files_data, dir_symlinks_data))
         else:
             f.write("\n--- Symbolic Link Details (Detailed List Omitted by Configuration) ---\n")
 
         f.write("\n--- End of Report ---\n")
-    print(f"Analysis report saved to: {report_filepath}")
\ No newline at end of file
+    print(f"Analysis report saved to: {report_filepath}")
+
+def _write_symlink_details(f, symlinks):
+    """Writes the detailed symlink list from a report_writer.SymlinkSorter (rows in SYMLINK_FIELDS order)."""
+    if not len(symlinks):
+        f.write("No symbolic links found for detailed listing.\n")
+        return
+    f.write(f"Found {len(symlinks)} symbolic links (file and directory targets):\n")
+    separator = "-" * 20 + "\n"
+    for (path, sl_type, size_bytes, target_path, target_type, target_size_bytes,
+         chain_depth, final_target, in_loop) in symlinks:  # Sorted by path
+        lines = [f"  Link: {path}\n    Type: {sl_type}\n    Own Size (bytes): {size_bytes}\n"
+                 f"    Target Path: {target_path}\n"]
+        if target_type:
+            lines.append(f"    Target Type: {target_type}\n")
+        if target_size_bytes is not None:  # For file symlinks
+            lines.append(f"    Target Size (bytes): {target_size_bytes}\n")
+        if chain_depth is not None:  # Scans saved before chain resolution lack it
+            if in_loop:
+                lines.append(f"    Final Target: <loop of {chain_depth} links>\n")
+            elif final_target is None:
+                lines.append(f"    Final Target: <chain does not end> (depth {chain_depth})\n")
+            else:
+                lines.append(f"    Final Target: {final_target} (depth {chain_depth})\n")
+        lines.append(separator)
+        f.write(''.join(lines))
+
+
+def _write_symlink_chain_summary(f, symlink_chains):
+    """Writes the resolved symlink chain counts (summary_data['symlink_chains']) under the symlink summary."""
+    if not symlink_chains or not (symlink_chains['resolved'] or symlink_chains['in_loops'] or symlink_chains['unterminated']):
+        return
+    f.write(f"\n{'Symlink Chain Depth':<30} {'Links':>10}\n")
+    f.write("-" * 41 + "\n")
+    for depth, count in symlink_chains['depth_counts']:
+        f.write(f"{depth:<30} {count:>10}\n")
+    f.write(f"{'On a loop':<30} {symlink_chains['in_loops']:>10}\n")
+    f.write(f"{'Leading into a loop':<30} {symlink_chains['unterminated']:>10}\n")
+    f.write("-" * 41 + "\n")
+    f.write(f"Chains ending at a target: {symlink_chains['resolved']} (max depth {symlink_chains['max_depth']})\n")
+
+
+def write_batch_rollup_report(report_filepath, rollup_summary_data, directory_rows, os_name):
+    """
+    Writes the roll-up report of a batch run (see batch_analyzer.py).
+    directory_rows holds one dict per analyzed directory: 'directory', 'summary_data' (None if it
+    could not be analyzed), 'report' (its report files) and 'note' (e.g. the directory it was scanned with).
+    rollup_summary_data is the combined summary_data, counting overlapping directories once.
+    """
+    with ReportBuffer(report_filepath) as f:
+        f.write("--- Batch Analysis Roll-up Report ---\n")
+        f.write(f"Operating System: {os_name}\n")
+        f.write(f"Report Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"Directories Analyzed: {sum(1 for row in directory_rows if row['summary_data'] is not None)} "
+                f"of {len(directory_rows)}\n")
+
+        f.write("\n--- Per-Directory Summary ---\n")
+        f.write(f"{'Directory':<40} {'Dirs':>10} {'File Entries':>13} {'Dir Symlinks':>13} "
+                f"{'Total Size (Bytes)':>20} {'Errors':>8}\n")
+        f.write("-" * 109 + "\n")
+        for row in directory_rows:
+            summary_data = row['summary_data']
+            if summary_data is None:
+                f.write(f"{row['directory']:<40} {'not analyzed':>10}   {row.get('note') or ''}\n")
+                continue
+            total_size = sum(summary_data['file_types_size_summary'].values())
+            f.write(f"{row['directory']:<40} {summary_data['total_directories_scanned']:>10} "
+                    f"{summary_data['total_file_entries_processed']:>13} {summary_data['total_directory_symlinks_found']:>13} "
+                    f"{total_size:>20} {summary_data['skipped_access_errors']:>8}\n")
+            if row.get('note'):
+                f.write(f"    ({row['note']})\n")
+            if row.get('report'):
+                f.write(f"    Report: {row['report']}\n")
+
+        f.write("\n--- Combined Summary (overlapping directories counted once) ---\n")
+        f.write(f"Directories: {rollup_summary_data['target_directory']}\n")
+        f.write(f"Total Directories Scanned (walked into): {rollup_summary_data['total_directories_scanned']}\n")
+        f.write(f"Total File-like Entries Processed: {rollup_summary_data['total_file_entries_processed']}\n")
+        f.write(f"Total Directory Symbolic Links Found: {rollup_summary_data['total_directory_symlinks_found']}\n")
+        f.write(f"Total Hidden Items Found (Files & Dir Symlinks): {rollup_summary_data.get('total_hidden_files_count', 0)}\n")
+        f.write(f"Total Size of Entries (Bytes): {sum(rollup_summary_data['file_types_size_summary'].values())}\n")
+        if rollup_summary_data['skipped_access_errors'] > 0:
+            f.write(f"Skipped items due to access/read errors: {rollup_summary_data['skipped_access_errors']}\n")
+
+        f.write(f"\n--- Top {config.BAR_CHART_TOP_N_TYPES} File & Entry Types (Combined) ---\n")
+        types_summary = rollup_summary_data['file_types_summary']
+        if types_summary:
+            f.write(f"{'Extension/Type':<30} {'Count':>10} {'Total Size (Bytes)':>20}\n")
+            f.write("-" * 65 + "\n")
+            for ext_type, count in list(types_summary.items())[:config.BAR_CHART_TOP_N_TYPES]:
+                size = rollup_summary_data['file_types_size_summary'].get(ext_type, 0)
+                f.write(f"{ext_type:<30} {count:>10} {size:>20}\n")
+            if len(types_summary) > config.BAR_CHART_TOP_N_TYPES:
+                f.write("... and more ...\n")
+        else:
+            f.write("No files or entries found or accessible to analyze.\n")
+
+        f.write(f"\n--- Disk Usage, Top {config.BAR_CHART_TOP_N_TYPES} Types by Allocated Bytes (Combined) ---\n")
+        _write_disk_usage(f, rollup_summary_data, config.BAR_CHART_TOP_N_TYPES)
+
+        f.write("\n--- File Size Percentiles (Combined) ---\n")
+        _write_size_percentiles(f, rollup_summary_data)
+
+        f.write("\n--- End of Report ---\n")
+    print(f"Batch roll-up report saved to: {report_filepath}")
+
+
+# Report writers by config.REPORT_FORMATS entry; all take the arguments of write_summary_report
+REPORT_WRITERS = {
+    'text': write_summary_report,
+    'json': write_json_report,
+    'jsonl': write_jsonl_report,
+    'csv': write_csv_report,
+}
+
+
+def write_reports(summary_data, all_files_data, dir_symlinks_data, os_name, include_details, duplicates=None,
+                  target_directory=None):
+    """
+    Writes the report of a scan in each format of config.REPORT_FORMATS, side by side under the same
+    generate_report_filename() name. Returns the report file paths.
+    """
+    report_stem = generate_report_filename(target_directory=target_directory, extension="")
+    report_filepaths = []
+    for report_format in config.REPORT_FORMATS:
+        if report_format not in REPORT_WRITERS:
+            print(f"Unknown report format '{report_format}' in REPORT_FORMATS, skipped "
+                  f"(choose from {', '.join(REPORT_WRITERS)}).")
+            continue
+        report_filepath = report_stem + REPORT_EXTENSIONS[report_format]
+        REPORT_WRITERS[report_format](report_filepath, summary_data, all_files_data, dir_symlinks_data, os_name,
+                                      include_details, duplicates)
+        report_filepaths.append(report_filepath)
+    return report_filepaths
@@ -0,0 +1,302 @@
+# report_writer.py
+"""
+Output side of the reports: a buffered writer shared by all report formats, the external merge
+sort that orders the detailed symlink list, and the machine-readable report backends.
+
+    ReportBuffer        collects the many small write() calls of a report and hands the file
+                        large joined blocks; used as `f` by the text report in report_generator
+    SymlinkSorter       sorts the symlink rows by path within config.REPORT_SORT_MEMORY_MB: rows
+                        beyond the budget are sorted in runs spilled to temporary files and merged
+                        while the report is written
+    write_json_report   one JSON object: report header, summary_data, duplicates, symlink list
+    write_jsonl_report  a summary line, then one line per symlink
+    write_csv_report    the symlink list as a table, one row per symlink
+
+Symlink rows are tuples in SYMLINK_FIELDS order holding plain strings and numbers (paths as
+strings), so they can be compared, pickled to a run file and serialized without pathlib objects.
+They are sorted by path string, with the separator mapped below every other character and the
+case folded where the OS folds it, which gives the order of sorting pathlib.Path objects.
+"""
+import csv
+import datetime
+import heapq
+import itertools
+import json
+import os
+import pickle
+import tempfile
+
+import config
+from record_store import FLAG_HAS_TARGET_SIZE, FileRecordStore
+
+# Fields of a symlink row, in tuple order; also the CSV header and the JSON keys of a symlink
+SYMLINK_FIELDS = (
+    'path', 'type', 'size_bytes', 'symlink_target_path', 'symlink_target_type', 'symlink_target_size_bytes',
+    'symlink_chain_depth', 'symlink_final_target', 'symlink_in_loop'
+)
+
+# Report file extensions by config.REPORT_FORMATS entry
+REPORT_EXTENSIONS = {'text': '.txt', 'json': '.json', 'jsonl': '.jsonl', 'csv': '.csv'}
+
+_BUFFER_BYTES = 1 << 20     # ReportBuffer flushes once this many characters are pending
+_ROW_OVERHEAD_BYTES = 250   # Estimated memory of a symlink row besides the characters of its strings
+_SPILL_BLOCK_ROWS = 2048    # Rows per pickle in a run file (rows read back at a time during the merge)
+_MAX_MERGE_RUNS = 64        # More run files than this are first merged into fewer, larger runs
+
+
+class ReportBuffer:
+    """
+    Text file writer that joins the written strings and writes them in blocks of about
+    _BUFFER_BYTES characters. A context manager; the file is flushed and closed on exit.
+    """
+
+    def __init__(self, filepath, newline=None):
+        self._file = open(filepath, 'w', encoding='utf-8', newline=newline)
+        self._pending = []
+        self._pending_chars = 0
+
+    def write(self, text):
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if self._pending_chars >= _BUFFER_BYTES:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._file.write(''.join(self._pending))
+            self._pending = []
+            self._pending_chars = 0
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+# --- Symlink rows ---
+
+def _optional_str(value):
+    return None if value is None else str(value)
+
+
+def _store_symlink_rows(store):
+    """Symlink rows of a FileRecordStore, read from its columns (no RecordView or pathlib objects)."""
+    types, chains, targets = store.types, store.symlink_chains, store.symlink_targets
+    for row in store.symlink_rows():
+        target_code = store.target_type_codes[row]
+        chain = chains.get(row)
+        depth, final_target, in_loop = chain if chain is not None else (None, None, None)
+        yield (
+            store.path_string_at(row),
+            types[store.type_codes[row]],
+            store.size_bytes[row],
+            _optional_str(targets.get(row)),
+            types[target_code] if target_code >= 0 else None,
+            store.target_size_bytes[row] if store.flags[row] & FLAG_HAS_TARGET_SIZE else None,
+            depth,
+            _optional_str(final_target),
+            in_loop
+        )
+
+
+def _record_symlink_row(record):
+    """Symlink row of a record dict (file symlink records and directory symlink records)."""
+    return (
+        str(record['path']),
+        record['type'],
+        record['size_bytes'],
+        _optional_str(record.get('symlink_target_path')),
+        record.get('symlink_target_type'),
+        record.get('symlink_target_size_bytes'),
+        record.get('symlink_chain_depth'),
+        _optional_str(record.get('symlink_final_target')),
+        record.get('symlink_in_loop')
+    )
+
+
+def symlink_rows(all_files_data, dir_symlinks_data):
+    """Unsorted rows of the file symlinks in all_files_data (store or record dicts) and the directory symlinks."""
+    if isinstance(all_files_data, FileRecordStore):
+        file_rows = _store_symlink_rows(all_files_data)
+    else:
+        file_rows = (_record_symlink_row(record) for record in all_files_data or () if record['is_symlink'])
+    return itertools.chain(file_rows, (_record_symlink_row(record) for record in dir_symlinks_data or ()))
+
+
+if os.name == 'nt':
+    def symlink_sort_key(row):
+        """Sort key of a symlink row: its path with the separator first in order, case folded like pathlib."""
+        return row[0].lower().replace('/', '\0').replace('\\', '\0')
+else:
+    def symlink_sort_key(row):
+        """Sort key of a symlink row: its path with the separator first in order, like comparing pathlib parts."""
+        return row[0].replace('/', '\0')
+
+
+def _row_bytes(row):
+    """Estimated memory of a symlink row."""
+    return _ROW_OVERHEAD_BYTES + len(row[0]) + len(row[3] or '') + len(row[7] or '')
+
+
+# --- External merge sort ---
+
+def _write_run(rows):
+    """Writes sorted rows to a temporary run file in pickled blocks; returns the file, rewound."""
+    run_file = tempfile.TemporaryFile(prefix='fa_report_sort_')
+    for start in range(0, len(rows), _SPILL_BLOCK_ROWS):
+        pickle.dump(rows[start:start + _SPILL_BLOCK_ROWS], run_file, pickle.HIGHEST_PROTOCOL)
+    run_file.seek(0)
+    return run_file
+
+
+def _read_run(run_file):
+    """Rows of a run file, one block in memory at a time. Closes (and so deletes) the file when done."""
+    try:
+        while True:
+            try:
+                block = pickle.load(run_file)
+            except EOFError:
+                return
+            yield from block
+    finally:
+        run_file.close()
+
+
+class SymlinkSorter:
+    """
+    Sorts symlink rows by symlink_sort_key within a memory budget (bytes, default
+    config.REPORT_SORT_MEMORY_MB). add() rows, then iterate the sorter once for the sorted rows;
+    len() is the number of rows added. Run files are temporary files, deleted once merged.
+    """
+
+    def __init__(self, memory_bytes=None):
+        if memory_bytes is None:
+            memory_bytes = config.REPORT_SORT_MEMORY_MB * 1024 * 1024
+        self.memory_bytes = memory_bytes
+        self._rows = []
+        self._rows_bytes = 0
+        self._runs = []
+        self._count = 0
+
+    def add(self, row):
+        self._rows.append(row)
+        self._rows_bytes += _row_bytes(row)
+        self._count += 1
+        if self._rows_bytes >= self.memory_bytes:
+            self._spill()
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
+        return self
+
+    def _spill(self):
+        self._rows.sort(key=symlink_sort_key)
+        self._runs.append(_write_run(self._rows))
+        self._rows = []
+        self._rows_bytes = 0
+        if len(self._runs) > _MAX_MERGE_RUNS:
+            # Keep the number of open run files (and blocks held by the final merge) bounded
+            merged = heapq.merge(*(_read_run(run_file) for run_file in self._runs), key=symlink_sort_key)
+            run_file = tempfile.TemporaryFile(prefix='fa_report_sort_')
+            for block in iter(lambda: list(itertools.islice(merged, _SPILL_BLOCK_ROWS)), []):
+                pickle.dump(block, run_file, pickle.HIGHEST_PROTOCOL)
+            run_file.seek(0)
+            self._runs = [run_file]
+
+    @property
+    def spilled_runs(self):
+        """Number of run files currently on disk."""
+        return len(self._runs)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        self._rows.sort(key=symlink_sort_key)
+        if not self._runs:
+            rows, self._rows = self._rows, []
+            return iter(rows)
+        runs, self._runs = self._runs, []
+        rows, self._rows = self._rows, []
+        return heapq.merge(*(_read_run(run_file) for run_file in runs), rows, key=symlink_sort_key)
+
+
+def sorted_symlink_rows(all_files_data, dir_symlinks_data):
+    """SymlinkSorter holding the symlink rows of a scan, ready to be iterated in path order."""
+    return SymlinkSorter().extend(symlink_rows(all_files_data, dir_symlinks_data))
+
+
+# --- Machine-readable report backends ---
+
+def _report_header(summary_data, os_name):
+    return {
+        "operating_system": os_name,
+        "analyzed_directory": str(summary_data['target_directory']),
+        "report_generated": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def _json_dumps(value):
+    return json.dumps(value, default=str)  # default=str: paths in summaries of older scans
+
+
+def write_json_report(report_filepath, summary_data, all_files_data, dir_symlinks_data, os_name, include_details,
+                      duplicates=None):
+    """
+    Writes the report as one JSON object with the keys 'report' (header), 'summary' (summary_data),
+    'duplicates' and 'symlinks' (list of objects with the SYMLINK_FIELDS keys, sorted by path;
+    null when the detailed list is omitted). The symlink list is streamed, not built in memory.
+    """
+    with ReportBuffer(report_filepath) as f:
+        f.write('{"report": ' + _json_dumps(_report_header(summary_data, os_name)))
+        f.write(',\n"summary": ' + _json_dumps(summary_data))
+        f.write(',\n"duplicates": ' + _json_dumps(duplicates))
+        if include_details:
+            f.write(',\n"symlinks": [')
+            separator = '\n'
+            for row in sorted_symlink_rows(all_files_data, dir_symlinks_data):
+                f.write(separator + _json_dumps(dict(zip(SYMLINK_FIELDS, row))))
+                separator = ',\n'
+            f.write('\n]}\n')
+        else:
+            f.write(',\n"symlinks": null}\n')
+    print(f"JSON report saved to: {report_filepath}")
+
+
+def write_jsonl_report(report_filepath, summary_data, all_files_data, dir_symlinks_data, os_name, include_details,
+                       duplicates=None):
+    """
+    Writes the report as JSON lines: first {"record": "summary", "report", "summary", "duplicates"},
+    then {"record": "symlink", <SYMLINK_FIELDS>...} per symlink in path order (if include_details).
+    """
+    with ReportBuffer(report_filepath) as f:
+        f.write(_json_dumps({"record": "summary", "report": _report_header(summary_data, os_name),
+                             "summary": summary_data, "duplicates": duplicates}) + '\n')
+        if include_details:
+            for row in sorted_symlink_rows(all_files_data, dir_symlinks_data):
+                f.write('{"record": "symlink", ' + _json_dumps(dict(zip(SYMLINK_FIELDS, row)))[1:] + '\n')
+    print(f"JSON lines report saved to: {report_filepath}")
+
+
+def write_csv_report(report_filepath, summary_data, all_files_data, dir_symlinks_data, os_name, include_details,
+                     duplicates=None):
+    """
+    Writes the detailed symlink list as CSV (SYMLINK_FIELDS header, one row per symlink in path
+    order; empty cells for missing values). Only the header is written if the list is omitted;
+    the summary tables are in the text and JSON reports.
+    """
+    with ReportBuffer(report_filepath, newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(SYMLINK_FIELDS)
+        if include_details:
+            writer.writerows(sorted_symlink_rows(all_files_data, dir_symlinks_data))
+    print(f"CSV report saved to: {report_filepath}")
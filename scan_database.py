@@ -0,0 +1,289 @@
+# scan_database.py
+"""
+SQLite index of a saved scan, for ad-hoc queries ("all .log files over 1 GB under /var") that
+would otherwise load the whole scan and filter the records in Python.
+
+Tables:
+
+    meta         key/value: format version, original_target_dir, the summary_stats JSON
+    directories  id, path: every parent directory of an entry. Ids follow the path components in
+                 sorted order, so the directories of any subtree have consecutive ids: the
+                 path-prefix key of the entries.
+    types        id, type: the interned type strings (the store's categorical type codes)
+    entries      one row per all_files_data record and per directory symlink (is_dir_symlink):
+                 directory_id, name, type_id, size_bytes, allocated_bytes, hard_links, is_symlink,
+                 is_hidden, symlink_target_path, symlink_target_type, symlink_target_size_bytes
+    entry_paths  view of entries with the directory path and type string, for hand-written SQL
+
+Indexes: entries(type_id, size_bytes), entries(size_bytes), entries(size_bytes) of the hidden
+entries only (a partial index: they are few, and "not hidden" matches nearly everything anyway),
+entries(directory_id) and directories(path).
+
+write_scan_database bulk-loads a scan in one transaction with executemany batches of
+_INSERT_BATCH_ROWS rows, building the indexes after the rows are in (much faster than keeping
+them up to date row by row). Durability is not needed while the file is built, so journaling
+and syncing are off; the database is written under a temporary name and renamed when complete.
+Rows are generated straight from the store's columns, and integer type ids keep the rows and
+the type index small.
+
+query_entries turns the query subcommand's filters into one SQL statement the indexes serve:
+a filtered list (largest first), a top-N or a group-by on type or directory.
+"""
+import json
+import os
+import sqlite3
+import time
+
+from record_store import FLAG_HAS_TARGET_SIZE, FLAG_IS_HIDDEN, FLAG_IS_SYMLINK, FileRecordStore
+
+SCAN_DATABASE_EXTENSION = ".sqlite"
+DATABASE_FORMAT_VERSION = 1
+
+_INSERT_BATCH_ROWS = 50000
+_STR_ERRORS = 'surrogatepass'
+
+# Pragmas for the bulk load only: the file is thrown away if the load does not complete
+_BULK_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",  # 256 MiB of page cache for the index builds
+    "PRAGMA locking_mode = EXCLUSIVE",
+)
+
+_SCHEMA = (
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    "CREATE TABLE directories (id INTEGER PRIMARY KEY, path TEXT NOT NULL)",
+    "CREATE TABLE types (id INTEGER PRIMARY KEY, type TEXT NOT NULL UNIQUE)",
+    """CREATE TABLE entries (
+        id INTEGER PRIMARY KEY,
+        directory_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        type_id INTEGER NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        allocated_bytes INTEGER NOT NULL,
+        hard_links INTEGER NOT NULL,
+        is_symlink INTEGER NOT NULL,
+        is_hidden INTEGER NOT NULL,
+        is_dir_symlink INTEGER NOT NULL,
+        symlink_target_path TEXT,
+        symlink_target_type TEXT,
+        symlink_target_size_bytes INTEGER
+    )""",
+    """CREATE VIEW entry_paths AS
+        SELECT entries.*, directories.path AS directory, types.type AS type FROM entries
+        JOIN directories ON directories.id = entries.directory_id JOIN types ON types.id = entries.type_id""",
+)
+
+_INDEXES = (
+    "CREATE INDEX directories_path ON directories (path)",
+    "CREATE INDEX entries_type_size ON entries (type_id, size_bytes)",
+    "CREATE INDEX entries_size ON entries (size_bytes)",
+    "CREATE INDEX entries_hidden_size ON entries (size_bytes) WHERE is_hidden = 1",
+    "CREATE INDEX entries_directory ON entries (directory_id)",
+)
+
+_INSERT_ENTRY = "INSERT INTO entries VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+# Columns of the filtered list and top-N results
+ENTRY_COLUMNS = ('path', 'type', 'size_bytes', 'allocated_bytes', 'is_symlink', 'is_hidden')
+# Columns of the group-by results
+GROUP_COLUMNS = ('entries', 'total_size_bytes', 'total_allocated_bytes')
+
+
+class ScanDatabaseError(Exception):
+    """Raised for databases that are not scan databases or use an unsupported format version."""
+
+
+def _directory_ids(directory_paths):
+    """Ids for the given directory paths, in sorted path-component order (a subtree gets consecutive ids)."""
+    ordered = sorted(set(directory_paths), key=lambda path: path.split(os.sep))
+    return {path: directory_id for directory_id, path in enumerate(ordered, start=1)}
+
+
+def _store_rows(store, directory_ids, type_ids):
+    """Yields the entries rows of a FileRecordStore, reading its columns directly."""
+    dir_id_of_code = [directory_ids[directory] for directory in store.directories]
+    type_id_of_code = [type_ids[type_str] for type_str in store.types]
+    types = store.types
+    symlink_targets = store.symlink_targets
+    name_pool = store.name_pool
+    start = 0
+    for row, (code, name_end, size_bytes, allocated, hard_links, target_size, flags, type_code, target_type_code) in enumerate(
+            zip(store.dir_idx, store.name_ends, store.size_bytes, store.allocated_bytes, store.hard_links,
+                store.target_size_bytes, store.flags, store.type_codes, store.target_type_codes)):
+        name = str(name_pool[start:name_end], 'utf-8', _STR_ERRORS)
+        start = name_end
+        yield (dir_id_of_code[code], name, type_id_of_code[type_code], size_bytes, allocated, hard_links,
+               flags & FLAG_IS_SYMLINK and 1, flags & FLAG_IS_HIDDEN and 1, 0,
+               symlink_targets.get(row), types[target_type_code] if target_type_code >= 0 else None,
+               target_size if flags & FLAG_HAS_TARGET_SIZE else None)
+
+
+def _dir_symlink_rows(dir_symlink_details, directory_ids, type_ids):
+    """Yields the entries rows of the directory symlink records."""
+    for record in dir_symlink_details:
+        target_path = record.get('symlink_target_path')
+        yield (directory_ids[os.path.dirname(str(record['path']))], record['name'], type_ids[record['type']],
+               record['size_bytes'], record.get('allocated_bytes', 0), record.get('hard_links', 0),
+               1, 1 if record['is_hidden'] else 0, 1, None if target_path is None else str(target_path),
+               record.get('symlink_target_type'), None)
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == _INSERT_BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_scan_database(db_path, all_file_details, dir_symlink_details, summary_stats, original_target_dir):
+    """
+    Bulk-loads a scan into a new SQLite database at db_path (replacing any existing one).
+    all_file_details may be a FileRecordStore or a list of dicts.
+    Returns (rows written, seconds spent inserting them, total seconds including the index builds).
+    """
+    if not isinstance(all_file_details, FileRecordStore):
+        store = FileRecordStore()
+        store.extend(all_file_details)
+        all_file_details = store
+    start_time = time.perf_counter()
+    directory_ids = _directory_ids(list(all_file_details.directories)
+                                   + [os.path.dirname(str(record['path'])) for record in dir_symlink_details])
+    type_ids = {type_str: type_id for type_id, type_str in enumerate(
+        dict.fromkeys(list(all_file_details.types) + [record['type'] for record in dir_symlink_details]), start=1)}
+
+    temp_path = db_path + ".tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(temp_path, isolation_level=None)  # Transactions are managed explicitly
+    try:
+        for pragma in _BULK_LOAD_PRAGMAS:
+            conn.execute(pragma)
+        conn.execute("BEGIN")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('format_version', str(DATABASE_FORMAT_VERSION)),
+            ('original_target_dir', original_target_dir or ''),
+            ('summary', json.dumps(summary_stats)),
+        ])
+        conn.executemany("INSERT INTO directories VALUES (?, ?)",
+                         ((directory_id, path) for path, directory_id in directory_ids.items()))
+        conn.executemany("INSERT INTO types VALUES (?, ?)", ((type_id, type_str) for type_str, type_id in type_ids.items()))
+        num_rows = 0
+        for rows in (_store_rows(all_file_details, directory_ids, type_ids),
+                     _dir_symlink_rows(dir_symlink_details, directory_ids, type_ids)):
+            for batch in _batches(rows):
+                conn.executemany(_INSERT_ENTRY, batch)
+                num_rows += len(batch)
+        insert_seconds = time.perf_counter() - start_time
+        for statement in _INDEXES:
+            conn.execute(statement)
+        conn.execute("COMMIT")
+        # Statistics for the query planner's index choice, from a sample of each index
+        conn.execute("PRAGMA analysis_limit = 1000")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(temp_path, db_path)  # Never leave a half-built database under the real name
+    return num_rows, insert_seconds, time.perf_counter() - start_time
+
+
+def open_scan_database(db_path):
+    """Opens a scan database read-only. Returns (connection, meta dict)."""
+    if not os.path.exists(db_path):
+        raise ScanDatabaseError(f"No scan database at {db_path}")
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+    except sqlite3.DatabaseError as e:
+        conn.close()
+        raise ScanDatabaseError(f"Not a scan database: {e}")
+    if int(meta.get('format_version', 0)) > DATABASE_FORMAT_VERSION:
+        conn.close()
+        raise ScanDatabaseError(f"Scan database format version {meta['format_version']} is newer than "
+                                f"supported version {DATABASE_FORMAT_VERSION}")
+    return conn, meta
+
+
+def _subtree_range(conn, directory):
+    """(first, last) directory id of the subtree rooted at directory, or None if no entry is under it."""
+    directory = os.path.normpath(str(directory))
+    prefix = directory if directory.endswith(os.sep) else directory + os.sep
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    first, last = conn.execute("SELECT MIN(id), MAX(id) FROM directories WHERE path = ? OR (path >= ? AND path < ?)",
+                               (directory, prefix, upper)).fetchone()
+    return None if first is None else (first, last)
+
+
+def query_entries(conn, types=None, min_size=None, max_size=None, under=None, hidden=None, symlinks=None,
+                  group_by=None, limit=None):
+    """
+    Runs a query on an open scan database. All filters are optional: types (list of type strings,
+    e.g. ['.log']), min_size / max_size (bytes, inclusive), under (directory path), hidden and
+    symlinks (True / False). Without group_by the matching entries are returned largest first
+    (ENTRY_COLUMNS); with group_by 'type' or 'directory' one row per group, largest total first
+    (the group key, then GROUP_COLUMNS). limit caps the number of rows.
+    Returns (column names, rows).
+    """
+    conditions, params = [], []
+    if types:
+        type_ids = [type_id for (type_id,) in conn.execute(
+            f"SELECT id FROM types WHERE type IN ({', '.join('?' * len(types))})", types)]
+        conditions.append(f"entries.type_id IN ({', '.join('?' * len(type_ids))})" if type_ids else "0")
+        params.extend(type_ids)
+    if min_size is not None:
+        conditions.append("entries.size_bytes >= ?")
+        params.append(min_size)
+    if max_size is not None:
+        conditions.append("entries.size_bytes <= ?")
+        params.append(max_size)
+    if under is not None:
+        id_range = _subtree_range(conn, under)
+        if id_range is None:
+            conditions.append("0")
+        else:
+            conditions.append("entries.directory_id BETWEEN ? AND ?")
+            params.extend(id_range)
+    if hidden is not None:
+        # A literal, so the planner can match the partial index of the hidden entries
+        conditions.append("entries.is_hidden = 1" if hidden else "entries.is_hidden = 0")
+    if symlinks is not None:
+        conditions.append("entries.is_symlink = ?")
+        params.append(1 if symlinks else 0)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    limit_clause = ""
+    if limit is not None:
+        limit_clause = " LIMIT ?"
+        params.append(limit)
+
+    # CROSS JOIN keeps entries as the outer loop, so the planner picks one of its indexes for the filters
+    if group_by is None:
+        columns = ENTRY_COLUMNS
+        sql = (f"SELECT directories.path, entries.name, types.type, entries.size_bytes, entries.allocated_bytes, "
+               f"entries.is_symlink, entries.is_hidden FROM entries "
+               f"CROSS JOIN directories ON directories.id = entries.directory_id "
+               f"CROSS JOIN types ON types.id = entries.type_id{where} "
+               f"ORDER BY entries.size_bytes DESC{limit_clause}")
+        rows = [(os.path.join(directory, name), *rest) for directory, name, *rest in conn.execute(sql, params)]
+        return columns, rows
+    if group_by == 'type':
+        key_sql, join = "types.type", " CROSS JOIN types ON types.id = entries.type_id"
+    elif group_by == 'directory':
+        key_sql, join = "directories.path", " CROSS JOIN directories ON directories.id = entries.directory_id"
+    else:
+        raise ValueError(f"Unknown group_by '{group_by}' (expected 'type' or 'directory')")
+    sql = (f"SELECT {key_sql}, COUNT(*), SUM(entries.size_bytes), SUM(entries.allocated_bytes) FROM entries{join}{where} "
+           f"GROUP BY {key_sql} ORDER BY SUM(entries.size_bytes) DESC{limit_clause}")
+    return (group_by,) + GROUP_COLUMNS, conn.execute(sql, params).fetchall()
+
+
+def run_sql(conn, sql):
+    """Runs a hand-written (read-only) SQL statement. Returns (column names, rows)."""
+    cursor = conn.execute(sql)
+    return tuple(description[0] for description in cursor.description or ()), cursor.fetchall()
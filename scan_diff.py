@@ -0,0 +1,363 @@
+# scan_diff.py
+"""
+Diff of two saved scans: the entries that were added, removed, resized or retyped between them,
+and how the totals, the types and the directories changed. Run it with
+`python file_analyzer.py compare OLD NEW`, where OLD and NEW are scanned directories (their saved
+scans are used) or scan files.
+
+Entries are matched on their path relative to the scanned root, so a scan can be diffed against an
+older scan of the same directory (e.g. a copy of its scan file) or against the scan of another
+root, such as a Linux / and a Windows C:\\. Relative paths of scans taken on Windows are compared
+and written with '/' separators.
+
+The join streams over both scans. The directory tables are grouped by relative path and walked in
+sorted order; for each directory the entry names of the new scan go into a dict, which the old
+scan's entries of that directory probe (a hash join per directory, on the raw UTF-8 names). Both
+record stores are memory-mapped scan files, so apart from the directory tables only the entries of
+one directory, the top-N lists and the deltas of directories with changes are held in memory.
+
+Changes:
+
+    added      path only in the new scan
+    removed    path only in the old scan
+    retyped    path in both scans with a different 'type' (its size may differ too)
+    resized    path in both scans, same type, different size_bytes
+
+write_scan_diff writes every change as a CSV row (CSV_FIELDS) while the join runs, then the summary
+as Markdown: totals, change counts, per-type deltas (from the summaries), per-directory deltas
+(rolled up to every parent directory) and the largest changes of each kind.
+"""
+import csv
+import heapq
+import os
+
+import config
+from report_generator import generate_report_filename
+from report_writer import ReportBuffer
+from serializer import load_scan_snapshot
+
+CHANGE_KINDS = ('added', 'removed', 'retyped', 'resized')
+CSV_FIELDS = ('change', 'path', 'old_type', 'new_type', 'old_size_bytes', 'new_size_bytes', 'size_delta_bytes')
+
+# summary_data totals compared in the Markdown report: (key, label)
+_SUMMARY_METRICS = (
+    ('total_directories_scanned', "Directories scanned"),
+    ('total_file_entries_processed', "File-like entries"),
+    ('total_directory_symlinks_found', "Directory symlinks"),
+    ('total_hidden_files_count', "Hidden items"),
+    ('skipped_access_errors', "Skipped items (access/read errors)"),
+)
+
+_STR_ERRORS = 'surrogatepass'
+
+
+class Snapshot:
+    """One side of a diff: a loaded scan, its root and a label (what was given on the command line)."""
+
+    def __init__(self, label, all_files_data, dir_symlinks_data, summary_data, root):
+        self.label = str(label)
+        self.store = all_files_data
+        self.dir_symlinks = dir_symlinks_data
+        self.summary = summary_data
+        self.root = root
+        self._windows = '\\' in root and not root.startswith('/')
+
+    @classmethod
+    def load(cls, scan):
+        """Snapshot of a scan file or of a directory's saved scan, or None if it cannot be loaded."""
+        loaded = load_scan_snapshot(scan)
+        if loaded is None:
+            return None
+        all_files_data, dir_symlinks_data, summary_data, meta = loaded
+        root = meta.get('original_target_dir') or str(summary_data['target_directory'])
+        return cls(scan, all_files_data, dir_symlinks_data, summary_data, root)
+
+    def relative(self, path):
+        """Path string relative to the scanned root, with '/' separators ('' for the root itself)."""
+        root = self.root
+        if path == root:
+            return ''
+        if path.startswith(root):
+            path = path[len(root):].lstrip('\\/' if self._windows else '/')
+        return path.replace('\\', '/') if self._windows else path
+
+    def directory_codes(self):
+        """{relative directory: [directory codes]} (a streamed scan may list a directory under more than one code)."""
+        groups = {}
+        for code, directory in enumerate(self.store.directories):
+            groups.setdefault(self.relative(directory), []).append(code)
+        return groups
+
+    def directory_links(self):
+        """{relative directory: {UTF-8 name: (type, size_bytes)}} of the directory symlinks."""
+        links = {}
+        for record in self.dir_symlinks or ():
+            directory, name = os.path.split(str(record['path']))
+            links.setdefault(self.relative(directory), {})[name.encode('utf-8', _STR_ERRORS)] = (
+                record['type'], record['size_bytes'])
+        return links
+
+
+def _rows_by_code(store):
+    """
+    Returns a function giving the row numbers of a directory code. Scans append the entries of a
+    directory together, so usually every code is one run of rows and only the runs are kept;
+    otherwise the rows are grouped with FileRecordStore.rows_by_directory (8 bytes per row).
+    """
+    runs = {}
+    previous, start = None, 0
+    for row, code in enumerate(store.dir_idx):
+        if code != previous:
+            if previous is not None:
+                runs[previous] = range(start, row)
+            if code in runs:
+                starts, rows = store.rows_by_directory()
+                rows = memoryview(rows)
+                return lambda code: rows[starts[code]:starts[code + 1]]
+            previous, start = code, row
+    if previous is not None:
+        runs[previous] = range(start, len(store.dir_idx))
+    return lambda code: runs.get(code, ())
+
+
+def _path_order(path):
+    """Sort key giving parents before their children, as in the reports."""
+    return path.replace('/', '\0')
+
+
+class _DiffCollector:
+    """Counts the changes found by the join and keeps the top-N lists and per-directory deltas."""
+
+    def __init__(self, on_change, top_n):
+        self.on_change = on_change
+        self.top_n = top_n
+        self.counts = dict.fromkeys(CHANGE_KINDS, 0)
+        self.bytes_delta = dict.fromkeys(CHANGE_KINDS, 0)
+        self.unchanged = 0
+        self.largest = {kind: [] for kind in CHANGE_KINDS}  # Min-heaps of (abs(delta), path, change tuple)
+        self.directories = {}  # Relative directory -> [changed entries, bytes delta]
+
+    def add(self, directory, changes):
+        """Records the changes of one directory: (name, kind, old type, new type, old size, new size) tuples."""
+        changes.sort()
+        directory_delta = self.directories.setdefault(directory, [0, 0])
+        for name, kind, old_type, new_type, old_size, new_size in changes:
+            name = name.decode('utf-8', _STR_ERRORS)
+            path = f"{directory}/{name}" if directory else name
+            delta = (new_size or 0) - (old_size or 0)
+            self.counts[kind] += 1
+            self.bytes_delta[kind] += delta
+            directory_delta[0] += 1
+            directory_delta[1] += delta
+            change = (kind, path, old_type, new_type, old_size, new_size, delta)
+            heap = self.largest[kind]
+            if len(heap) < self.top_n:
+                heapq.heappush(heap, (abs(delta), path, change))
+            elif self.top_n and abs(delta) > heap[0][0]:
+                heapq.heapreplace(heap, (abs(delta), path, change))
+            if self.on_change is not None:
+                self.on_change(change)
+
+    def subtree_deltas(self):
+        """{relative directory: [changed entries, bytes delta]} counting the changes of the whole subtree."""
+        subtrees = {}
+        for directory, (changed, delta) in self.directories.items():
+            parts = directory.split('/') if directory else []
+            for depth in range(len(parts) + 1):
+                subtree = subtrees.setdefault('/'.join(parts[:depth]), [0, 0])
+                subtree[0] += changed
+                subtree[1] += delta
+        return subtrees
+
+
+def diff_snapshots(old, new, on_change=None, top_n=None):
+    """
+    Joins two Snapshots (see the module docstring) and returns the diff dict written by
+    write_diff_markdown. on_change(change) is called with every change tuple, in path order:
+    (kind, relative path, old type, new type, old size_bytes, new size_bytes, size delta).
+    """
+    top_n = config.DIFF_REPORT_TOP_N if top_n is None else top_n
+    collector = _DiffCollector(on_change, top_n)
+    old_store, new_store = old.store, new.store
+    old_groups, new_groups = old.directory_codes(), new.directory_codes()
+    old_links, new_links = old.directory_links(), new.directory_links()
+    old_rows, new_rows = _rows_by_code(old_store), _rows_by_code(new_store)
+
+    old_types, new_types = old_store.types, new_store.types
+    old_names, old_ends, old_sizes, old_type_codes = (old_store.name_pool, old_store.name_ends, old_store.size_bytes,
+                                                      old_store.type_codes)
+    new_names, new_ends, new_sizes, new_type_codes = (new_store.name_pool, new_store.name_ends, new_store.size_bytes,
+                                                      new_store.type_codes)
+
+    directories = old_groups.keys() | new_groups.keys() | old_links.keys() | new_links.keys()
+    for directory in sorted(directories, key=_path_order):
+        new_entries = {}
+        for code in new_groups.get(directory, ()):
+            for row in new_rows(code):
+                new_entries[bytes(new_names[new_ends[row - 1] if row else 0:new_ends[row]])] = row
+        # Directory symlinks are kept apart from the file records in a scan, but share their names
+        new_dir_links = dict(new_links.get(directory, {}))
+        changes = []
+
+        def compare(name, old_type, old_size):
+            new_row = new_entries.pop(name, None)
+            if new_row is not None:
+                new_type, new_size = new_types[new_type_codes[new_row]], new_sizes[new_row]
+            else:
+                new_type, new_size = new_dir_links.pop(name, (None, None))
+            if new_type is None:
+                changes.append((name, 'removed', old_type, None, old_size, None))
+            elif new_type != old_type:
+                changes.append((name, 'retyped', old_type, new_type, old_size, new_size))
+            elif new_size != old_size:
+                changes.append((name, 'resized', old_type, new_type, old_size, new_size))
+            else:
+                collector.unchanged += 1
+
+        for code in old_groups.get(directory, ()):
+            for row in old_rows(code):
+                compare(bytes(old_names[old_ends[row - 1] if row else 0:old_ends[row]]),
+                        old_types[old_type_codes[row]], old_sizes[row])
+        for name, (old_type, old_size) in old_links.get(directory, {}).items():
+            compare(name, old_type, old_size)
+        for name, row in new_entries.items():
+            changes.append((name, 'added', None, new_types[new_type_codes[row]], None, new_sizes[row]))
+        for name, (new_type, new_size) in new_dir_links.items():
+            changes.append((name, 'added', None, new_type, None, new_size))
+
+        if changes:
+            collector.add(directory, changes)
+
+    subtrees = collector.subtree_deltas()
+    largest_directories = heapq.nlargest(
+        top_n, ((directory, changed, delta, *collector.directories.get(directory, (0, 0)))
+                for directory, (changed, delta) in subtrees.items()),
+        key=lambda item: (abs(item[2]), item[1]))
+    return {
+        "old": {"label": old.label, "root": old.root},
+        "new": {"label": new.label, "root": new.root},
+        "metrics": _summary_metrics(old.summary, new.summary),
+        "counts": collector.counts,
+        "bytes_delta": collector.bytes_delta,
+        "unchanged": collector.unchanged,
+        "types": _type_deltas(old.summary, new.summary),
+        "largest_directories": largest_directories,
+        "largest_changes": {kind: [change for _, _, change in sorted(heap, reverse=True)]
+                            for kind, heap in collector.largest.items()},
+    }
+
+
+def _summary_metrics(old_summary, new_summary):
+    """[(label, old value, new value)] of the summary totals; values are None where a scan lacks them."""
+    metrics = [(label, old_summary.get(key), new_summary.get(key)) for key, label in _SUMMARY_METRICS]
+    metrics.append(("Total size of entries (bytes)", sum(old_summary['file_types_size_summary'].values()),
+                    sum(new_summary['file_types_size_summary'].values())))
+    old_usage, new_usage = old_summary.get('disk_usage'), new_summary.get('disk_usage')
+    metrics.append(("Allocated on disk (bytes)", old_usage and old_usage['allocated_bytes'],
+                    new_usage and new_usage['allocated_bytes']))
+    return metrics
+
+
+def _type_deltas(old_summary, new_summary):
+    """[(type, old count, new count, old bytes, new bytes)] of the types whose count or size changed, largest byte change first."""
+    old_counts, new_counts = old_summary['file_types_summary'], new_summary['file_types_summary']
+    old_sizes, new_sizes = old_summary['file_types_size_summary'], new_summary['file_types_size_summary']
+    deltas = []
+    for type_str in old_counts.keys() | new_counts.keys():
+        row = (type_str, old_counts.get(type_str, 0), new_counts.get(type_str, 0),
+               old_sizes.get(type_str, 0), new_sizes.get(type_str, 0))
+        if row[1] != row[2] or row[3] != row[4]:
+            deltas.append(row)
+    deltas.sort(key=lambda row: (-abs(row[4] - row[3]), -abs(row[2] - row[1]), row[0]))
+    return deltas
+
+
+# --- Output ---
+
+def _cell(value):
+    """Markdown table cell text."""
+    if value is None:
+        return "N/A"
+    return str(value).replace('|', '\\|')
+
+
+def _delta(old_value, new_value):
+    if old_value is None or new_value is None:
+        return "N/A"
+    return f"{new_value - old_value:+d}"
+
+
+def write_diff_markdown(filepath, diff):
+    """Writes the Markdown summary of a diff_snapshots result."""
+    top_n = config.DIFF_REPORT_TOP_N
+    with ReportBuffer(filepath) as f:
+        f.write("# Scan Diff\n\n")
+        f.write(f"- Old: `{diff['old']['root']}` ({diff['old']['label']})\n")
+        f.write(f"- New: `{diff['new']['root']}` ({diff['new']['label']})\n")
+
+        f.write("\n## Totals\n\n")
+        f.write("| Metric | Old | New | Delta |\n|--------|-----|-----|-------|\n")
+        for label, old_value, new_value in diff['metrics']:
+            f.write(f"| {label} | {_cell(old_value)} | {_cell(new_value)} | {_delta(old_value, new_value)} |\n")
+
+        f.write("\n## Changed Entries\n\n")
+        f.write("| Change | Entries | Size Delta (Bytes) |\n|--------|---------|--------------------|\n")
+        for kind in CHANGE_KINDS:
+            f.write(f"| {kind} | {diff['counts'][kind]} | {diff['bytes_delta'][kind]:+d} |\n")
+        f.write(f"| unchanged | {diff['unchanged']} | +0 |\n")
+
+        f.write(f"\n## Types (Top {top_n} by Size Change)\n\n")
+        if diff['types']:
+            f.write("| Type | Old Count | New Count | Count Delta | Old Bytes | New Bytes | Bytes Delta |\n")
+            f.write("|------|-----------|-----------|-------------|-----------|-----------|-------------|\n")
+            for type_str, old_count, new_count, old_bytes, new_bytes in diff['types'][:top_n]:
+                f.write(f"| {_cell(type_str)} | {old_count} | {new_count} | {_delta(old_count, new_count)} | "
+                        f"{old_bytes} | {new_bytes} | {_delta(old_bytes, new_bytes)} |\n")
+            if len(diff['types']) > top_n:
+                f.write(f"\n... and {len(diff['types']) - top_n} more types changed.\n")
+        else:
+            f.write("No type changed.\n")
+
+        f.write(f"\n## Directories (Top {top_n} by Size Change of the Subtree)\n\n")
+        if diff['largest_directories']:
+            f.write("| Directory | Changed Entries (Subtree) | Bytes Delta (Subtree) | Changed Entries (Own) | Bytes Delta (Own) |\n")
+            f.write("|-----------|---------------------------|-----------------------|-----------------------|-------------------|\n")
+            for directory, changed, delta, own_changed, own_delta in diff['largest_directories']:
+                f.write(f"| {_cell(directory or '.')} | {changed} | {delta:+d} | {own_changed} | {own_delta:+d} |\n")
+        else:
+            f.write("No directory changed.\n")
+
+        for kind in CHANGE_KINDS:
+            changes = diff['largest_changes'][kind]
+            f.write(f"\n## Largest {kind.capitalize()} Entries\n\n")
+            if not changes:
+                f.write("None.\n")
+                continue
+            f.write("| Path | Old Type | New Type | Old Size | New Size | Delta |\n")
+            f.write("|------|----------|----------|----------|----------|-------|\n")
+            for _, path, old_type, new_type, old_size, new_size, delta in changes:
+                f.write(f"| {_cell(path)} | {_cell(old_type)} | {_cell(new_type)} | {_cell(old_size)} | "
+                        f"{_cell(new_size)} | {delta:+d} |\n")
+
+
+def write_scan_diff(old_scan, new_scan):
+    """
+    Diffs two saved scans (scan files or scanned directories) into a CSV file of every change and a
+    Markdown summary in config.REPORT_OUTPUT_DIRECTORY. Returns (Markdown path, CSV path), or None
+    if a scan cannot be loaded.
+    """
+    old, new = Snapshot.load(old_scan), Snapshot.load(new_scan)
+    if old is None or new is None:
+        return None
+    markdown_path = generate_report_filename(report_name="scan_diff", extension=".md")
+    csv_path = os.path.splitext(markdown_path)[0] + ".csv"
+    with ReportBuffer(csv_path, newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDS)
+        diff = diff_snapshots(old, new, on_change=writer.writerow)
+    write_diff_markdown(markdown_path, diff)
+    counts = diff['counts']
+    print(f"Scan diff: {counts['added']} added, {counts['removed']} removed, {counts['retyped']} retyped, "
+          f"{counts['resized']} resized, {diff['unchanged']} unchanged entries.")
+    print(f"Scan diff saved to: {markdown_path} and {csv_path}")
+    return markdown_path, csv_path
@@ -0,0 +1,627 @@
+# scan_file.py
+"""
+Versioned, memory-mappable on-disk format for saved scans (replaces the pickle files).
+
+A scan file is a fixed header, a section table, and the sections themselves:
+
+    header          magic b"FASCAN\\0\\0", format version (uint32), section count (uint32)
+    section table   per section: name (32 bytes, NUL padded), offset (uint64), length (uint64)
+    sections        each starts on an 8-byte boundary, so numeric columns can be mapped as
+                    typed arrays without copying
+
+Sections:
+
+    meta                  JSON: format version, original_target_dir, record counts
+    summary               JSON: summary_stats (readable on its own, see read_summary)
+    files.<column>        one fixed-width little-endian column per COLUMN_TYPECODES entry
+    files.name_pool       UTF-8 entry names (ends in files.name_ends)
+    files.directories     string table (see below)
+    files.types           string table
+    files.symlink_rows    uint64 row numbers of symlink targets
+    files.symlink_targets string table, parallel to files.symlink_rows
+    files.dir_codes       uint64 directory codes of directory_stats (the directories recorded)
+    files.dir_devs        uint64 st_dev, parallel to files.dir_codes
+    files.dir_inodes      uint64 st_ino, parallel to files.dir_codes
+    files.dir_mtimes      int64 st_mtime_ns, parallel to files.dir_codes
+    files.chain_rows      uint64 row numbers of resolved symlink chains
+    files.chain_depths    int64 chain depths, parallel to files.chain_rows
+    files.chain_flags     uint8 CHAIN_IN_LOOP / CHAIN_HAS_FINAL_TARGET bits, parallel to files.chain_rows
+    files.chain_targets   string table of final targets ('' without one), parallel to files.chain_rows
+    files.inode_rows      uint64 row numbers of entries with more than one hard link
+    files.inode_devs      uint64 st_dev, parallel to files.inode_rows
+    files.inode_numbers   uint64 st_ino, parallel to files.inode_rows
+    dir_symlinks.*        the same sections for directory_symlinks_data
+    tree.names            string table of DirectoryTree node names (directory_tree.py)
+    tree.parents          int64 parent node numbers, parallel to tree.names
+    tree.own_files, tree.total_files   uint64 file entry counts per node
+    tree.own_bytes, tree.total_bytes   int64 byte counts per node
+
+A string table is a uint64 count, `count` uint64 end offsets and the UTF-8 string heap.
+All integers are little-endian.
+
+load_scan_file maps the file and returns a FileRecordStore whose columns are memoryviews into
+the mapping, so nothing but the small string tables is read until a record is accessed (files written before
+the chain, inode and disk usage sections were added load without that data, with zero
+allocated_bytes / hard_links columns, and without directory_tree; the 16-bit type code columns of
+format version 1 are widened into copies, and a single int64 dir_stats section is still read), and
+FileRecordStore.numpy_column hands the columns to NumPy zero-copy.
+
+ScanStreamWriter builds the same file while a scan is running (config.STREAM_SCAN_TO_DISK): chunks
+of records go to per-section spool files, periodic checkpoints make them durable together with
+the scanner's state, and the spools are concatenated into the scan file at the end.
+
+Run `python scan_file.py convert scan_data/scan_<hash>.pkl ...` to convert old pickled scans.
+"""
+import argparse
+import array
+import json
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import sys
+
+from directory_tree import DirectoryTree
+from record_store import COLUMN_TYPECODES, FileRecordStore
+
+SCAN_FILE_EXTENSION = ".fascan"
+FORMAT_VERSION = 2
+
+# Columns that older format versions wrote with a narrower typecode: name -> (last such version, typecode)
+_NARROWER_COLUMNS = {
+    'type_codes': (1, 'H'),
+    'target_type_codes': (1, 'h'),
+}
+
+_MAGIC = b"FASCAN\0\0"
+_HEADER = struct.Struct("<8sII")
+_SECTION_ENTRY = struct.Struct("<32sQQ")
+_COUNT = struct.Struct("<Q")
+_ALIGNMENT = 8
+_STR_ERRORS = 'surrogatepass'
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+_COPY_BUFFER_BYTES = 1024 * 1024
+
+CHAIN_IN_LOOP = 0x01
+CHAIN_HAS_FINAL_TARGET = 0x02
+
+
+class ScanFileError(Exception):
+    """Raised for files that are not scan files or use an unsupported format version."""
+
+
+def _le_bytes(arr):
+    if not _LITTLE_ENDIAN:
+        arr = array.array(arr.typecode, arr)
+        arr.byteswap()
+    return memoryview(arr).cast('B')
+
+
+def _string_table(strings):
+    heap = bytearray()
+    ends = array.array('Q')
+    for s in strings:
+        heap += s.encode('utf-8', _STR_ERRORS)
+        ends.append(len(heap))
+    return b"".join((_COUNT.pack(len(ends)), _le_bytes(ends), heap))
+
+
+def _read_string_table(buffer):
+    (count,) = _COUNT.unpack_from(buffer, 0)
+    ends = _typed_view(buffer[_COUNT.size:_COUNT.size + 8 * count], 'Q')
+    heap = buffer[_COUNT.size + 8 * count:]
+    strings = []
+    start = 0
+    for end in ends:
+        strings.append(str(heap[start:end], 'utf-8', _STR_ERRORS))
+        start = end
+    return strings
+
+
+def _typed_view(buffer, typecode):
+    """Zero-copy typed view of a little-endian column (a converted copy on big-endian hosts)."""
+    if _LITTLE_ENDIAN:
+        return buffer.cast(typecode)
+    arr = array.array(typecode)
+    arr.frombytes(buffer)
+    arr.byteswap()
+    return arr
+
+
+def _chain_columns(store, row_base=0):
+    """(rows, depths, flags, final targets) of a store's symlink_chains side table, rows offset by row_base."""
+    rows, depths, flags, targets = array.array('Q'), array.array('q'), array.array('B'), []
+    for row, (depth, final_target, in_loop) in store.symlink_chains.items():
+        rows.append(row + row_base)
+        depths.append(depth)
+        flags.append((CHAIN_IN_LOOP if in_loop else 0) | (CHAIN_HAS_FINAL_TARGET if final_target is not None else 0))
+        targets.append(final_target or '')
+    return rows, depths, flags, targets
+
+
+def _inode_columns(store, row_base=0):
+    """(rows, st_dev, st_ino) arrays of a store's inodes side table, rows offset by row_base."""
+    rows, devs, inos = array.array('Q'), array.array('Q'), array.array('Q')
+    for row, (st_dev, st_ino) in store.inodes.items():
+        rows.append(row + row_base)
+        devs.append(st_dev)
+        inos.append(st_ino)
+    return rows, devs, inos
+
+
+def _dir_stat_columns(store, dir_base=0):
+    """(codes, st_dev, st_ino, st_mtime_ns) arrays of a store's directory_stats, codes offset by dir_base."""
+    codes, devs, inos, mtimes = array.array('Q'), array.array('Q'), array.array('Q'), array.array('q')
+    for code, (st_dev, st_ino, st_mtime_ns) in store.directory_stats.items():
+        codes.append(code + dir_base)
+        devs.append(st_dev)
+        inos.append(st_ino)
+        mtimes.append(st_mtime_ns)
+    return codes, devs, inos, mtimes
+
+
+def _store_sections(prefix, store):
+    """Yields (section name, bytes-like) for one FileRecordStore."""
+    for name, typecode in COLUMN_TYPECODES.items():
+        column = getattr(store, name)
+        if not isinstance(column, array.array):
+            column = array.array(typecode, column)
+        yield f"{prefix}.{name}", _le_bytes(column)
+    yield f"{prefix}.name_pool", memoryview(store.name_pool).cast('B')
+    yield f"{prefix}.directories", _string_table(store.directories)
+    yield f"{prefix}.types", _string_table(store.types)
+    yield f"{prefix}.symlink_rows", _le_bytes(array.array('Q', store.symlink_targets.keys()))
+    yield f"{prefix}.symlink_targets", _string_table(store.symlink_targets.values())
+    for name, column in zip(('dir_codes', 'dir_devs', 'dir_inodes', 'dir_mtimes'), _dir_stat_columns(store)):
+        yield f"{prefix}.{name}", _le_bytes(column)
+    chain_rows, chain_depths, chain_flags, chain_targets = _chain_columns(store)
+    yield f"{prefix}.chain_rows", _le_bytes(chain_rows)
+    yield f"{prefix}.chain_depths", _le_bytes(chain_depths)
+    yield f"{prefix}.chain_flags", memoryview(chain_flags).cast('B')
+    yield f"{prefix}.chain_targets", _string_table(chain_targets)
+    for name, column in zip(('inode_rows', 'inode_devs', 'inode_numbers'), _inode_columns(store)):
+        yield f"{prefix}.{name}", _le_bytes(column)
+
+
+# DirectoryTree columns saved in the tree.* sections, with their array typecodes
+_TREE_COLUMNS = {'parents': 'q', 'own_files': 'Q', 'own_bytes': 'q', 'total_files': 'Q', 'total_bytes': 'q'}
+
+
+def _tree_sections(directory_tree):
+    """Yields (section name, bytes-like) for a finished DirectoryTree, nothing for None."""
+    if directory_tree is None:
+        return
+    yield "tree.names", _string_table(directory_tree.names)
+    for name, typecode in _TREE_COLUMNS.items():
+        column = getattr(directory_tree, name)
+        if not isinstance(column, array.array):
+            column = array.array(typecode, column)
+        yield f"tree.{name}", _le_bytes(column)
+
+
+def _load_tree(view, sections):
+    """DirectoryTree over the tree.* sections, or None for files written before they were added."""
+    if "tree.parents" not in sections:
+        return None
+
+    def section(name):
+        offset, length = sections[f"tree.{name}"]
+        return view[offset:offset + length]
+
+    columns = {name: _typed_view(section(name), typecode) for name, typecode in _TREE_COLUMNS.items()}
+    return DirectoryTree.from_columns(_read_string_table(section('names')), **columns)
+
+
+def _as_store(records):
+    if isinstance(records, FileRecordStore):
+        return records
+    store = FileRecordStore()
+    store.extend(records)
+    return store
+
+
+def write_scan_file(filepath, all_file_details, dir_symlink_details, summary_stats, original_target_dir):
+    """Writes a scan in the columnar format. all_file_details may be a FileRecordStore or a list of dicts."""
+    files_store = _as_store(all_file_details)
+    dir_symlinks_store = _as_store(dir_symlink_details)
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'original_target_dir': original_target_dir,
+        'file_records': len(files_store),
+        'dir_symlink_records': len(dir_symlinks_store),
+    }
+    sections = [
+        ('meta', json.dumps(meta).encode('utf-8')),
+        ('summary', json.dumps(summary_stats).encode('utf-8')),
+    ]
+    sections.extend(_store_sections('files', files_store))
+    sections.extend(_store_sections('dir_symlinks', dir_symlinks_store))
+    sections.extend(_tree_sections(files_store.directory_tree))
+
+    _write_sections(filepath, [(name, [data]) for name, data in sections])
+
+
+def _write_sections(filepath, sections):
+    """
+    Writes header, section table and sections. Each section is a list of parts: bytes-like
+    objects, or paths (str) of spool files whose contents are copied in.
+    """
+    offset = _HEADER.size + _SECTION_ENTRY.size * len(sections)
+    table = []
+    for name, parts in sections:
+        if len(name) > 32:
+            raise ValueError(f"Section name too long for the section table: {name}")
+        offset += -offset % _ALIGNMENT
+        length = sum(os.path.getsize(part) if isinstance(part, str) else len(part) for part in parts)
+        table.append(_SECTION_ENTRY.pack(name.encode('ascii'), offset, length))
+        offset += length
+
+    temp_path = filepath + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, FORMAT_VERSION, len(sections)))
+        f.write(b"".join(table))
+        for name, parts in sections:
+            f.write(b"\0" * (-f.tell() % _ALIGNMENT))
+            for part in parts:
+                if isinstance(part, str):
+                    with open(part, 'rb') as spool:
+                        shutil.copyfileobj(spool, f, _COPY_BUFFER_BYTES)
+                else:
+                    f.write(part)
+    os.replace(temp_path, filepath)  # Never leave a half-written scan under the real name
+
+
+def _read_section_table(buffer):
+    if len(buffer) < _HEADER.size:
+        raise ScanFileError("File is too short to be a scan file")
+    magic, version, num_sections = _HEADER.unpack_from(buffer, 0)
+    if magic != _MAGIC:
+        raise ScanFileError("Not a scan file (bad magic)")
+    if version > FORMAT_VERSION:
+        raise ScanFileError(f"Scan file format version {version} is newer than supported version {FORMAT_VERSION}")
+    sections = {}
+    for i in range(num_sections):
+        name, offset, length = _SECTION_ENTRY.unpack_from(buffer, _HEADER.size + i * _SECTION_ENTRY.size)
+        sections[name.rstrip(b"\0").decode('ascii')] = (offset, length)
+    return sections
+
+
+def read_summary(filepath):
+    """Returns (meta, summary_stats) by reading only the header, section table and summary section."""
+    with open(filepath, 'rb') as f:
+        head = f.read(_HEADER.size)
+        _, _, num_sections = _HEADER.unpack_from(head, 0) if len(head) == _HEADER.size else (None, 0, 0)
+        sections = _read_section_table(head + f.read(_SECTION_ENTRY.size * num_sections))
+        result = []
+        for name in ('meta', 'summary'):
+            offset, length = sections[name]
+            f.seek(offset)
+            result.append(json.loads(f.read(length).decode('utf-8')))
+    return tuple(result)
+
+
+def _load_store(view, sections, prefix, backing, version):
+    def section(name):
+        offset, length = sections[f"{prefix}.{name}"]
+        return view[offset:offset + length]
+
+    num_rows = sections[f"{prefix}.flags"][1]  # One byte per row
+    columns = {}
+    for name, typecode in COLUMN_TYPECODES.items():
+        if f"{prefix}.{name}" not in sections:  # Column added after the file was written
+            columns[name] = array.array(typecode, bytes(array.array(typecode).itemsize * num_rows))
+        elif name in _NARROWER_COLUMNS and version <= _NARROWER_COLUMNS[name][0]:
+            columns[name] = array.array(typecode, _typed_view(section(name), _NARROWER_COLUMNS[name][1]))
+        else:
+            columns[name] = _typed_view(section(name), typecode)
+    symlink_rows = _typed_view(section('symlink_rows'), 'Q')
+    symlink_targets = dict(zip(symlink_rows, _read_string_table(section('symlink_targets'))))
+    if f"{prefix}.dir_codes" in sections:
+        directory_stats = dict(zip(_typed_view(section('dir_codes'), 'Q'),
+                                   zip(_typed_view(section('dir_devs'), 'Q'), _typed_view(section('dir_inodes'), 'Q'),
+                                       _typed_view(section('dir_mtimes'), 'q'))))
+    else:  # Older file: one int64 dir_stats section of (code, st_dev, st_ino, st_mtime_ns) groups
+        raw_dir_stats = _typed_view(section('dir_stats'), 'q')
+        directory_stats = {raw_dir_stats[i]: (raw_dir_stats[i + 1], raw_dir_stats[i + 2], raw_dir_stats[i + 3])
+                           for i in range(0, len(raw_dir_stats), 4)}
+    symlink_chains = {}
+    if f"{prefix}.chain_rows" in sections:
+        chain_flags = section('chain_flags')
+        for row, depth, flags, final_target in zip(_typed_view(section('chain_rows'), 'Q'),
+                                                   _typed_view(section('chain_depths'), 'q'), chain_flags,
+                                                   _read_string_table(section('chain_targets'))):
+            symlink_chains[row] = (depth, final_target if flags & CHAIN_HAS_FINAL_TARGET else None,
+                                   bool(flags & CHAIN_IN_LOOP))
+    inodes = {}
+    if f"{prefix}.inode_rows" in sections:
+        inodes = dict(zip(_typed_view(section('inode_rows'), 'Q'),
+                          zip(_typed_view(section('inode_devs'), 'Q'), _typed_view(section('inode_numbers'), 'Q'))))
+    return FileRecordStore.from_columns(
+        _read_string_table(section('directories')), _read_string_table(section('types')),
+        columns, section('name_pool'), symlink_targets, directory_stats, backing=backing,
+        symlink_chains=symlink_chains, inodes=inodes)
+
+
+def load_scan_file(filepath):
+    """
+    Memory-maps a scan file. Returns (all_file_details as a read-only FileRecordStore,
+    dir_symlink_details as a list of dicts, summary_stats, meta).
+    """
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ScanFileError("Scan file is empty")
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    sections = _read_section_table(view)
+
+    def json_section(name):
+        offset, length = sections[name]
+        return json.loads(str(view[offset:offset + length], 'utf-8'))
+
+    meta = json_section('meta')
+    summary_stats = json_section('summary')
+    version = meta.get('format_version', 1)
+    files_store = _load_store(view, sections, 'files', mapping, version)
+    files_store.directory_tree = _load_tree(view, sections)
+    dir_symlinks_store = _load_store(view, sections, 'dir_symlinks', mapping, version)
+
+    dir_symlink_details = []
+    for record in dir_symlinks_store:
+        record = dict(record)
+        del record['symlink_target_size_bytes']  # Directory symlink records do not carry this key
+        dir_symlink_details.append(record)
+    return files_store, dir_symlink_details, summary_stats, meta
+
+# --- Streaming writer (config.STREAM_SCAN_TO_DISK) ---
+
+_CHECKPOINT_FILENAME = "checkpoint.json"
+_PARTIAL_SUFFIX = ".partial"
+
+
+def _spool_dir(filepath):
+    return filepath + _PARTIAL_SUFFIX
+
+
+def has_checkpoint(filepath):
+    """True if an interrupted streamed scan for the scan file at filepath left a checkpoint to resume from."""
+    return os.path.exists(os.path.join(_spool_dir(filepath), _CHECKPOINT_FILENAME))
+
+
+class _SpooledStore:
+    """
+    Appends FileRecordStore chunks to one spool file per section. Directory, row, name pool and
+    string heap offsets are rebased while appending, so the spool files concatenate directly
+    into the sections of the final scan file. Only the (small) type table is kept in memory.
+    """
+
+    _SPOOLS = tuple(COLUMN_TYPECODES) + ('name_pool', 'directories.ends', 'directories.heap', 'symlink_rows',
+                                         'symlink_targets.ends', 'symlink_targets.heap', 'dir_codes', 'dir_devs',
+                                         'dir_inodes', 'dir_mtimes', 'chain_rows', 'chain_depths', 'chain_flags',
+                                         'chain_targets.ends', 'chain_targets.heap', 'inode_rows', 'inode_devs',
+                                         'inode_numbers')
+
+    def __init__(self, spool_dir, prefix, types=()):
+        self.prefix = prefix
+        self.paths = {spool: os.path.join(spool_dir, f"{prefix}.{spool}") for spool in self._SPOOLS}
+        self.files = {spool: open(path, 'ab') for spool, path in self.paths.items()}
+        self.types = []
+        self._type_code_of = {}
+        for type_str in types:
+            self._type_code(type_str)
+
+    def _type_code(self, type_str):
+        code = self._type_code_of.get(type_str)
+        if code is None:
+            code = self._type_code_of[type_str] = len(self.types)
+            self.types.append(type_str)
+        return code
+
+    def _size(self, spool):
+        return self.files[spool].tell()
+
+    def _write(self, spool, data):
+        self.files[spool].write(data)
+
+    def _append_strings(self, spool, strings):
+        heap = bytearray()
+        ends = array.array('Q')
+        heap_base = self._size(f"{spool}.heap")
+        for string in strings:
+            heap += string.encode('utf-8', _STR_ERRORS)
+            ends.append(heap_base + len(heap))
+        self._write(f"{spool}.ends", _le_bytes(ends))
+        self._write(f"{spool}.heap", heap)
+
+    def append(self, store):
+        row_base = self._size('flags')  # One byte per row
+        dir_base = self._size('directories.ends') // 8
+        pool_base = self._size('name_pool')
+        type_map = [self._type_code(type_str) for type_str in store.types]
+
+        self._write('dir_idx', _le_bytes(array.array('I', (code + dir_base for code in store.dir_idx))))
+        self._write('name_ends', _le_bytes(array.array('Q', (end + pool_base for end in store.name_ends))))
+        self._write('size_bytes', _le_bytes(array.array('q', store.size_bytes)))
+        self._write('allocated_bytes', _le_bytes(array.array('q', store.allocated_bytes)))
+        self._write('hard_links', _le_bytes(array.array('I', store.hard_links)))
+        self._write('target_size_bytes', _le_bytes(array.array('q', store.target_size_bytes)))
+        self._write('flags', store.flags.tobytes())
+        self._write('type_codes', _le_bytes(array.array('I', (type_map[code] for code in store.type_codes))))
+        self._write('target_type_codes', _le_bytes(array.array(
+            'i', (type_map[code] if code >= 0 else code for code in store.target_type_codes))))
+        self._write('name_pool', store.name_pool)
+        self._append_strings('directories', store.directories)
+        self._write('symlink_rows', _le_bytes(array.array('Q', (row + row_base for row in store.symlink_targets))))
+        self._append_strings('symlink_targets', store.symlink_targets.values())
+        for name, column in zip(('dir_codes', 'dir_devs', 'dir_inodes', 'dir_mtimes'),
+                                _dir_stat_columns(store, dir_base)):
+            self._write(name, _le_bytes(column))
+        chain_rows, chain_depths, chain_flags, chain_targets = _chain_columns(store, row_base)
+        self._write('chain_rows', _le_bytes(chain_rows))
+        self._write('chain_depths', _le_bytes(chain_depths))
+        self._write('chain_flags', chain_flags.tobytes())
+        self._append_strings('chain_targets', chain_targets)
+        for name, column in zip(('inode_rows', 'inode_devs', 'inode_numbers'), _inode_columns(store, row_base)):
+            self._write(name, _le_bytes(column))
+
+    def sync(self):
+        """Flushes every spool file to disk. Returns their sizes, which identify this point in the stream."""
+        sizes = {}
+        for spool, f in self.files.items():
+            f.flush()
+            os.fsync(f.fileno())
+            sizes[f"{self.prefix}.{spool}"] = f.tell()
+        return sizes
+
+    def sections(self):
+        """(section name, parts) of this store for _write_sections, matching _store_sections."""
+        paths = self.paths
+        sections = [(f"{self.prefix}.{name}", [paths[name]]) for name in COLUMN_TYPECODES]
+        sections.append((f"{self.prefix}.name_pool", [paths['name_pool']]))
+        for table in ('directories', 'types', 'symlink_rows', 'symlink_targets', 'dir_codes', 'dir_devs',
+                      'dir_inodes', 'dir_mtimes', 'chain_rows', 'chain_depths', 'chain_flags', 'chain_targets',
+                      'inode_rows', 'inode_devs', 'inode_numbers'):
+            if table == 'types':
+                parts = [_string_table(self.types)]
+            elif table in ('directories', 'symlink_targets', 'chain_targets'):
+                count = self._size(f"{table}.ends") // 8
+                parts = [_COUNT.pack(count), paths[f"{table}.ends"], paths[f"{table}.heap"]]
+            else:
+                parts = [paths[table]]
+            sections.append((f"{self.prefix}.{table}", parts))
+        return sections
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+class ScanStreamWriter:
+    """
+    Writes a scan file while the scan is running. Record chunks are appended to spool files in
+    <scan file>.partial/, and checkpoint() records how far the spools are valid together with the
+    scanner's own state (pending directories, running counters). finish() assembles the spools
+    into the scan file and removes the spool directory.
+
+    With resume=True the spools are cut back to the last checkpoint and checkpoint_state holds
+    the scanner state saved with it; otherwise any old spool directory is discarded.
+    """
+
+    def __init__(self, filepath, resume=False):
+        self.filepath = filepath
+        self.spool_dir = _spool_dir(filepath)
+        self.checkpoint_state = None
+        types = {}
+        if resume:
+            checkpoint_path = os.path.join(self.spool_dir, _CHECKPOINT_FILENAME)
+            if not os.path.exists(checkpoint_path):
+                raise ScanFileError(f"No checkpoint to resume from in {self.spool_dir}")
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if checkpoint.get('format_version') != FORMAT_VERSION:
+                raise ScanFileError(f"Checkpoint format version {checkpoint.get('format_version')} is not supported")
+            expected_spools = {f"{prefix}.{spool}" for prefix in ('files', 'dir_symlinks') for spool in _SpooledStore._SPOOLS}
+            if set(checkpoint['spool_sizes']) != expected_spools:
+                raise ScanFileError("Checkpoint was written with a different set of record columns")
+            # Drop whatever was appended after the checkpoint was taken
+            for spool, size in checkpoint['spool_sizes'].items():
+                os.truncate(os.path.join(self.spool_dir, spool), size)
+            types = checkpoint['types']
+            self.checkpoint_state = checkpoint['scanner_state']
+        else:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+            os.makedirs(self.spool_dir)
+        self._stores = {prefix: _SpooledStore(self.spool_dir, prefix, types.get(prefix, ()))
+                        for prefix in ('files', 'dir_symlinks')}
+
+    def write_chunk(self, all_files_data, directory_symlinks_data):
+        """Appends a chunk of records (a FileRecordStore and a list of directory symlink records)."""
+        self._stores['files'].append(all_files_data)
+        self._stores['dir_symlinks'].append(_as_store(directory_symlinks_data))
+
+    def checkpoint(self, scanner_state):
+        """
+        Makes everything written so far durable and records scanner_state (JSON-serializable) as the
+        point a resumed scan continues from. Call it only between chunks.
+        """
+        spool_sizes = {}
+        for store in self._stores.values():
+            spool_sizes.update(store.sync())
+        checkpoint = {
+            'format_version': FORMAT_VERSION,
+            'spool_sizes': spool_sizes,
+            'types': {prefix: store.types for prefix, store in self._stores.items()},
+            'scanner_state': scanner_state,
+        }
+        checkpoint_path = os.path.join(self.spool_dir, _CHECKPOINT_FILENAME)
+        with open(checkpoint_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+    def finish(self, summary_stats, original_target_dir, directory_tree=None):
+        """
+        Writes the final scan file and removes the spools. Returns (all_file_details, dir_symlink_details)
+        loaded back from the file, as from load_scan_file (the file records stay memory-mapped).
+        directory_tree is the finished DirectoryTree of all chunks, saved in the tree.* sections.
+        """
+        for store in self._stores.values():
+            store.sync()
+        files_store, dir_symlinks_store = self._stores['files'], self._stores['dir_symlinks']
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'original_target_dir': original_target_dir,
+            'file_records': files_store._size('flags'),
+            'dir_symlink_records': dir_symlinks_store._size('flags'),
+        }
+        sections = [
+            ('meta', [json.dumps(meta).encode('utf-8')]),
+            ('summary', [json.dumps(summary_stats).encode('utf-8')]),
+        ]
+        sections.extend(files_store.sections())
+        sections.extend(dir_symlinks_store.sections())
+        sections.extend((name, [data]) for name, data in _tree_sections(directory_tree))
+        _write_sections(self.filepath, sections)
+        self.close()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+        all_file_details, dir_symlink_details, _, _ = load_scan_file(self.filepath)
+        return all_file_details, dir_symlink_details
+
+    def close(self):
+        """Closes the spool files, keeping them (and the last checkpoint) on disk."""
+        for store in self._stores.values():
+            store.close()
+
+
+def convert_pickle_scan(pickle_path, output_path=None):
+    """Converts a scan_<hash>.pkl written by the old serializer to the columnar format. Returns the new path."""
+    if output_path is None:
+        output_path = os.path.splitext(pickle_path)[0] + SCAN_FILE_EXTENSION
+    with open(pickle_path, 'rb') as f:
+        loaded_data = pickle.load(f)
+    write_scan_file(output_path, loaded_data['all_file_details'], loaded_data['dir_symlink_details'],
+                    loaded_data['summary_stats'], loaded_data.get('original_target_dir'))
+    return output_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tools for columnar scan files.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert_parser = subparsers.add_parser('convert', help="Convert pickled scan_*.pkl files to the columnar format")
+    convert_parser.add_argument('pickle_files', nargs='+')
+    info_parser = subparsers.add_parser('info', help="Print the header and summary of a scan file")
+    info_parser.add_argument('scan_file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        for pickle_path in args.pickle_files:
+            output_path = convert_pickle_scan(pickle_path)
+            print(f"Converted {pickle_path} -> {output_path}")
+    else:
+        meta, summary_stats = read_summary(args.scan_file)
+        print(json.dumps({'meta': meta, 'summary': summary_stats}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,18 @@ import pickle
 import os
 import pathlib
 import hashlib  # For creating a more filename-friendly hash of the target directory
+import sqlite3
 import config  # To get SCAN_DATA_DIRECTORY
+from scan_database import SCAN_DATABASE_EXTENSION, ScanDatabaseError, open_scan_database, write_scan_database
+from scan_file import (SCAN_FILE_EXTENSION, ScanFileError, ScanStreamWriter, has_checkpoint, load_scan_file,
+                       read_summary, write_scan_file)
 
+# Extension of scans saved by earlier versions (one pickled dict). Still loaded if no scan file exists;
+# convert them with `python scan_file.py convert <file>`.
+LEGACY_SCAN_EXTENSION = ".pkl"
 
-def _get_scan_filename(target_dir_path_obj):
+
+def _get_scan_filename(target_dir_path_obj, extension=SCAN_FILE_EXTENSION):
     """
     Generates a consistent filename for a given target directory.
     Uses a hash of the absolute path to create a unique and safe filename.
@@ -20,15 +28,15 @@ def _get_scan_filename(target_dir_path_obj):
     hasher.update(abs_path_str.encode('utf-8'))
     hashed_filename = hasher.hexdigest()
 
-    return f"scan_{hashed_filename}.pkl"
+    return f"scan_{hashed_filename}{extension}"
 
 
-def _get_full_scan_filepath(target_dir):
+def _get_full_scan_filepath(target_dir, extension=SCAN_FILE_EXTENSION):
     """
     Constructs the full path to where the scan data file would be stored.
     """
     target_dir_path_obj = pathlib.Path(target_dir)
-    scan_filename = _get_scan_filename(target_dir_path_obj)
+    scan_filename = _get_scan_filename(target_dir_path_obj, extension)
 
     # Ensure SCAN_DATA_DIRECTORY exists
     if not os.path.exists(config.SCAN_DATA_DIRECTORY):
@@ -53,43 +61,88 @@ def scan_exists(target_dir):
     Returns:
         bool: True if a saved scan exists, False otherwise.
     """
-    filepath = _get_full_scan_filepath(target_dir)
-    return os.path.exists(filepath)
+    return (os.path.exists(_get_full_scan_filepath(target_dir))
+            or os.path.exists(_get_full_scan_filepath(target_dir, LEGACY_SCAN_EXTENSION)))
+
+
+def _check_original_target_dir(original_target_dir_stored, target_dir):
+    # Optional: Verify if the loaded scan matches the requested target_dir
+    # This is a basic check. More robust checks could involve timestamps or content hashes.
+    current_target_dir_resolved = str(pathlib.Path(target_dir).resolve())
+    if original_target_dir_stored != current_target_dir_resolved:
+        print(f"Warning: Loaded scan was for '{original_target_dir_stored}', "
+              f"but current request is for '{current_target_dir_resolved}'. Using loaded data anyway.")
+        # You could choose to return None here if a strict match is required.
 
 
 def save_scan(all_file_details, dir_symlink_details, summary_stats, target_dir):
     """
-    Saves the scan results to a file using pickle.
+    Saves the scan results in the columnar scan file format (see scan_file.py).
 
     Args:
-        all_file_details (list): Data for file-like entries.
+        all_file_details (FileRecordStore or list): Data for file-like entries.
         dir_symlink_details (list): Data for directory symlinks.
         summary_stats (dict): Summary statistics.
         target_dir (str or pathlib.Path): The directory that was scanned (used for filename generation).
     """
     filepath = _get_full_scan_filepath(target_dir)
-    data_to_save = {
-        'all_file_details': all_file_details,
-        'dir_symlink_details': dir_symlink_details,
-        'summary_stats': summary_stats,
-        'original_target_dir': str(pathlib.Path(target_dir).resolve())  # Store for verification
-    }
+    original_target_dir = str(pathlib.Path(target_dir).resolve())  # Store for verification
 
     try:
-        with open(filepath, 'wb') as f:
-            pickle.dump(data_to_save, f)
+        write_scan_file(filepath, all_file_details, dir_symlink_details, summary_stats, original_target_dir)
         print(f"Scan data successfully saved to: {filepath}")
-    except pickle.PicklingError as e:
-        print(f"Error pickling data: {e}")
+    except (TypeError, ValueError) as e:
+        print(f"Error encoding scan data: {e}")
     except IOError as e:
         print(f"Error saving scan data to {filepath}: {e}")
     except Exception as e:
         print(f"An unexpected error occurred during save_scan: {e}")
 
 
+def interrupted_scan_exists(target_dir):
+    """
+    Checks if a streamed scan of the given target directory was interrupted and left a checkpoint.
+
+    Args:
+        target_dir (str or pathlib.Path): The directory that was being scanned.
+
+    Returns:
+        bool: True if the scan can be resumed, False otherwise.
+    """
+    return has_checkpoint(_get_full_scan_filepath(target_dir))
+
+
+def open_scan_stream(target_dir, resume=False):
+    """
+    Opens a ScanStreamWriter that analyze_directory uses to write the scan file while scanning
+    (config.STREAM_SCAN_TO_DISK). With resume=True it continues from the last checkpoint of an
+    interrupted scan, and falls back to a fresh stream if that checkpoint cannot be used.
+
+    Args:
+        target_dir (str or pathlib.Path): The directory to be scanned (used for filename generation).
+        resume (bool): Whether to resume an interrupted scan.
+
+    Returns:
+        ScanStreamWriter, or None if the scan file cannot be written.
+    """
+    filepath = _get_full_scan_filepath(target_dir)
+    if resume:
+        try:
+            return ScanStreamWriter(filepath, resume=True)
+        except (ScanFileError, IOError, KeyError, ValueError) as e:
+            print(f"Error resuming interrupted scan from {filepath}: {e}. Starting a new scan.")
+    try:
+        return ScanStreamWriter(filepath)
+    except IOError as e:
+        print(f"Error opening scan file {filepath} for streaming: {e}")
+    return None
+
+
 def load_scan(target_dir):
     """
-    Loads scan results from a file.
+    Loads scan results from a file. The scan file is memory-mapped: all_file_details is a
+    read-only FileRecordStore whose columns are read from the file on access.
+    Falls back to a legacy pickled scan if no scan file exists.
 
     Args:
         target_dir (str or pathlib.Path): The directory for which to load the scan.
@@ -100,23 +153,143 @@ def load_scan(target_dir):
     """
     filepath = _get_full_scan_filepath(target_dir)
     if not os.path.exists(filepath):
+        legacy_filepath = _get_full_scan_filepath(target_dir, LEGACY_SCAN_EXTENSION)
+        if os.path.exists(legacy_filepath):
+            return _load_legacy_scan(legacy_filepath, target_dir)
         print(f"No saved scan found at: {filepath}")
         return None, None, None
 
+    try:
+        all_file_details, dir_symlink_details, summary_stats, meta = load_scan_file(filepath)
+        _check_original_target_dir(meta.get('original_target_dir'), target_dir)
+        print(f"Scan data successfully loaded from: {filepath}")
+        return all_file_details, dir_symlink_details, summary_stats
+    except ScanFileError as e:
+        print(f"Error reading scan file {filepath}: {e}. File might be corrupted or incompatible.")
+    except IOError as e:
+        print(f"Error loading scan data from {filepath}: {e}")
+    except KeyError as e:
+        print(f"Error: Saved scan file {filepath} is missing expected section: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred during load_scan: {e}")
+
+    return None, None, None
+
+
+def load_scan_snapshot(scan):
+    """
+    Loads a saved scan to diff it against another one (scan_diff.py). scan is the path of a scan
+    file, or a directory whose saved scan is loaded (without checking that it is still current).
+    Returns (all_file_details, dir_symlink_details, summary_stats, meta), or None if no scan file can be read.
+    """
+    filepath = str(scan)
+    if not os.path.isfile(filepath):
+        filepath = _get_full_scan_filepath(scan)
+        if not os.path.exists(filepath):
+            print(f"No saved scan found for: {scan} (expected at {filepath})")
+            return None
+    try:
+        return load_scan_file(filepath)
+    except ScanFileError as e:
+        print(f"Error reading scan file {filepath}: {e}. File might be corrupted or incompatible.")
+    except (IOError, KeyError, ValueError) as e:
+        print(f"Error loading scan data from {filepath}: {e}")
+    return None
+
+
+def load_scan_summary(target_dir):
+    """
+    Returns the summary_stats of the saved scan for target_dir without reading any records,
+    or None if there is no readable scan file.
+    """
+    filepath = _get_full_scan_filepath(target_dir)
+    if not os.path.exists(filepath):
+        print(f"No saved scan found at: {filepath}")
+        return None
+    try:
+        meta, summary_stats = read_summary(filepath)
+        _check_original_target_dir(meta.get('original_target_dir'), target_dir)
+        return summary_stats
+    except (ScanFileError, IOError, KeyError, ValueError) as e:
+        print(f"Error reading scan summary from {filepath}: {e}")
+    return None
+
+
+def scan_database_is_current(target_dir):
+    """
+    Checks if the SQLite database of the given target directory exists and is not older than its saved scan.
+
+    Args:
+        target_dir (str or pathlib.Path): The directory that was scanned.
+
+    Returns:
+        bool: True if the database can be queried as-is, False if it has to be (re)built.
+    """
+    db_path = _get_full_scan_filepath(target_dir, SCAN_DATABASE_EXTENSION)
+    if not os.path.exists(db_path):
+        return False
+    scan_path = _get_full_scan_filepath(target_dir)
+    return not os.path.exists(scan_path) or os.path.getmtime(scan_path) <= os.path.getmtime(db_path)
+
+
+def save_scan_database(all_file_details, dir_symlink_details, summary_stats, target_dir):
+    """
+    Exports the scan results to the SQLite database of the target directory (see scan_database.py),
+    replacing an existing one.
+
+    Args:
+        all_file_details (FileRecordStore or list): Data for file-like entries.
+        dir_symlink_details (list): Data for directory symlinks.
+        summary_stats (dict): Summary statistics.
+        target_dir (str or pathlib.Path): The directory that was scanned (used for filename generation).
+
+    Returns:
+        bool: True if the database was written.
+    """
+    db_path = _get_full_scan_filepath(target_dir, SCAN_DATABASE_EXTENSION)
+    original_target_dir = str(pathlib.Path(target_dir).resolve())
+    try:
+        num_rows, insert_seconds, seconds = write_scan_database(db_path, all_file_details, dir_symlink_details,
+                                                                summary_stats, original_target_dir)
+        rate = num_rows / insert_seconds if insert_seconds else 0.0
+        print(f"Scan database saved to: {db_path} ({num_rows} rows loaded in {insert_seconds:.2f} s, {rate:.0f} rows/s; "
+              f"{seconds:.2f} s with the indexes)")
+        return True
+    except (sqlite3.Error, IOError) as e:
+        print(f"Error saving scan database to {db_path}: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred during save_scan_database: {e}")
+    return False
+
+
+def open_saved_scan_database(target_dir):
+    """
+    Opens the SQLite database of the given target directory read-only.
+
+    Args:
+        target_dir (str or pathlib.Path): The directory that was scanned.
+
+    Returns:
+        sqlite3.Connection, or None if there is no readable database.
+    """
+    db_path = _get_full_scan_filepath(target_dir, SCAN_DATABASE_EXTENSION)
+    try:
+        conn, meta = open_scan_database(db_path)
+        _check_original_target_dir(meta.get('original_target_dir'), target_dir)
+        return conn
+    except (ScanDatabaseError, sqlite3.Error) as e:
+        print(f"Error opening scan database {db_path}: {e}")
+    return None
+
+
+def _load_legacy_scan(filepath, target_dir):
+    """Loads a scan saved as a pickled dict by earlier versions."""
     try:
         with open(filepath, 'rb') as f:
             loaded_data = pickle.load(f)
 
-        # Optional: Verify if the loaded scan matches the requested target_dir
-        # This is a basic check. More robust checks could involve timestamps or content hashes.
-        original_target_dir_stored = loaded_data.get('original_target_dir')
-        current_target_dir_resolved = str(pathlib.Path(target_dir).resolve())
-        if original_target_dir_stored != current_target_dir_resolved:
-            print(f"Warning: Loaded scan was for '{original_target_dir_stored}', "
-                  f"but current request is for '{current_target_dir_resolved}'. Using loaded data anyway.")
-            # You could choose to return None here if a strict match is required.
-
-        print(f"Scan data successfully loaded from: {filepath}")
+        _check_original_target_dir(loaded_data.get('original_target_dir'), target_dir)
+        print(f"Legacy scan data loaded from: {filepath} (convert it with 'python scan_file.py convert')")
         return (
             loaded_data['all_file_details'],
             loaded_data['dir_symlink_details'],
@@ -131,4 +304,4 @@ def load_scan(target_dir):
     except Exception as e:
         print(f"An unexpected error occurred during load_scan: {e}")
 
-    return None, None, None
\ No newline at end of file
+    return None, None, None
@@ -0,0 +1,212 @@
+# size_sketch.py
+"""
+Mergeable file-size distribution sketches, kept in summary_data['file_size_distribution'].
+
+SizeSketch counts sizes in logarithmic buckets: every size below 32 bytes has its own bucket,
+and every power-of-two range [2**k, 2**(k+1)) above that is split into 32 equal buckets.
+Counts are exact, so:
+
+    - merging two sketches (parallel workers, several saved scans) just adds bucket counts and
+      gives exactly the sketch of the combined data, independent of insertion order;
+    - the number of sizes in every power-of-two range (log2_counts) is exact;
+    - a quantile is located in the right bucket exactly and reported as the bucket's midpoint,
+      so it is within 1/64 (~1.6%) of the true value; sizes below 32 bytes, the minimum and the
+      maximum are exact;
+    - memory is at most 32 buckets per power of two (~2000 for any file size), not per file.
+
+Unlike KLL or t-digest, the result does not depend on the order sizes arrive in, so every
+traversal engine produces the same summary_data.
+
+FileSizeDistribution keeps one sketch each for regular file sizes, symlink own sizes and
+symlink target sizes, so the plots can combine them according to
+config.SYMLINK_SIZE_HANDLING_FOR_PLOTS at plot time, also for scans saved earlier.
+"""
+import math
+
+import config
+
+_SUB_BUCKET_BITS = 5
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+
+# Largest relative difference between a reported quantile and the true value
+RELATIVE_ERROR = 1 / (2 * _SUB_BUCKETS)
+
+# Percentiles shown in the text report
+REPORT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+def _bucket_index(size):
+    """Bucket of a positive size: exact below _SUB_BUCKETS, then _SUB_BUCKETS buckets per power of two."""
+    if size < _SUB_BUCKETS:
+        return size
+    shift = size.bit_length() - 1 - _SUB_BUCKET_BITS
+    return ((shift + 1) << _SUB_BUCKET_BITS) + (size >> shift) - _SUB_BUCKETS
+
+
+def bucket_bounds(index):
+    """[low, high) size range of a bucket."""
+    if index < _SUB_BUCKETS:
+        return index, index + 1
+    shift = (index >> _SUB_BUCKET_BITS) - 1
+    low = ((index & (_SUB_BUCKETS - 1)) + _SUB_BUCKETS) << shift
+    return low, low + (1 << shift)
+
+
+class SizeSketch:
+    """Log-bucketed counts of non-negative sizes (see module docstring for the error bounds)."""
+
+    def __init__(self):
+        self.buckets = {}  # bucket index -> count, positive sizes only
+        self.zero_count = 0
+        self.count = 0
+        self.min_positive = None
+        self.max_positive = None
+
+    def add(self, size):
+        self.count += 1
+        if size == 0:
+            self.zero_count += 1
+            return
+        index = _bucket_index(size)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        if self.min_positive is None or size < self.min_positive:
+            self.min_positive = size
+        if self.max_positive is None or size > self.max_positive:
+            self.max_positive = size
+
+    def merge(self, other):
+        """Adds the counts of another SizeSketch into this one."""
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for index, bucket_count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + bucket_count
+        if other.min_positive is not None:
+            if self.min_positive is None or other.min_positive < self.min_positive:
+                self.min_positive = other.min_positive
+            if self.max_positive is None or other.max_positive > self.max_positive:
+                self.max_positive = other.max_positive
+
+    def _representative(self, index):
+        low, high = bucket_bounds(index)
+        return min(max(low + (high - low - 1) // 2, self.min_positive), self.max_positive)
+
+    def weighted_sizes(self):
+        """
+        Returns (sizes, weights): one representative size per non-empty bucket (its midpoint,
+        clamped to the exact minimum and maximum) with the bucket's count, in increasing order.
+        Zero-byte sizes come first as size 0. Plot functions accept these in place of a size list.
+        """
+        sizes, weights = [], []
+        if self.zero_count:
+            sizes.append(0)
+            weights.append(self.zero_count)
+        for index in sorted(self.buckets):
+            sizes.append(self._representative(index))
+            weights.append(self.buckets[index])
+        return sizes, weights
+
+    def quantile(self, fraction):
+        """Size at the given fraction (0..1) of the sorted sizes (nearest rank), or None if empty."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = self.zero_count
+        if rank <= seen:
+            return 0
+        if rank == self.count:
+            return self.max_positive  # Exact
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank <= seen:
+                return self._representative(index)
+        return self.max_positive
+
+    def log2_counts(self):
+        """Exact number of sizes per power-of-two range, as {k: count of sizes in [2**k, 2**(k+1))}."""
+        counts = {}
+        for index, bucket_count in self.buckets.items():
+            exponent = bucket_bounds(index)[0].bit_length() - 1
+            counts[exponent] = counts.get(exponent, 0) + bucket_count
+        return dict(sorted(counts.items()))
+
+    def to_dict(self):
+        """JSON-serializable form stored in summary_data (lists instead of int-keyed dicts)."""
+        return {
+            'count': self.count,
+            'zero_count': self.zero_count,
+            'min_positive': self.min_positive,
+            'max_positive': self.max_positive,
+            'buckets': [[index, self.buckets[index]] for index in sorted(self.buckets)],
+            'log2_counts': [[exponent, count] for exponent, count in self.log2_counts().items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls()
+        sketch.count = data['count']
+        sketch.zero_count = data['zero_count']
+        sketch.min_positive = data['min_positive']
+        sketch.max_positive = data['max_positive']
+        sketch.buckets = {index: count for index, count in data['buckets']}
+        return sketch
+
+
+class FileSizeDistribution:
+    """Size sketches of the file-like records of a scan (all_files_data), split by how the plots may count them."""
+
+    PARTS = ('regular_files', 'symlink_own_sizes', 'symlink_target_sizes')
+
+    def __init__(self):
+        self.sketches = {part: SizeSketch() for part in self.PARTS}
+
+    def add_record(self, record):
+        if record['is_symlink']:
+            if record['size_bytes'] >= 0:
+                self.sketches['symlink_own_sizes'].add(record['size_bytes'])
+            target_size = record.get('symlink_target_size_bytes')
+            if target_size is not None:
+                self.sketches['symlink_target_sizes'].add(target_size)
+        elif record['size_bytes'] >= 0:
+            self.sketches['regular_files'].add(record['size_bytes'])
+
+    def merge(self, other):
+        for part in self.PARTS:
+            self.sketches[part].merge(other.sketches[part])
+
+    def plotted_sizes(self):
+        """
+        One SizeSketch of the sizes the plots show, following config.SYMLINK_SIZE_HANDLING_FOR_PLOTS
+        (the same rule as aggregators.size_for_plotting).
+        """
+        sketch = SizeSketch()
+        sketch.merge(self.sketches['regular_files'])
+        if config.SYMLINK_SIZE_HANDLING_FOR_PLOTS == 'target':
+            sketch.merge(self.sketches['symlink_target_sizes'])
+        elif config.SYMLINK_SIZE_HANDLING_FOR_PLOTS == 'own_size':
+            sketch.merge(self.sketches['symlink_own_sizes'])
+        return sketch
+
+    def to_dict(self):
+        data = {part: self.sketches[part].to_dict() for part in self.PARTS}
+        data['relative_error'] = RELATIVE_ERROR
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        distribution = cls()
+        for part in cls.PARTS:
+            distribution.sketches[part] = SizeSketch.from_dict(data[part])
+        return distribution
+
+
+def merge_size_distributions(summaries):
+    """
+    Merges the size distributions of several summary_data dicts (e.g. saved scans of different
+    directories) into one FileSizeDistribution. Summaries without a distribution are skipped.
+    """
+    merged = FileSizeDistribution()
+    for summary_data in summaries:
+        data = summary_data.get('file_size_distribution')
+        if data is not None:
+            merged.merge(FileSizeDistribution.from_dict(data))
+    return merged
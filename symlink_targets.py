@@ -0,0 +1,182 @@
+# symlink_targets.py
+"""
+Lookups of symlink targets during a scan.
+
+Many symlinks usually point to the same few targets (library versions, alternatives, /etc
+links), and a link commonly points to a sibling in its own directory. The scanners therefore
+answer "does the target exist, is it a file or a directory, and how large is it" with one stat()
+per distinct target instead of one per link:
+
+    - TargetStatCache is a bounded LRU cache of os.stat() results keyed by the absolute target
+      path (config.SYMLINK_TARGET_CACHE_SIZE entries). Failed lookups (missing targets) are
+      cached as well, so broken links to the same path cost one call.
+    - The scandir based engines first look in the lstat results of the regular files of the
+      directory being listed (records they have just built), see directory_analyzer.
+
+The number of target lookups and how many were answered from records and from the cache are
+counted in ScanCounters and end up in summary_data['symlink_target_lookups'].
+
+The records themselves keep only the immediate target of a link (get_absolute_target_path does not
+resolve further, so a loop cannot hang the scan). SymlinkChainResolver follows each chain to its
+final target after the scan, once per link for the whole scan, and detects loops on the way.
+"""
+import collections
+import os
+import pathlib
+import threading
+
+import config
+
+
+class TargetStatCache:
+    """
+    Bounded LRU cache of os.stat() results (following symlinks) keyed by absolute target path.
+    Shared by all threads of a scan; a lock guards the cache, the stat() calls run outside it.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = config.SYMLINK_TARGET_CACHE_SIZE if max_entries is None else max_entries
+        self._entries = collections.OrderedDict()  # path -> os.stat_result, or (errno, strerror) of a failed stat
+        self._lock = threading.Lock()
+
+    def stat(self, target_path, counters):
+        """
+        Returns os.stat(target_path), raising the same OSError it would, from the cache when possible.
+        The lookup and whether it was a cache hit are counted in counters (a ScanCounters).
+        """
+        counters.symlink_target_lookups += 1
+        with self._lock:
+            cached = self._entries.get(target_path)
+            if cached is not None:
+                self._entries.move_to_end(target_path)
+        if cached is not None:
+            counters.symlink_target_cache_hits += 1
+        else:
+            try:
+                cached = os.stat(target_path)
+            except OSError as e:
+                cached = (e.errno, e.strerror)
+            if self.max_entries > 0:
+                with self._lock:
+                    self._entries[target_path] = cached
+                    if len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        if not isinstance(cached, os.stat_result):
+            # A new exception every time (re-raising a stored one would keep growing its traceback)
+            raise OSError(cached[0], cached[1], target_path)
+        return cached
+
+
+# A resolved link: the number of links in its chain, the final (non-link) target path string or
+# None if the chain never ends, and whether the link is itself part of a loop.
+SymlinkChain = collections.namedtuple('SymlinkChain', ['depth', 'final_target', 'in_loop'])
+
+# Chains are abandoned (final target None) after this many links, like the kernel's ELOOP limit
+# but higher; it also bounds the resolver's recursion.
+MAX_CHAIN_LINKS = 128
+
+_GRAY = object()  # Marks a link whose resolution is in progress
+
+
+class SymlinkChainResolver:
+    """
+    Resolves symlinks to their final target, memoizing every link it passes through for the rest
+    of the scan, so chains shared by many links (or by the directories in their target paths) are
+    read once. Each path is resolved component by component like os.path.realpath, but against
+    the memo instead of the filesystem where possible.
+
+    Loops are found with DFS coloring: a link is gray while the links after it are being resolved
+    and black (memoized) afterwards, so reaching a gray link closes a loop. Every link is colored
+    once, so a scan costs O(links) readlink calls no matter how chains and loops overlap.
+    Not thread-safe; the scanners use it from one thread after the traversal.
+    """
+
+    def __init__(self):
+        self._chains = {}       # link path -> SymlinkChain, or _GRAY while being resolved
+        self._link_targets = {}  # path -> os.readlink() result, or None if it is not a readable link
+        self._stack = []        # Gray links, in resolution order
+        self._loop_lengths = {}  # link path -> length of the loop it is on
+        self.readlink_calls = 0
+
+    def _link_target(self, path):
+        if path in self._link_targets:
+            return self._link_targets[path]
+        self.readlink_calls += 1
+        try:
+            target = os.readlink(path)
+        except (OSError, ValueError):
+            target = None  # Not a link, missing, or not accessible: the chain ends here
+        self._link_targets[path] = target
+        return target
+
+    def _real_path(self, path):
+        """
+        Resolves every component of an absolute path string. Returns None if one of them is a link
+        whose chain does not end.
+        """
+        parts = pathlib.PurePath(path).parts
+        resolved = parts[0]
+        for part in parts[1:]:
+            if part == '..':
+                resolved = os.path.dirname(resolved)
+                continue
+            candidate = os.path.join(resolved, part)
+            if self._link_target(candidate) is None:
+                resolved = candidate
+                continue
+            chain = self._resolve(candidate)
+            if chain.final_target is None:
+                return None
+            resolved = chain.final_target
+        return resolved
+
+    def resolve(self, link_path, immediate_target=None):
+        """
+        Returns the SymlinkChain of the symlink at link_path (an absolute path whose parent
+        directories are not links, as listed by the scanners), or None if it cannot be read.
+        immediate_target is the link's absolute target if the caller has already read it.
+        """
+        link_path = str(link_path)
+        if immediate_target is not None and link_path not in self._link_targets:
+            self._link_targets[link_path] = str(immediate_target)
+        if self._link_target(link_path) is None:
+            return None
+        return self._resolve(link_path)
+
+    def _resolve(self, link_path):
+        chain = self._chains.get(link_path)
+        if chain is _GRAY:
+            # Back edge: every link from link_path to the top of the stack is on the loop
+            loop = self._stack[self._stack.index(link_path):]
+            for member in loop:
+                self._loop_lengths[member] = len(loop)
+            return SymlinkChain(len(loop), None, True)
+        if chain is not None:
+            return chain
+        if len(self._stack) >= MAX_CHAIN_LINKS:
+            return SymlinkChain(0, None, False)
+
+        self._chains[link_path] = _GRAY
+        self._stack.append(link_path)
+        target = self._link_target(link_path)
+        if not os.path.isabs(target):
+            target = os.path.join(os.path.dirname(link_path), target)
+        head, tail = os.path.split(target)
+        if tail in ('', '.', '..'):
+            next_path, next_chain = self._real_path(target), None
+        else:
+            real_head = self._real_path(head)
+            next_path = None if real_head is None else os.path.join(real_head, tail)
+            next_chain = None
+            if next_path is not None and self._link_target(next_path) is not None:
+                next_chain = self._resolve(next_path)
+        self._stack.pop()
+
+        if link_path in self._loop_lengths:
+            chain = SymlinkChain(self._loop_lengths[link_path], None, True)
+        elif next_chain is not None:
+            chain = SymlinkChain(next_chain.depth + 1, next_chain.final_target, False)
+        else:
+            chain = SymlinkChain(1, next_path, False)
+        self._chains[link_path] = chain
+        return chain